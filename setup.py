@@ -26,6 +26,9 @@ setup(
         'termcolor',
         'tabulate',
     ),
+    extras_require=dict(
+        vector=('numpy',),
+    ),
     package_dir={'': 'src'},
     packages=find_packages('src', exclude=('test',)),
     scripts=('script/stellar-nice-body',),
@@ -0,0 +1,186 @@
+import itertools
+import random
+import unittest
+
+from tnb import availability
+from tnb.intersection import (
+    QuorumIntersection,
+    get_threshold,
+)
+from tnb.quorum import (
+    RegionalQuorum,
+    make_regions,
+    make_ring_distances,
+)
+
+
+def make_quorums(validators_by_region, trusted):
+    quorums = dict()
+    for region_name, names in validators_by_region.items():
+        validators = dict(map(lambda x: (x, validators_by_region[x]), trusted[region_name]))
+        for name in names:
+            quorums[name] = dict(region=region_name, validators=validators)
+
+    return quorums
+
+
+def get_quorum_set(quorums, name):
+    members = set(itertools.chain(*quorums[name]['validators'].values()))
+    members.add(name)
+
+    return members, get_threshold(len(members), 67)
+
+
+def is_live(quorums, alive):
+    in_quorum = set(alive)
+    while True:
+        found = set(filter(
+            lambda x: len(get_quorum_set(quorums, x)[0] & in_quorum) >= get_quorum_set(quorums, x)[1],
+            in_quorum,
+        ))
+        if found == in_quorum:
+            break
+
+        in_quorum = found
+
+    return all(map(lambda x: len(get_quorum_set(quorums, x)[0] & in_quorum) >= get_quorum_set(quorums, x)[1], alive))
+
+
+def is_safe(quorums, alive):
+    validators = set(itertools.chain(*map(lambda x: itertools.chain(*x['validators'].values()), quorums.values())))
+    survivors = sorted(validators & set(alive))
+    failed = validators - set(alive)
+
+    def is_satisfied(name, nodes):
+        members, threshold = get_quorum_set(quorums, name)
+
+        return len(members & nodes) >= threshold - len(members & failed)
+
+    def contract(nodes):
+        while True:
+            found = set(filter(lambda x: is_satisfied(x, nodes), nodes))
+            if found == nodes:
+                return nodes
+
+            nodes = found
+
+    # any quorum must not leave the quorum in its complement
+    for n in range(1, len(survivors) + 1):
+        for nodes in itertools.combinations(survivors, n):
+            nodes = set(nodes)
+            if contract(nodes) == nodes and contract(set(survivors) - nodes):
+                return False
+
+    return True
+
+
+class TestInterval(unittest.TestCase):
+    def test_interval(self):
+        low, high = availability.get_interval(50, 100)
+        self.assertAlmostEqual(low, 0.4038, places=4)
+        self.assertAlmostEqual(high, 0.5962, places=4)
+
+        low, high = availability.get_interval(0, 100)
+        self.assertEqual(low, 0)
+        self.assertAlmostEqual(high, 0.0370, places=4)
+
+        self.assertEqual(availability.get_interval(0, 0), (0.0, 1.0))
+
+
+@unittest.skipIf(availability.numpy is None, 'numpy is not installed')
+class TestFailureAnalysis(unittest.TestCase):
+    def make_random_quorums(self, seed, number_of_regions=4, max_size=4):
+        rng = random.Random(seed)
+        regions = ['r%d' % i for i in range(number_of_regions)]
+        validators_by_region = dict(map(
+            lambda x: (x, ['%sn%d' % (x, i) for i in range(rng.randint(2, max_size))]),
+            regions,
+        ))
+        trusted = dict(map(lambda x: (x, [x] + rng.sample(regions, 2)), regions))
+
+        return make_quorums(validators_by_region, trusted)
+
+    def test_brute_force(self):
+        numpy = availability.numpy
+        for seed in range(5):
+            quorums = self.make_random_quorums(seed, number_of_regions=3, max_size=3)
+            fa = availability.FailureAnalysis(quorums)
+
+            rng = numpy.random.default_rng(seed)
+            alive = rng.random((200, len(fa.names))) >= 0.2
+            live = fa.check_liveness(alive)
+            safe = fa.check_safety(alive)
+
+            for i, row in enumerate(alive):
+                names = list(map(lambda x: fa.names[x], numpy.flatnonzero(row)))
+                self.assertEqual(live[i], is_live(quorums, names))
+                self.assertEqual(safe[i], is_safe(quorums, names))
+
+    def test_regions(self):
+        # the quorum sets of the far regions do not share any node, but the
+        # quorums intersect through the near regions
+        regions = make_regions([4] * 8)
+        composed = RegionalQuorum(regions, 1, 2, seed=0).compose(make_ring_distances(regions))
+
+        quorums = dict()
+        for region_name, validators in regions.items():
+            for name in validators:
+                quorums[name] = dict(region=region_name, validators={region_name: composed[region_name]})
+
+        self.assertTrue(QuorumIntersection.from_quorums(quorums).check())
+
+        report = availability.FailureAnalysis(quorums, probabilities=0).run(100, seed=0)
+        self.assertEqual(report['safety']['probability'], 1.0)
+        self.assertEqual(report['both']['probability'], 1.0)
+
+    def test_split(self):
+        quorums = make_quorums(dict(r0=['a0', 'a1', 'a2'], r1=['b0', 'b1', 'b2']), dict(r0=['r0'], r1=['r1']))
+
+        report = availability.FailureAnalysis(quorums, probabilities=0).run(100, seed=0)
+        self.assertEqual(report['liveness']['count'], 100)
+        self.assertEqual(report['safety']['count'], 0)
+
+    def test_no_failure(self):
+        quorums = make_quorums(dict(r0=['a0', 'a1', 'a2', 'a3']), dict(r0=['r0']))
+
+        report = availability.FailureAnalysis(quorums, probabilities=0).run(1000, seed=0)
+        self.assertEqual(report['liveness']['count'], 1000)
+        self.assertEqual(report['safety']['count'], 1000)
+        self.assertEqual(report['both']['probability'], 1)
+        self.assertLess(report['both']['interval'][0], 1)
+
+    def test_probabilities(self):
+        # 2 of 4 are always failed, so the threshold, 3 is never reached
+        quorums = make_quorums(dict(r0=['a0', 'a1', 'a2', 'a3']), dict(r0=['r0']))
+        fa = availability.FailureAnalysis(quorums, probabilities=dict(a0=1, a1=1, a2=0, a3=0))
+
+        report = fa.run(100, seed=0)
+        self.assertEqual(report['liveness']['count'], 0)
+
+        # 1 of 4 may fail; the slices of 3 share 2 nodes
+        fa = availability.FailureAnalysis(quorums, probabilities=dict(a0=1, a1=0, a2=0, a3=0))
+
+        report = fa.run(100, seed=0)
+        self.assertEqual(report['liveness']['count'], 100)
+        self.assertEqual(report['safety']['count'], 100)
+
+    def test_unknown_validators(self):
+        # x0 and x1 are trusted, but not in quorums; 3 of 5 can not reach the threshold, 4
+        quorums = make_quorums(dict(r0=['a0', 'a1', 'a2']), dict(r0=['r0']))
+        for quorum in quorums.values():
+            quorum['validators']['x'] = ['x0', 'x1']
+
+        fa = availability.FailureAnalysis(quorums, probabilities=0)
+
+        self.assertEqual(fa.names[-2:], ['x0', 'x1'])
+        self.assertEqual(fa.run(100, seed=0)['liveness']['count'], 0)
+
+    def test_workers(self):
+        quorums = self.make_random_quorums(0)
+
+        fa = availability.FailureAnalysis(quorums, probabilities=0.1)
+        fa.chunk_size = 300
+
+        expected = fa.run(1000, seed=3, workers=1)
+        self.assertEqual(fa.run(1000, seed=3, workers=2), expected)
+        self.assertNotEqual(fa.run(1000, seed=4, workers=1), expected)
@@ -0,0 +1,32 @@
+import unittest
+
+from tnb.benchmark import (
+    run,
+    summarize,
+)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run(self):
+        results = run((3,), (4, 7), (1, 2), ('bitset', 'solver'), seed=0)
+
+        # 4 validators can not have the minimum size with 2 failures
+        self.assertEqual(len(results), 6)
+        for r in results:
+            self.assertTrue(r['composed'])
+            self.assertGreater(r['peak_memory'], 0)
+            self.assertGreater(r['candidates']['commons_safety'], 0)
+
+        self.assertIn('bitset', summarize(results))
+
+    def test_memo(self):
+        # the pairs of the equal regions have the same shape
+        results = run((6,), (4,), (1,), ('set',), seed=0)
+        self.assertEqual(results[0]['memo_hits'], 0)
+
+        memoized = run((6,), (4,), (1,), ('set',), seed=0, memo=True)
+        self.assertGreater(memoized[0]['memo_hits'], 0)
+        self.assertLess(
+            memoized[0]['candidates']['commons_safety'],
+            results[0]['candidates']['commons_safety'],
+        )
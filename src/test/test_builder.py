@@ -1,6 +1,12 @@
+import itertools
 import unittest
 
-from tnb.builder import Builder
+from tnb.builder import (
+    Builder,
+    compact_quorums,
+    expand_quorums,
+    get_quorum_set_hash,
+)
 from tnb.design import Design
 
 from .util import load_yaml
@@ -17,3 +23,87 @@ class TestBuilder(unittest.TestCase, BaseTest):
         quorums = builder.make_quorums()
 
         self.assertNotEqual(quorums, None)
+
+    def test_previous(self):
+        quorums = Builder(self.from_string('safe-builder')).make_quorums()
+
+        builder = Builder(self.from_string('safe-builder'))
+        self.assertEqual(builder.make_quorums(previous=quorums), quorums)
+        self.assertEqual(builder.recomposition['nodes'], list())
+
+    def test_quorums_inputs(self):
+        a = Builder(self.from_string('safe-builder')).get_quorums_inputs(seed=1)
+        b = Builder(self.from_string('safe-builder')).get_quorums_inputs(seed=1)
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, Builder(self.from_string('safe-builder')).get_quorums_inputs(seed=2))
+
+    def test_index(self):
+        builder = Builder(self.from_string('safe-builder'))
+
+        for node_name in builder.nodes.nodes.keys():
+            instance = builder.instances.get_instance_by_node(node_name)
+            region = builder.regions.get_region_by_instance(instance.name)
+
+            self.assertEqual(builder.index.instance_by_node[node_name], instance.name)
+            self.assertEqual(builder.index.region_by_node[node_name], region.name)
+            self.assertEqual(builder.index.region_by_instance[instance.name], region.name)
+
+        for instance_name, instance in builder.instances.instances.items():
+            self.assertEqual(builder.index.validators_by_instance[instance_name], instance.get_validators(builder.nodes.nodes))
+            self.assertEqual(builder.index.nodes_by_instance[instance_name], instance.get_nodes(builder.nodes.nodes))
+
+    def test_quorum_sets(self):
+        quorums = Builder(self.from_string('safe-builder')).make_quorums()
+
+        for q in quorums.values():
+            self.assertEqual(q['quorum_set'], get_quorum_set_hash(q['validators']))
+
+        # the nodes of same region share the quorum set
+        by_region = dict()
+        for q in quorums.values():
+            self.assertIs(by_region.setdefault(q['region'], q['validators']), q['validators'])
+
+        compacted = compact_quorums(quorums)
+        self.assertEqual(len(compacted['quorum_sets']), len(by_region))
+        self.assertEqual(expand_quorums(compacted), quorums)
+
+    def test_graphs(self):
+        builder = Builder(self.from_string('safe-builder'))
+        quorums = builder.make_quorums()
+
+        g = builder.get_quorums_graph(quorums)
+        self.assertEqual(sorted(g.nodes.keys()), sorted(set(map(lambda x: x['region'], quorums.values()))))
+
+        g = builder.get_quorum_validators_graph(quorums)
+        self.assertEqual(sorted(g.nodes.keys()), sorted(quorums.keys()))
+        for v0, v1, weight in g.edges:
+            self.assertIn(v0, itertools.chain(*quorums[v1]['validators'].values()))
+            self.assertIsNotNone(weight)
+
+        g = builder.get_quorum_validators_graph(quorums, direct=True)
+        self.assertTrue(all(map(lambda x: x[2] is None, g.edges)))
+
+
+class TestCompactQuorums(unittest.TestCase):
+    def test_compact(self):
+        quorums = dict(
+            a=dict(node='a', validators=dict(extra=['a', 'b']), region='r0', instance='i0'),
+            b=dict(node='b', validators=dict(extra=['b', 'a']), region='r0', instance='i0'),
+            c=dict(node='c', validators=dict(extra=['c'], r0=['a']), region='r1', instance='i1'),
+        )
+
+        compacted = compact_quorums(quorums)
+        self.assertEqual(len(compacted['quorum_sets']), 2)
+        self.assertNotIn('validators', compacted['nodes']['a'])
+        self.assertEqual(compacted['nodes']['a']['quorum_set'], compacted['nodes']['b']['quorum_set'])
+
+        expanded = expand_quorums(compacted)
+        self.assertEqual(sorted(expanded['b']['validators']['extra']), ['a', 'b'])
+        self.assertIs(expanded['a']['validators'], expanded['b']['validators'])
+        self.assertEqual(expanded['c']['validators'], quorums['c']['validators'])
+
+    def test_not_compact(self):
+        quorums = dict(a=dict(node='a', validators=dict(extra=['a'])))
+
+        self.assertIs(expand_quorums(quorums), quorums)
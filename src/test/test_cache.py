@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from tnb.cache import QuorumCache
+
+
+class TestQuorumCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key(self):
+        inputs = dict(regions=dict(r0=dict(tags=[0, 1])), failure=1, options=dict(seed=1))
+
+        self.assertEqual(QuorumCache.make_key(inputs), QuorumCache.make_key(dict(inputs)))
+        self.assertNotEqual(
+            QuorumCache.make_key(inputs),
+            QuorumCache.make_key(dict(inputs, failure=2)),
+        )
+
+    def test_get(self):
+        cache = QuorumCache(self.directory.name)
+        quorums = dict(n0=dict(node='n0', validators=dict(extra=['n0', 'n1'])))
+
+        self.assertIsNone(cache.get('a'))
+
+        cache.put('a', quorums)
+        self.assertEqual(cache.get('a'), quorums)
+
+    def test_evict(self):
+        cache = QuorumCache(self.directory.name, max_size=100)
+        quorums = dict(n0=dict(node='n0', validators=dict(extra=['n%02d' % i for i in range(5)])))
+
+        for i, key in enumerate(('a', 'b', 'c')):
+            cache.put(key, quorums)
+            os.utime(str(cache.get_path(key)), (i, i))
+
+        cache.evict()
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), quorums)
+
+    def test_stats(self):
+        cache = QuorumCache(self.directory.name, max_size=100)
+        quorums = dict(n0=dict(node='n0', validators=dict(extra=['n%02d' % i for i in range(5)])))
+        stats = dict(engine='set', elapsed=0.1, pairs=list())
+
+        cache.put('a', quorums)
+        self.assertIsNone(cache.get_stats('a'))
+
+        cache.put('b', quorums, stats=stats)
+        self.assertEqual(cache.get_stats('b'), stats)
+
+        # the stats are evicted with their quorums
+        os.utime(str(cache.get_path('b')), (0, 0))
+        cache.put('c', quorums)
+        self.assertIsNone(cache.get('b'))
+        self.assertFalse(cache.get_stats_path('b').exists())
@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from tnb.diagnostics import (
+    Lazy,
+    is_enabled,
+    trace,
+)
+from tnb.quorum import (
+    AvailableQuorumCommons,
+    log,
+)
+
+
+class TestLazy(unittest.TestCase):
+    def test_not_rendered(self):
+        rendered = list()
+
+        def render():
+            rendered.append(True)
+            return 'rendered'
+
+        logger = logging.getLogger('test.diagnostics')
+        logger.setLevel(logging.ERROR)
+        logger.debug('%s', Lazy(render))
+
+        self.assertEqual(rendered, list())
+        self.assertEqual(str(Lazy(render)), 'rendered')
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        trace.close()
+        os.remove(self.path)
+
+    def test_candidates(self):
+        self.assertFalse(is_enabled(log))
+
+        trace.open(self.path)
+        self.assertTrue(is_enabled(log))
+
+        qc = AvailableQuorumCommons(('r0', 'r1'), ['a0', 'a1', 'a2', 'a3'], ['b0', 'b1', 'b2', 'b3'], 1)
+        passed = len(qc.make())
+        trace.close()
+
+        with open(self.path) as f:
+            events = list(map(json.loads, f))
+
+        safety = list(filter(lambda x: x['event'] == 'safety', events))
+        self.assertEqual(len(list(filter(lambda x: x['valid'], safety))), passed)
+        self.assertEqual(safety[0]['pair'], ['r0', 'r1'])
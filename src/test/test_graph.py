@@ -0,0 +1,84 @@
+import io
+import json
+import unittest
+import xml.etree.ElementTree as ET
+
+from tnb import layout
+from tnb.graph import (
+    Graph,
+    write_gexf,
+    write_graphml,
+    write_json,
+    write_svg,
+)
+
+
+class TestGraph(unittest.TestCase):
+    def make_graph(self):
+        g = Graph('test')
+        g.add_node('a', group='i<0>')
+        g.add_node('b', group='i<0>')
+        g.add_node('c&d')
+        g.add_edge('a', 'b', weight=3)
+        g.add_edge('a', 'c&d', weight=1)
+        g.add_edge('b', 'c&d')
+
+        return g
+
+    def write(self, writer):
+        f = io.StringIO()
+        writer(self.make_graph(), f)
+
+        return f.getvalue()
+
+    def test_graphml(self):
+        ns = dict(g='http://graphml.graphdrawing.org/xmlns')
+        root = ET.fromstring(self.write(write_graphml))
+
+        nodes = root.findall('g:graph/g:node', ns)
+        self.assertEqual(list(map(lambda x: x.get('id'), nodes)), ['a', 'b', 'c&d'])
+
+        edges = root.findall('g:graph/g:edge', ns)
+        self.assertEqual(
+            list(map(lambda x: (x.get('source'), x.get('target'), x.findtext('g:data', None, ns)), edges)),
+            [('a', 'b', '3'), ('a', 'c&d', '1'), ('b', 'c&d', None)],
+        )
+
+    def test_gexf(self):
+        ns = dict(g='http://gexf.net/1.2')
+        root = ET.fromstring(self.write(write_gexf))
+
+        nodes = root.findall('g:graph/g:nodes/g:node', ns)
+        self.assertEqual(list(map(lambda x: x.get('label'), nodes)), ['a', 'b', 'c&d'])
+        self.assertEqual(nodes[0].find('g:attvalues/g:attvalue', ns).get('value'), 'i<0>')
+
+        edges = root.findall('g:graph/g:edges/g:edge', ns)
+        self.assertEqual(list(map(lambda x: x.get('weight'), edges)), ['3', '1', None])
+
+    def test_json(self):
+        data = json.loads(self.write(write_json))
+
+        self.assertEqual(data['name'], 'test')
+        self.assertEqual(data['nodes']['a'], dict(label='a', group='i<0>'))
+        self.assertEqual(data['adjacency'], dict(a=[['b', 3], ['c&d', 1]], b=[['c&d', None]]))
+
+    @unittest.skipIf(layout.numpy is None, 'numpy is not installed')
+    def test_svg(self):
+        ns = dict(s='http://www.w3.org/2000/svg')
+        root = ET.fromstring(self.write(write_svg))
+
+        self.assertEqual(list(map(lambda x: x.text, root.findall('s:g/s:text', ns))), ['i<0>', 'a', 'b', 'c&d'])
+        self.assertEqual(len(root.findall('s:g/s:circle', ns)), 3)
+        self.assertEqual(len(root.findall('s:g/s:line', ns)), 3)
+        self.assertEqual(len(root.findall('s:g/s:rect', ns)), 1)
+
+    def test_empty(self):
+        self.assertEqual(json.loads(self.writer_output(write_json)), dict(name='empty', nodes=dict(), adjacency=dict()))
+        ET.fromstring(self.writer_output(write_graphml))
+        ET.fromstring(self.writer_output(write_gexf))
+
+    def writer_output(self, writer):
+        f = io.StringIO()
+        writer(Graph('empty'), f)
+
+        return f.getvalue()
@@ -0,0 +1,117 @@
+import itertools
+import random
+import unittest
+
+from tnb.intersection import (
+    QuorumIntersection,
+    get_threshold,
+)
+
+from .test_quorum import BaseTest
+
+
+class TestThreshold(unittest.TestCase):
+    def test_threshold(self):
+        self.assertEqual(get_threshold(3, 67), 3)
+        self.assertEqual(get_threshold(4, 67), 3)
+        self.assertEqual(get_threshold(7, 67), 5)
+        self.assertEqual(get_threshold(0, 67), 0)
+
+
+class TestQuorumIntersection(unittest.TestCase, BaseTest):
+    def make_quorums(self, regions, composed):
+        quorums = dict()
+        for region_name, vs in regions.items():
+            for v in vs:
+                quorums[v] = dict(
+                    node=v,
+                    validators=dict(extra=list(composed[region_name])),
+                    region=region_name,
+                )
+
+        return quorums
+
+    def test_composed(self):
+        regions = self.make_regions(7, 7, 7, 7)
+        quorums = self.make_quorums(regions, self.compose(regions, 2, 'set'))
+
+        qi = QuorumIntersection.from_quorums(quorums)
+        self.assertTrue(qi.check())
+        self.assertIsNone(qi.split)
+
+    def test_disjoint_components(self):
+        regions = self.make_regions(4, 4)
+        quorums = self.make_quorums(regions, regions)
+
+        qi = QuorumIntersection.from_quorums(quorums)
+        self.assertFalse(qi.check())
+        self.assertEqual(qi.split, (regions['r0'], regions['r1']))
+
+    def test_split_in_component(self):
+        # the 2 groups are connected only by `b0`, which trusts both groups
+        quorum_sets = dict(
+            a0=('a0', 'a1', 'a2'),
+            a1=('a0', 'a1', 'a2'),
+            a2=('a0', 'a1', 'a2', 'b0'),
+            b0=('a0', 'b0', 'b1', 'b2'),
+            b1=('b0', 'b1', 'b2'),
+            b2=('b0', 'b1', 'b2'),
+        )
+
+        qi = QuorumIntersection(quorum_sets, threshold_percent=67)
+        self.assertEqual(len(qi.components()), 1)
+        self.assertFalse(qi.check())
+
+        a, b = map(qi.index.mask, qi.split)
+        self.assertTrue(qi.is_quorum(a))
+        self.assertTrue(qi.is_quorum(b))
+        self.assertEqual(a & b, 0)
+
+    def test_not_validator(self):
+        quorums = dict(
+            a=dict(validators=dict(extra=['b', 'c'])),
+            b=dict(validators=dict(extra=['a', 'c'])),
+            c=dict(validators=dict(extra=['a', 'b'])),
+            d=dict(validators=dict(extra=['a', 'b'])),
+        )
+
+        qi = QuorumIntersection.from_quorums(quorums, validators=('a', 'b', 'c'))
+        self.assertEqual(sorted(qi.index.unmask(qi.nodes)), ['a', 'b', 'c'])
+        self.assertTrue(qi.check())
+
+    def test_no_quorum(self):
+        # every quorum set has the validator, which is not in quorums
+        quorums = dict(
+            a=dict(validators=dict(extra=['a', 'b', 'x', 'y'])),
+            b=dict(validators=dict(extra=['a', 'b', 'x', 'y'])),
+        )
+
+        qi = QuorumIntersection.from_quorums(quorums, validators=('a', 'b'))
+        self.assertFalse(qi.check())
+        self.assertTrue(qi.no_quorum)
+        self.assertIsNone(qi.split)
+
+    def test_thresholds(self):
+        quorum_sets = dict(a=['a', 'b', 'c'], b=['a', 'b', 'c'], c=['a', 'b', 'c'])
+        self.assertTrue(QuorumIntersection(quorum_sets).check())
+
+        # `a` alone and `b` alone are quorums
+        qi = QuorumIntersection(quorum_sets, thresholds=dict(a=1, b=1))
+        self.assertFalse(qi.check())
+        self.assertEqual(qi.split, (['a'], ['b']))
+
+    def test_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            names = list(map(lambda x: 'n%d' % x, range(rng.randint(2, 9))))
+            groups = list(map(
+                lambda x: rng.sample(names, rng.randint(1, len(names))),
+                range(rng.randint(1, 4)),
+            ))
+            quorum_sets = dict(map(lambda x: (x, rng.choice(groups)), names))
+
+            qi = QuorumIntersection(quorum_sets, threshold_percent=rng.choice((34, 51, 67)))
+            quorums = list(filter(qi.is_quorum, range(1, 1 << len(names))))
+            expected = len(quorums) > 0 and all(map(lambda x: x[0] & x[1], itertools.product(quorums, repeat=2)))
+
+            self.assertEqual(qi.check(), expected, quorum_sets)
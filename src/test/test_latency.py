@@ -0,0 +1,108 @@
+import math
+import pathlib
+import tempfile
+import unittest
+
+from tnb.latency import (
+    LatencyMatrix,
+    estimate_rtts,
+    get_distances,
+)
+from tnb.util import TagIndex
+
+
+class TestLatencyMatrix(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_csv(self, content):
+        path = self.path.joinpath('latency.csv')
+        path.write_text(content)
+
+        return path
+
+    def test_csv(self):
+        m = LatencyMatrix.load(self.write_csv(''',r0,r1,r2
+r0,0,10,
+r1,12,0,30
+r2,-,30,0
+'''))
+
+        self.assertEqual(m.regions, ['r0', 'r1', 'r2'])
+        self.assertEqual(m.get('r0', 'r1'), 11)
+        self.assertEqual(m.get('r1', 'r2'), 30)
+        self.assertIsNone(m.get('r0', 'r2'))
+        self.assertIsNone(m.get('r0', 'unknown'))
+
+    def test_binary(self):
+        m = LatencyMatrix.load(self.write_csv(''',r0,r1,region-2
+r0,0,10.5,
+r1,12,0,30
+region-2,,30,0
+'''))
+
+        path = self.path.joinpath('latency.bin')
+        m.save_binary(path)
+
+        loaded = LatencyMatrix.load(path)
+        self.assertEqual(loaded.regions, m.regions)
+
+        # the digest is from the header without reading the matrix
+        self.assertEqual(loaded.sha256, m.digest())
+        self.assertEqual(loaded.digest(), m.digest())
+        for a in m.regions:
+            for b in m.regions:
+                self.assertEqual(loaded.get(a, b), m.get(a, b))
+
+        self.assertTrue(math.isnan(loaded.values[2]))
+
+    def test_unknown_region(self):
+        with self.assertRaises(ValueError):
+            LatencyMatrix.load(self.write_csv(',r0\nr1,0\n'))
+
+
+class TestDistances(unittest.TestCase):
+    def test_distances(self):
+        tags = dict(
+            r0=[0, 'a'],
+            r1=[0, 'b'],
+            r2=[3, 'a'],
+            r3=[5, 'a'],
+        )
+
+        # r0 is near to r2 by RTT, though r1 is near by tags
+        latency = LatencyMatrix(['r0', 'r1', 'r2'], [0, 80, 10, 80, 0, 90, 10, 90, 0])
+
+        distances = get_distances(latency, TagIndex(tags), tags.keys())
+        self.assertEqual(distances['r0'][0], (10, ['r2']))
+        self.assertEqual(list(map(lambda x: x[1], distances['r0'])), [['r2'], ['r1'], ['r3']])
+
+        # r3 is not measured; estimated by the distance of tags
+        self.assertEqual(list(map(lambda x: x[1], distances['r3'])), [['r2'], ['r0', 'r1']])
+
+    def test_not_measured(self):
+        tags = dict(r0=[0], r1=[1], r2=[2])
+        index = TagIndex(tags)
+
+        distances = get_distances(LatencyMatrix(['x'], [0]), index, tags.keys())
+        self.assertEqual(distances, dict(map(lambda x: (x, index.levels(x)), tags.keys())))
+
+    def test_estimate_rtts(self):
+        tags = dict(r0=[0], r1=[1], r2=[3])
+        index = TagIndex(tags)
+
+        self.assertIsNone(estimate_rtts(None, index, tags.keys()))
+
+        rtts = estimate_rtts(None, index, tags.keys(), default_scale=100)
+        self.assertAlmostEqual(rtts[('r0', 'r1')], 10)
+        self.assertAlmostEqual(rtts[('r2', 'r0')], 30)
+
+        # the measured pair is kept and the others are scaled by it
+        rtts = estimate_rtts(LatencyMatrix(['r0', 'r1'], [0, 20, 20, 0]), index, tags.keys())
+        self.assertEqual(rtts[('r0', 'r1')], 20)
+        self.assertAlmostEqual(rtts[('r0', 'r2')], 60)
+        self.assertAlmostEqual(rtts[('r1', 'r2')], 40)
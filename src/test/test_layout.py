@@ -0,0 +1,71 @@
+import itertools
+import math
+import random
+import unittest
+
+from tnb.graph import Graph
+from tnb import layout
+
+
+@unittest.skipIf(layout.numpy is None, 'numpy is not installed')
+class TestLayout(unittest.TestCase):
+    def make_graph(self, sizes, number_of_edges, seed=0):
+        rng = random.Random(seed)
+
+        g = Graph('test')
+        for group, size in enumerate(sizes):
+            for i in range(size):
+                g.add_node('g%dn%d' % (group, i), group='g%d' % group)
+
+        names = list(g.nodes.keys())
+        for _ in range(number_of_edges):
+            a, b = rng.sample(names, 2)
+            g.add_edge(a, b, weight=rng.randint(1, 10))
+
+        return g
+
+    def distance(self, a, b):
+        return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2)
+
+    def test_clusters(self):
+        g = self.make_graph((3, 12, 1, 30, 5), 200)
+        positions = layout.layout(g)
+
+        self.assertEqual(sorted(positions.keys()), sorted(g.nodes.keys()))
+
+        # the nodes of the different groups are apart at least by `spacing`
+        for a, b in itertools.combinations(g.nodes.keys(), 2):
+            if g.nodes[a]['group'] == g.nodes[b]['group']:
+                continue
+
+            self.assertGreaterEqual(self.distance(positions[a], positions[b]), layout.spacing - 1e-6)
+
+    def test_seed(self):
+        g = self.make_graph((10, 10), 30)
+
+        self.assertEqual(layout.layout(g, seed=1), layout.layout(g, seed=1))
+
+    def test_small(self):
+        g = Graph('test')
+        self.assertEqual(layout.layout(g), dict())
+
+        g.add_node('a')
+        self.assertEqual(layout.layout(g), dict(a=(0.0, 0.0)))
+
+        g.add_node('b')
+        g.add_edge('a', 'b')
+        positions = layout.layout(g)
+        self.assertGreaterEqual(self.distance(positions['a'], positions['b']), layout.spacing)
+
+    def test_grid_pairs(self):
+        numpy = layout.numpy
+        pos = numpy.random.RandomState(0).rand(2000, 2)
+        k = math.sqrt(1 / len(pos))
+
+        i, j = layout.get_grid_pairs(pos, 2 * k)
+        near = ((pos[i] - pos[j]) ** 2).sum(axis=1) < 4 * k * k
+
+        # every pair within `2k` is in the neighbor cells
+        distance2 = ((pos[:, None, :] - pos[None, :, :]) ** 2).sum(axis=2)
+        expected = set(zip(*map(lambda x: x.tolist(), numpy.nonzero(distance2 < 4 * k * k))))
+        self.assertEqual(set(zip(i[near].tolist(), j[near].tolist())), expected)
@@ -0,0 +1,98 @@
+import itertools
+import random
+import unittest
+
+from tnb.overlap import (
+    QuorumOverlap,
+    RegionGraph,
+    numpy,
+)
+
+
+class TestQuorumOverlap(unittest.TestCase):
+    def make_quorums(self, seed):
+        rng = random.Random(seed)
+        names = list(map(lambda x: 'n%d' % x, range(12)))
+        quorum_sets = list(map(lambda x: rng.sample(names, rng.randint(1, len(names))), range(4)))
+
+        quorums = dict()
+        for name in names:
+            vs = rng.choice(quorum_sets)
+            quorums[name] = dict(node=name, validators=dict(extra=vs[:3], r1=vs[3:]))
+
+        return quorums
+
+    def expected_counts(self, quorums):
+        counts = dict()
+        for v0, v1 in itertools.combinations(quorums.keys(), 2):
+            vs0 = set(itertools.chain(*quorums[v0]['validators'].values()))
+            vs1 = set(itertools.chain(*quorums[v1]['validators'].values()))
+            counts[(v0, v1)] = len(vs0 & vs1)
+
+        return counts
+
+    def check(self, use_numpy):
+        for seed in range(20):
+            quorums = self.make_quorums(seed)
+            expected = self.expected_counts(quorums)
+
+            overlap = QuorumOverlap(quorums, use_numpy=use_numpy)
+            for (v0, v1), count in expected.items():
+                self.assertEqual(overlap.count(v0, v1), count)
+
+            self.assertEqual(overlap.range(), (max(expected.values()), min(expected.values())))
+
+            connected = list(filter(
+                lambda x: x[0] in itertools.chain(*quorums[x[1]]['validators'].values()),
+                expected.keys(),
+            ))
+            self.assertEqual(
+                overlap.connected(),
+                list(map(lambda x: (x[0], x[1], expected[x]), connected)),
+            )
+
+    def test_masks(self):
+        self.check(False)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_matrix(self):
+        self.check(True)
+
+    def test_single(self):
+        overlap = QuorumOverlap(dict(a=dict(validators=dict(extra=['a']))))
+
+        self.assertIsNone(overlap.range())
+        self.assertEqual(overlap.connected(), list())
+
+
+class TestRegionGraph(unittest.TestCase):
+    def test_from_quorums(self):
+        rng = random.Random(0)
+        names = list(map(lambda x: 'n%d' % x, range(12)))
+        region_names = ('r0', 'r1', 'r2', 'r3')
+
+        quorums = dict()
+        for name in names:
+            region_name = rng.choice(region_names)
+            validators = dict(map(
+                lambda x: (x, rng.sample(names, rng.randint(0, 3))),
+                rng.sample(region_names, 3),
+            ))
+            quorums[name] = dict(node=name, validators=validators, region=region_name)
+
+        expected = dict()
+        for v0, v1 in itertools.product(names, repeat=2):
+            region_name, other = quorums[v0]['region'], quorums[v1]['region']
+            if region_name == other or region_name not in quorums[v1]['validators']:
+                continue
+
+            key = tuple(sorted((region_name, other)))
+            expected.setdefault(key, set()).update(quorums[v1]['validators'][region_name])
+
+        region_graph = RegionGraph.from_quorums(quorums)
+        self.assertEqual(sorted(region_graph.regions), sorted(set(map(lambda x: x['region'], quorums.values()))))
+        self.assertEqual(region_graph.common, expected)
+        self.assertEqual(
+            sorted(region_graph.edges),
+            sorted(map(lambda x: x[0] + (len(x[1]),), expected.items())),
+        )
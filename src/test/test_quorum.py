@@ -0,0 +1,322 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+
+from tnb.quorum import (
+    AvailableQuorumCommons,
+    CandidateStore,
+    RegionalQuorum,
+    ShapeMemo,
+    ValidatorIndex,
+    VectorQuorumCommons,
+    evaluate_commons,
+    make_regions,
+    make_ring_distances,
+    numpy,
+)
+
+
+class BaseTest:
+    def make_regions(self, *sizes):
+        return make_regions(sizes)
+
+    def make_distances(self, regions):
+        return make_ring_distances(regions)
+
+    def compose(self, regions, failure, engine, seed=0, group_size=None):
+        random.seed(seed)
+
+        return RegionalQuorum(
+            regions,
+            failure,
+            2,
+            engine=engine,
+            group_size=group_size,
+        ).compose(self.make_distances(regions))
+
+
+class TestValidatorIndex(unittest.TestCase):
+    def test_mask(self):
+        index = ValidatorIndex(('a', 'b', 'c'))
+
+        self.assertEqual(index.mask(('a', 'c')), 0b101)
+        self.assertEqual(index.unmask(0b110), ['b', 'c'])
+        self.assertEqual(index.mask(('d',)), 0b1000)
+
+
+class TestEngines(unittest.TestCase, BaseTest):
+    shapes = (
+        ((4, 4, 4, 4), 1),
+        ((7, 7, 7), 2),
+        ((5, 9, 13), 1),
+        ((9, 11, 8, 12, 10), 2),
+    )
+
+    def assertSameWithSet(self, engine, group_size=None, other='set'):
+        for sizes, failure in self.shapes:
+            regions = self.make_regions(*sizes)
+            for seed in range(2):
+                self.assertEqual(
+                    self.compose(regions, failure, engine, seed, group_size),
+                    self.compose(regions, failure, other, seed, group_size),
+                )
+
+    def test_bitset(self):
+        self.assertSameWithSet('bitset')
+
+    def test_solver(self):
+        self.assertSameWithSet('solver')
+
+    @unittest.skipIf(numpy is None, '`numpy` is missing')
+    def test_vector(self):
+        self.assertSameWithSet('vector')
+
+    def test_branch_and_bound(self):
+        self.assertSameWithSet('branch_and_bound')
+        self.assertSameWithSet('branch_and_bound', group_size=7, other='bitset')
+
+
+class TestCandidateStore(unittest.TestCase, BaseTest):
+    def test_materialized(self):
+        regions = self.make_regions(5, 5)
+        qc = AvailableQuorumCommons('r0-r1', regions['r0'], regions['r1'], 1, store=CandidateStore())
+
+        commons = qc.make()
+        self.assertTrue(len(commons) > 0)
+        self.assertEqual(list(qc.make()), list(commons))
+        self.assertEqual(len(qc.commons_min_size), len(list(qc.commons_min_size)))
+
+        margin = commons.safety_margins()[0]
+        for c, value in commons.get_by_safety(margin):
+            self.assertEqual(sum(value['safety']), margin)
+
+    def test_eviction(self):
+        store = CandidateStore(max_candidates=100)
+        regions = self.make_regions(7, 7, 7, 7)
+        RegionalQuorum(regions, 2, 2, store=store).compose(self.make_distances(regions))
+
+        self.assertTrue(store.size <= 100 or len(store.pairs) == 1)
+
+    def test_already_safe(self):
+        ra = ['a', 'b', 'c', 'd', 'e', 'x']
+        rb = ['a', 'b', 'c', 'd', 'e', 'y']
+
+        self.assertEqual(RegionalQuorum(dict(r0=ra, r1=rb), 1).compose_pair('r0-r1', ra, rb), (ra, rb))
+
+
+class TestPlan(unittest.TestCase, BaseTest):
+    def test_near_regions(self):
+        regions = self.make_regions(*([4] * 6))
+        distances = dict(r0=[(0.1, ['r1', 'r2']), (0.2, ['r3']), (0.3, ['r4', 'r5'])])
+
+        # one region of each level, and the rest from the nearest level
+        cases = (
+            (1, ({'r1'}, {'r2'})),
+            (2, ({'r1', 'r3'}, {'r2', 'r3'})),
+            (3, ({'r1', 'r3', 'r4'}, {'r1', 'r3', 'r5'}, {'r2', 'r3', 'r4'}, {'r2', 'r3', 'r5'})),
+            (4, ({'r1', 'r2', 'r3', 'r4'}, {'r1', 'r2', 'r3', 'r5'})),
+        )
+        for n, expected in cases:
+            for seed in range(5):
+                near = RegionalQuorum(regions, 1, n, seed=seed).get_near_regions(distances, 'r0')
+                self.assertIn(set(near), expected)
+                self.assertEqual(len(near), len(set(near)))
+
+        self.assertEqual(len(RegionalQuorum(regions, 1, 10).get_near_regions(distances, 'r0')), 5)
+
+
+class TestParallel(unittest.TestCase, BaseTest):
+    def test_schedule(self):
+        regions = self.make_regions(*([4] * 8))
+        rq = RegionalQuorum(regions, 1, 2, seed=1)
+        pairs = rq.plan(self.make_distances(regions))
+
+        rounds = rq.schedule(pairs)
+        self.assertEqual(sorted(itertools.chain(*rounds)), sorted(pairs))
+        for pairs_round in rounds:
+            regions_round = list(itertools.chain(*pairs_round))
+            self.assertEqual(len(regions_round), len(set(regions_round)))
+
+    def test_compose(self):
+        regions = self.make_regions(5, 6, 7, 5, 6, 7)
+        distances = self.make_distances(regions)
+
+        self.assertEqual(
+            RegionalQuorum(regions, 1, 2, engine='bitset', seed=3).compose(distances, workers=2),
+            RegionalQuorum(regions, 1, 2, engine='bitset', seed=3).compose(distances),
+        )
+
+    def test_compose_best(self):
+        regions = self.make_regions(5, 6, 7, 5)
+        distances = self.make_distances(regions)
+
+        quorums, seed, score = RegionalQuorum(regions, 1, 2, seed=3).compose_best(distances, 4, workers=2)
+        self.assertEqual(
+            (quorums, seed, score),
+            RegionalQuorum(regions, 1, 2, seed=3).compose_best(distances, 4),
+        )
+        self.assertEqual(RegionalQuorum(regions, 1, 2, seed=seed).compose(distances), quorums)
+        self.assertEqual(score['total_size'], sum(map(len, quorums.values())))
+
+
+class TestStats(unittest.TestCase, BaseTest):
+    def test_compose(self):
+        regions = self.make_regions(5, 6, 7, 5)
+        distances = self.make_distances(regions)
+
+        rq = RegionalQuorum(regions, 1, 2, engine='bitset', seed=3)
+        rq.compose(distances)
+
+        stats = rq.stats.as_dict()
+        self.assertEqual(stats['engine'], 'bitset')
+        self.assertEqual(list(map(lambda x: tuple(x['name']), stats['pairs'])), list(map(lambda x: tuple(sorted(x)), rq.pairs)))
+        for pair in stats['pairs']:
+            self.assertGreaterEqual(pair['chains'], pair['passed']['commons_min_size'])
+            self.assertGreaterEqual(pair['passed']['commons_min_size'], pair['passed']['commons_liveness'])
+            self.assertGreaterEqual(pair['passed']['commons_liveness'], pair['passed']['commons_safety'])
+            self.assertGreaterEqual(pair['chosen']['safety'][0], 0)
+
+    def test_workers(self):
+        regions = self.make_regions(5, 6, 7, 5, 6, 7)
+        distances = self.make_distances(regions)
+
+        rq = RegionalQuorum(regions, 1, 2, engine='bitset', seed=3)
+        rq.compose(distances, workers=2)
+        parallel = rq.stats.as_dict()['pairs']
+
+        rq = RegionalQuorum(regions, 1, 2, engine='bitset', seed=3)
+        rq.compose(distances)
+        serial = rq.stats.as_dict()['pairs']
+
+        for stats in (parallel, serial):
+            for pair in stats:
+                del pair['elapsed']
+
+        self.assertEqual(
+            sorted(parallel, key=lambda x: x['name']),
+            sorted(serial, key=lambda x: x['name']),
+        )
+
+
+class TestShapeMemo(unittest.TestCase, BaseTest):
+    def test_same_quorums(self):
+        regions = self.make_regions(*([4] * 10))
+        distances = self.make_distances(regions)
+
+        for engine in ('set', 'solver'):
+            rq = RegionalQuorum(regions, 1, 2, engine=engine, seed=1, memo=ShapeMemo())
+            quorums = rq.compose(distances)
+
+            self.assertEqual(
+                quorums,
+                RegionalQuorum(regions, 1, 2, engine=engine, seed=1).compose(distances),
+            )
+            self.assertGreater(len(list(filter(lambda x: x.memoized, rq.stats.pairs))), 0)
+
+    def test_opt_in(self):
+        regions = self.make_regions(*([4] * 10))
+
+        rq = RegionalQuorum(regions, 1, 2, seed=1)
+        rq.compose(self.make_distances(regions))
+
+        self.assertIsNone(rq.memo)
+        self.assertFalse(any(map(lambda x: x.memoized, rq.stats.pairs)))
+
+    def test_mapped_names(self):
+        memo = ShapeMemo()
+        rq = RegionalQuorum(dict(), 1, memo=memo)
+        composed = rq.compose_pair(('a', 'b'), ['a0', 'a1', 'a2', 'a3'], ['b0', 'b1', 'b2', 'b3'])
+
+        self.assertEqual(
+            rq.compose_pair(('c', 'd'), ['c0', 'c1', 'c2', 'c3'], ['d0', 'd1', 'd2', 'd3']),
+            tuple(map(lambda x: list(map(lambda y: y.replace('a', 'c').replace('b', 'd'), x)), composed)),
+        )
+        self.assertTrue(rq.stats.pairs[-1].memoized)
+
+    def test_save(self):
+        regions = self.make_regions(5, 6, 7, 5)
+        distances = self.make_distances(regions)
+
+        memo = ShapeMemo()
+        quorums = RegionalQuorum(regions, 1, 2, seed=3, memo=memo).compose(distances)
+
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            memo.save(path)
+
+            loaded = ShapeMemo()
+            loaded.load(path)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(loaded.shapes, memo.shapes)
+
+        rq = RegionalQuorum(regions, 1, 2, seed=3, memo=loaded)
+        self.assertEqual(rq.compose(distances), quorums)
+        self.assertTrue(all(map(lambda x: x.memoized, rq.stats.pairs)))
+
+    def test_eviction(self):
+        memo = ShapeMemo(max_shapes=2)
+        for i in range(4):
+            memo.put(('set', 1, None, 1, (-1,) * i), ['a'], ['b'], None, None)
+
+        self.assertEqual(len(memo), 2)
+        self.assertNotIn(('set', 1, None, 1, ()), memo)
+
+
+class TestRecompose(unittest.TestCase, BaseTest):
+    def test_not_changed(self):
+        regions = self.make_regions(*([7] * 6))
+        distances = self.make_distances(regions)
+        previous = RegionalQuorum(regions, 2, 2, engine='bitset', seed=1).compose(distances)
+
+        rq = RegionalQuorum(regions, 2, 2, engine='bitset', seed=2)
+        self.assertEqual(rq.recompose(previous, regions, distances), previous)
+        self.assertEqual(rq.pairs, list())
+
+    def test_added_validator(self):
+        regions = self.make_regions(*([7] * 10))
+        distances = self.make_distances(regions)
+        previous = RegionalQuorum(regions, 2, 2, engine='bitset', seed=1).compose(distances)
+
+        changed = dict(map(lambda x: (x[0], list(x[1])), regions.items()))
+        changed['r5'].append('r5-99')
+
+        rq = RegionalQuorum(changed, 2, 2, engine='bitset', seed=1)
+        quorums = rq.recompose(previous, regions, distances)
+
+        self.assertIn('r5-99', quorums['r5'])
+        self.assertTrue(all(map(lambda x: 'r5' in x, rq.pairs)))
+        for r in set(regions.keys()) - set(itertools.chain(*rq.pairs)):
+            self.assertIs(quorums[r], previous[r])
+
+    def test_removed_validator(self):
+        regions = self.make_regions(*([7] * 6))
+        distances = self.make_distances(regions)
+        previous = RegionalQuorum(regions, 2, 2, engine='bitset', seed=1).compose(distances)
+
+        changed = dict(map(lambda x: (x[0], list(x[1])), regions.items()))
+        changed['r2'].remove('r2-00')
+
+        quorums = RegionalQuorum(changed, 2, 2, engine='bitset', seed=1).recompose(previous, regions, distances)
+        self.assertNotIn('r2-00', set(itertools.chain(*quorums.values())))
+
+
+@unittest.skipIf(numpy is None, '`numpy` is missing')
+class TestVectorEvaluation(unittest.TestCase, BaseTest):
+    def test_evaluate_commons(self):
+        regions = self.make_regions(5, 7, 9)
+        qcs = (
+            VectorQuorumCommons('r0-r1', regions['r0'], regions['r1'], 1),
+            VectorQuorumCommons('r1-r2', regions['r1'], regions['r2'], 1),
+            VectorQuorumCommons('r0-r2', regions['r0'], regions['r2'], 2),
+        )
+        evaluations = evaluate_commons(qcs)
+
+        for qc, e in zip(qcs, evaluations):
+            expected = VectorQuorumCommons(qc.name, qc.ra, qc.rb, qc.failure).evaluate()
+            for k in ('cn', 'liveness', 'safety', 'shared', 'passed_safety', 'order'):
+                self.assertEqual(e[k].tolist(), expected[k].tolist())
@@ -0,0 +1,86 @@
+import os
+import pathlib
+import stat
+import tempfile
+import unittest
+
+from graphviz import Digraph
+
+from tnb.render import RenderStage
+
+
+class TestRenderStage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_engine(self, name, script):
+        '''
+        the fake graphviz; `$4` is the output file.
+        '''
+        engine = self.path.joinpath(name)
+        engine.write_text('#!/bin/sh\n%s\n' % script)
+        engine.chmod(engine.stat().st_mode | stat.S_IEXEC)
+
+        return str(engine)
+
+    def make_digraph(self):
+        g = Digraph('G', format='png', engine='fdp')
+        g.edge('a', 'b')
+
+        return g
+
+    def submit(self, name, executable, timeout=1):
+        stage = RenderStage(timeout=timeout, executable=executable)
+        stage.submit(name, self.make_digraph(), self.path.joinpath(name))
+
+        return stage.wait()[name]
+
+    @unittest.skipIf(os.name != 'posix', 'fake graphviz needs sh')
+    def test_render(self):
+        path, elapsed, error = self.submit('copy', self.make_engine('copy', '[ "$1" = -Kfdp ] && cat > "$4"'))
+
+        self.assertIsNone(error)
+        self.assertEqual(path, self.path.joinpath('copy.png'))
+        self.assertIn('a -> b', path.read_text())
+
+    @unittest.skipIf(os.name != 'posix', 'fake graphviz needs sh')
+    def test_neato_no_op(self):
+        executable = self.make_engine('pinned', '[ "$5" = -n1 ] && cat > "$4"')
+
+        stage = RenderStage(executable=executable)
+        stage.submit('pinned', self.make_digraph(), self.path.joinpath('pinned'), neato_no_op=1)
+        stage.submit('free', self.make_digraph(), self.path.joinpath('free'))
+
+        results = stage.wait()
+        self.assertIsNone(results['pinned'][2])
+        self.assertIsNotNone(results['free'][2])
+
+    @unittest.skipIf(os.name != 'posix', 'fake graphviz needs sh')
+    def test_failed(self):
+        _, _, error = self.submit('fail', self.make_engine('fail', 'echo broken >&2; exit 1'))
+        self.assertEqual(error, 'broken')
+
+        _, _, error = self.submit('missing', str(self.path.joinpath('missing')))
+        self.assertIsNotNone(error)
+
+    @unittest.skipIf(os.name != 'posix', 'fake graphviz needs sh')
+    def test_timeout(self):
+        _, _, error = self.submit('slow', self.make_engine('slow', 'sleep 10'), timeout=0.5)
+        self.assertIn('timed out', error)
+
+    @unittest.skipIf(os.name != 'posix', 'fake graphviz needs sh')
+    def test_concurrent(self):
+        executable = self.make_engine('copy', 'cat > "$4"')
+
+        stage = RenderStage(workers=2, executable=executable)
+        for name in ('a', 'b', 'c'):
+            stage.submit(name, self.make_digraph(), self.path.joinpath(name))
+
+        results = stage.wait()
+        self.assertEqual(sorted(results.keys()), ['a', 'b', 'c'])
+        self.assertTrue(all(map(lambda x: x[2] is None, results.values())))
+        self.assertIsNone(stage.executor)
@@ -0,0 +1,98 @@
+import random
+import unittest
+
+from tnb import simulation
+from tnb.intersection import get_threshold
+
+
+def make_quorums(validators_by_region, trusted):
+    quorums = dict()
+    for region_name, names in validators_by_region.items():
+        validators = dict(map(lambda x: (x, validators_by_region[x]), trusted[region_name]))
+        for name in names:
+            quorums[name] = dict(region=region_name, validators=validators)
+
+    return quorums
+
+
+@unittest.skipIf(simulation.numpy is None, 'numpy is not installed')
+class TestQuorumSimulation(unittest.TestCase):
+    def test_one_region(self):
+        quorums = make_quorums(dict(r0=['n0', 'n1', 'n2', 'n3']), dict(r0=['r0']))
+
+        s = simulation.QuorumSimulation(quorums, dict(), intra_rtt=2, processing=0, jitter=0)
+        times = s.run(trials=3, seed=0)
+
+        # the nomination from the leader and 1ms of each stage
+        self.assertEqual(times.tolist(), [[7.0] * 4] * 3)
+
+        report = s.report(times)
+        self.assertEqual(report['regions'], dict(r0={50: 7.0, 90: 7.0, 99: 7.0}))
+        self.assertEqual(report['nodes']['n0'], {50: 7.0, 90: 7.0, 99: 7.0})
+
+    def test_far_region(self):
+        # r1 trusts only r0, which is 100ms away
+        quorums = make_quorums(
+            dict(r0=['a0', 'a1', 'a2'], r1=['b0', 'b1', 'b2']),
+            dict(r0=['r0'], r1=['r0']),
+        )
+
+        s = simulation.QuorumSimulation(
+            quorums,
+            {('r0', 'r1'): 100, ('r1', 'r0'): 100},
+            validators=['a0', 'a1', 'a2'],
+            intra_rtt=0,
+            processing=0,
+            jitter=0,
+        )
+        times = s.run(trials=5, seed=0)
+
+        for trial in times:
+            self.assertEqual(trial[:3].tolist(), [0] * 3)
+            self.assertEqual(trial[3:].tolist(), [50] * 3)
+
+    def test_never_externalized(self):
+        # the quorum set of r1 has the validators, which are not in quorums
+        quorums = make_quorums(dict(r0=['a0', 'a1', 'a2']), dict(r0=['r0']))
+        quorums['b0'] = dict(region='r1', validators=dict(r1=['b0', 'x0', 'x1']))
+
+        s = simulation.QuorumSimulation(quorums, {('r0', 'r1'): 10, ('r1', 'r0'): 10})
+        report = s.report(s.run(trials=10, seed=0))
+
+        self.assertEqual(report['nodes']['b0'], {50: None, 90: None, 99: None})
+        self.assertIsNotNone(report['regions']['r0'][99])
+
+    def test_receive(self):
+        # the groups with the own statements are same with the brute force
+        rng = random.Random(0)
+        regions = ['r%d' % i for i in range(4)]
+        validators_by_region = dict(map(lambda x: (x, ['%sn%d' % (x, i) for i in range(5)]), regions))
+        trusted = dict(map(lambda x: (x, rng.sample(regions, 2)), regions))
+        quorums = make_quorums(validators_by_region, trusted)
+        rtts = dict()
+        for a in regions:
+            for b in regions:
+                if a != b:
+                    rtts[(a, b)] = rng.randint(1, 50)
+
+        s = simulation.QuorumSimulation(quorums, rtts)
+        r = simulation.numpy.random.RandomState(0)
+        for _ in range(20):
+            sent = r.uniform(0, 10, len(s.validators))
+            delays = s.get_delays(r)
+            times = s.receive(sent, delays)
+
+            vid = dict(map(lambda x: (x[1], x[0]), enumerate(s.validators)))
+            for i, name in enumerate(s.names):
+                members = set()
+                for vs in quorums[name]['validators'].values():
+                    members.update(vs)
+                members.add(name)
+
+                region = s.node_region[i]
+                arrivals = sorted(map(
+                    lambda x: sent[vid[x]] + (0 if x == name else delays[s.validator_region[vid[x]], region]),
+                    members,
+                ))
+                expected = arrivals[get_threshold(len(members), s.threshold_percent) - 1]
+                self.assertAlmostEqual(times[i], expected)
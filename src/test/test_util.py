@@ -0,0 +1,83 @@
+import itertools
+import random
+import unittest
+
+from tnb.util import (
+    TagIndex,
+    calculate_tags_distance,
+    get_distances_by_region,
+)
+
+
+class TestTagsDistance(unittest.TestCase):
+    def test_distance(self):
+        self.assertEqual(calculate_tags_distance([0, 'a'], [0, 'a']), 0)
+        self.assertEqual(calculate_tags_distance([0, 'a', 'b'], [0, 'a', 'c']), 0.5 / 10)
+        self.assertEqual(calculate_tags_distance([0, 'a'], [0, 'b']), 1 / 10)
+        self.assertEqual(calculate_tags_distance([1], [3]), 2 / 10)
+        self.assertEqual(calculate_tags_distance([0], [9]), 1 / 10)
+        self.assertEqual(calculate_tags_distance([9], [0]), 1 / 10)
+        self.assertEqual(calculate_tags_distance([], [0]), 1)
+
+    def test_distances_by_region(self):
+        distances = {
+            ('r0', 'r1'): 0.1,
+            ('r0', 'r2'): 0.2,
+            ('r0', 'r3'): 0.1,
+        }
+
+        self.assertEqual(get_distances_by_region(distances, 'r0'), [(0.1, ['r1', 'r3']), (0.2, ['r2'])])
+
+
+class TestTagIndex(unittest.TestCase):
+    def make_tags(self, rng):
+        tags = dict()
+        for i in range(rng.randint(1, 12)):
+            if rng.random() < 0.05:
+                tags['r%d' % i] = list()
+                continue
+
+            tags['r%d' % i] = [rng.randint(0, 9)] + list(map(lambda x: rng.choice('ab'), range(rng.randint(0, 3))))
+
+        return tags
+
+    def test_levels(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            tags = self.make_tags(rng)
+            index = TagIndex(tags)
+
+            distances = dict()
+            for a, b in itertools.combinations(sorted(tags.keys()), 2):
+                distances[(a, b)] = calculate_tags_distance(tags[a], tags[b])
+
+            for region_name in tags.keys():
+                self.assertEqual(index.levels(region_name), get_distances_by_region(distances, region_name), tags)
+
+    def test_query(self):
+        index = TagIndex(dict(
+            r0=[0, 'a', 'b'],
+            r1=[0, 'a', 'b'],
+            r2=[0, 'a', 'c'],
+            r3=[1, 'a'],
+            r4=[9, 'a'],
+            r5=[5],
+        ))
+
+        self.assertEqual(index.nearest('r0', 1), ['r1'])
+        self.assertEqual(index.nearest('r0', 4), ['r1', 'r2', 'r3', 'r4'])
+        self.assertEqual(index.nearest('r0', 10), ['r1', 'r2', 'r3', 'r4', 'r5'])
+        self.assertEqual(index.at_distance('r0', 0.1), ['r3', 'r4'])
+        self.assertEqual(index.at_distance('r0', 0.3), list())
+
+    def test_longer_tags(self):
+        # r2 shares the longer prefix, but it has more tags, so it is farther than r1
+        index = TagIndex(dict(
+            r0=[0, 'a', 'b'],
+            r1=[0, 'a', 'z'],
+            r2=[0, 'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k'],
+        ))
+
+        self.assertEqual(index.levels('r0'), [(0.5 / 10, ['r1']), ((1 - 2 / 11) / 10, ['r2'])])
+        self.assertEqual(index.nearest('r0', 1), ['r1'])
+        self.assertEqual(index.at_distance('r0', (1 - 2 / 11) / 10), ['r2'])
@@ -0,0 +1,360 @@
+'''
+# availability under random node failures
+
+the quorum sets of `Builder.make_quorums()` or `quorums.json` are checked
+with the random failure sets; each node fails independently by its
+probability, and the probabilities of liveness and safety are estimated
+with their confidence intervals.
+
+* the quorum set of node is flat like `tnb.intersection`; the validators of
+  `quorum['validators']` and the node itself, if it is validator, with
+  `THRESHOLD_PERCENT`
+* the failure sets are sampled in batches; the sets of nodes are the rows
+  of numpy bitsets, `numpy.packbits()` in uint64 words and counted by
+  popcount
+* liveness: the surviving validators, which can not reach the threshold of
+  their quorum sets are removed until nothing changes; the rest is the
+  largest quorum. The sample is live, if every surviving node reaches its
+  threshold in it.
+* safety: the failed nodes may say anything, so they are deleted from the
+  quorum sets; the threshold of each quorum set is reduced by its failed
+  nodes. The sample is safe, if the surviving validators still have the
+  quorum intersection of `tnb.intersection.QuorumIntersection`, or have no
+  quorum at all. Like `tnb.intersection`, the quorum sets of the watchers
+  are not checked.
+* the validators, which have the same quorum set and are in the same
+  quorum sets are interchangeable, so the samples, which have the same
+  numbers of the failed validators by these classes are searched once
+* the batches are run in the process pool; each chunk of samples has its
+  own seed, so the result does not depend on the number of workers
+'''
+
+import concurrent.futures
+import logging
+import math
+import statistics
+
+from .intersection import (
+    QuorumIntersection,
+    get_threshold,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+log = logging.getLogger(__name__)
+
+if numpy is not None and not hasattr(numpy, 'bitwise_count'):
+    POPCOUNT_TABLE = numpy.array(list(map(lambda x: bin(x).count('1'), range(256))), dtype=numpy.uint8)
+else:
+    POPCOUNT_TABLE = None
+
+
+def pack(bits):
+    '''
+    the rows of booleans as the bitsets; the words are uint64, if
+    `numpy.bitwise_count()` is available, or uint8.
+    '''
+    packed = numpy.packbits(bits, axis=-1)
+    if POPCOUNT_TABLE is not None:
+        return packed
+
+    padding = (-packed.shape[-1]) % 8
+    if padding:
+        packed = numpy.concatenate((packed, numpy.zeros(packed.shape[:-1] + (padding,), dtype=numpy.uint8)), axis=-1)
+
+    return numpy.ascontiguousarray(packed).view(numpy.uint64)
+
+
+def popcount(packed):
+    '''
+    the numbers of the set bits of the bitsets along the last axis.
+    '''
+    if POPCOUNT_TABLE is None:
+        return numpy.bitwise_count(packed).sum(axis=-1, dtype=numpy.int64)
+
+    return POPCOUNT_TABLE[packed].sum(axis=-1, dtype=numpy.int64)
+
+
+def get_interval(successes, n, confidence=None):
+    '''
+    the Wilson score interval of the probability, `(low, high)`.
+    '''
+    if confidence is None:
+        confidence = 0.95
+
+    if n < 1:
+        return (0.0, 1.0)
+
+    z = statistics.NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+
+    return (max(0.0, center - margin), min(1.0, center + margin))
+
+
+def run_chunk(analysis, samples, seed):
+    return analysis.run_samples(samples, numpy.random.default_rng(seed))
+
+
+class FailureAnalysis:
+    threshold_percent = 67
+    failure_probability = 0.01
+
+    # the samples of each seed
+    chunk_size = 1 << 16
+
+    # the bytes of the largest array of each batch
+    batch_bytes = 1 << 25
+
+    names = None
+    validators = None
+    probabilities = None
+    quorum_sets = None
+    class_nodes = None
+    safety = None
+
+    def __init__(self, quorums, probabilities=None, validators=None, threshold_percent=None):
+        '''
+        `probabilities` is the failure probability of every node or the
+        probabilities by node name; the missing nodes have
+        `failure_probability`. `validators` is the names of validator nodes;
+        if it is missing, the nodes, which are in any quorum set are
+        validators.
+        '''
+        if numpy is None:
+            raise ImportError('`numpy` is required for the failure analysis')
+
+        if threshold_percent is not None:
+            self.threshold_percent = threshold_percent
+
+        quorum_sets = dict()
+        for name, quorum in quorums.items():
+            members = set()
+            for vs in quorum['validators'].values():
+                members.update(vs)
+
+            quorum_sets[name] = members
+
+        if validators is None:
+            validators = set()
+            for members in quorum_sets.values():
+                validators.update(members)
+
+        # the validators, which are not in `quorums` are always failed
+        unknown = sorted(set(validators) - set(quorums.keys()))
+        if unknown:
+            log.warning('availability: unknown validators, which are always failed: %s', unknown)
+
+        self.names = list(quorums.keys()) + unknown
+        ids = dict(map(lambda x: (x[1], x[0]), enumerate(self.names)))
+
+        if probabilities is None:
+            probabilities = self.failure_probability
+
+        if isinstance(probabilities, dict):
+            self.probabilities = numpy.array(list(map(
+                lambda x: probabilities.get(x, self.failure_probability),
+                self.names,
+            )), dtype=numpy.float64)
+        else:
+            self.probabilities = numpy.full(len(self.names), probabilities, dtype=numpy.float64)
+
+        self.probabilities[len(quorums):] = 1
+
+        self.validators = list(filter(lambda x: x in validators, self.names))
+        self.is_validator = numpy.zeros(len(self.names), dtype=bool)
+        self.is_validator[list(map(lambda x: ids[x], self.validators))] = True
+
+        # the nodes, which have the same quorum set are checked at once
+        groups = dict()
+        group_of = list()
+        for name in self.names:
+            members = set(quorum_sets.get(name, ()))
+            if name in validators:
+                members.add(name)
+
+            threshold = get_threshold(len(members), self.threshold_percent)
+            key = (tuple(sorted(filter(lambda x: x in ids, members))), threshold)
+            if key not in groups:
+                groups[key] = len(groups)
+
+            group_of.append(groups[key])
+
+        self.group_of = numpy.array(group_of, dtype=numpy.int64)
+        self.group_threshold = numpy.array(list(map(lambda x: x[1], groups.keys())), dtype=numpy.int64)
+
+        members = numpy.zeros((len(groups), len(self.names)), dtype=bool)
+        for (names, _), g in groups.items():
+            members[g, list(map(lambda x: ids[x], names))] = True
+
+        self.group_masks = pack(members)
+
+        # the quorum sets of the validators, which are searched for safety;
+        # the unknown validators have no quorum set
+        self.quorum_sets = dict()
+        for name in self.validators:
+            if name in quorums:
+                self.quorum_sets[name] = set(quorum_sets[name]) | set((name,))
+
+        referenced = dict()
+        for name, members in self.quorum_sets.items():
+            for member in members:
+                referenced.setdefault(member, set()).add(name)
+
+        classes = dict()
+        class_of = list()
+        for name in self.validators:
+            key = (frozenset(self.quorum_sets.get(name, ())), frozenset(referenced.get(name, ())))
+            if key not in classes:
+                classes[key] = len(classes)
+
+            class_of.append(classes[key])
+
+        self.class_nodes = numpy.zeros((len(self.names), len(classes)), dtype=numpy.int64)
+        self.class_nodes[list(map(lambda x: ids[x], self.validators)), class_of] = 1
+
+        # the safety by the numbers of the failed validators of the classes
+        self.safety = dict()
+
+        log.debug(
+            'availability: nodes=%d validators=%d quorum sets=%d classes=%d',
+            len(self.names),
+            len(self.validators),
+            len(groups),
+            len(classes),
+        )
+
+    def get_batch_size(self):
+        width = max(self.group_masks.nbytes // max(len(self.group_masks), 1), 1)
+        rows = max(len(self.group_masks), 1)
+
+        return max(1, self.batch_bytes // (width * rows))
+
+    def count(self, packed, masks):
+        '''
+        the numbers of the shared nodes of the samples and the masks,
+        `samples × masks`.
+        '''
+        return popcount(packed[:, None, :] & masks[None, :, :])
+
+    def check_liveness(self, alive):
+        '''
+        whether every surviving node reaches the threshold of its quorum
+        set in the largest quorum of the surviving validators.
+        '''
+        in_quorum = alive & self.is_validator
+        node_reached = numpy.zeros(alive.shape, dtype=bool)
+
+        # only the samples, which removed the validators are checked again
+        rows = numpy.arange(len(alive))
+        while len(rows):
+            reached = self.count(pack(in_quorum[rows]), self.group_masks) >= self.group_threshold
+            node_reached[rows] = reached[:, self.group_of]
+
+            found = in_quorum[rows] & node_reached[rows]
+            changed = (found != in_quorum[rows]).any(axis=1)
+            in_quorum[rows] = found
+            rows = rows[changed]
+
+        return (node_reached | ~alive).all(axis=1)
+
+    def is_safe(self, failed):
+        '''
+        whether the quorums of the surviving validators intersect, after
+        `failed`, the failed validators are deleted from the quorum sets.
+        '''
+        quorum_sets = dict()
+        thresholds = dict()
+        for name, members in self.quorum_sets.items():
+            if name in failed:
+                continue
+
+            quorum_sets[name] = sorted(members - failed)
+            thresholds[name] = max(
+                get_threshold(len(members), self.threshold_percent) - len(members & failed),
+                0,
+            )
+
+        qi = QuorumIntersection(quorum_sets, threshold_percent=self.threshold_percent, thresholds=thresholds)
+
+        return qi.check() or qi.no_quorum
+
+    def check_safety(self, alive):
+        '''
+        whether the quorums of the surviving validators intersect in each
+        sample.
+        '''
+        failed = ~alive & self.is_validator
+        counts = failed.astype(numpy.int64) @ self.class_nodes
+        found, first, inverse = numpy.unique(counts, axis=0, return_index=True, return_inverse=True)
+
+        safe = numpy.zeros(len(found), dtype=bool)
+        for i, row in enumerate(found):
+            key = row.tobytes()
+            if key not in self.safety:
+                names = map(lambda x: self.names[x], numpy.flatnonzero(failed[first[i]]))
+                self.safety[key] = self.is_safe(set(names))
+
+            safe[i] = self.safety[key]
+
+        return safe[inverse.reshape(-1)]
+
+    def run_samples(self, samples, rng):
+        '''
+        the numbers of the live, safe and both samples in `samples` random
+        failure sets.
+        '''
+        batch_size = self.get_batch_size()
+
+        live = safe = both = 0
+        for start in range(0, samples, batch_size):
+            n = min(batch_size, samples - start)
+            alive = rng.random((n, len(self.names))) >= self.probabilities
+
+            is_live = self.check_liveness(alive)
+            is_safe = self.check_safety(alive)
+
+            live += int(is_live.sum())
+            safe += int(is_safe.sum())
+            both += int((is_live & is_safe).sum())
+
+        return (live, safe, both)
+
+    def run(self, samples, seed=None, workers=None, confidence=None):
+        '''
+        the estimated probabilities of liveness and safety,
+        `{"liveness": {"probability": p, "interval": [low, high]}, ..}`.
+        '''
+        chunks = list()
+        for start in range(0, samples, self.chunk_size):
+            chunks.append(min(self.chunk_size, samples - start))
+
+        seeds = numpy.random.SeedSequence(seed).spawn(len(chunks))
+
+        if workers == 1 or len(chunks) < 2:
+            results = list(map(lambda x: run_chunk(self, x[0], x[1]), zip(chunks, seeds)))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run_chunk, [self] * len(chunks), chunks, seeds))
+
+        counts = dict(
+            liveness=sum(map(lambda x: x[0], results)),
+            safety=sum(map(lambda x: x[1], results)),
+            both=sum(map(lambda x: x[2], results)),
+        )
+
+        report = dict(samples=samples, confidence=0.95 if confidence is None else confidence)
+        for key, count in counts.items():
+            report[key] = dict(
+                count=count,
+                probability=count / samples if samples > 0 else 0.0,
+                interval=list(get_interval(count, samples, confidence=report['confidence'])),
+            )
+
+        return report
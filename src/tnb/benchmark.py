@@ -0,0 +1,230 @@
+'''
+# scaling benchmark of the quorum composition
+
+sweeps the number of regions, the number of validators in each region and
+the number of failure, and composes the quorums with `RegionalQuorum` for
+each case and engine.
+
+* `elapsed`: wall time of `RegionalQuorum.compose()` in seconds, measured
+  without `tracemalloc`
+* `peak_memory`: peak of the allocated memory by `tracemalloc` in bytes; it
+  is measured by the separate run of the same case, so the overhead of the
+  tracing is not in `elapsed`
+* `candidates`: the number of the candidates materialized in each stage of
+  `AvailableQuorumCommons`
+* `memo_hits`: the number of the region pairs, whose commons were reused by
+  `ShapeMemo`; the shapes are memoized only with `memo`, so the engines are
+  measured without the memo by default
+
+the results are written as JSON, so the results of the different builds can
+be compared.
+'''
+
+import argparse
+import collections
+import itertools
+import json
+import logging
+import pathlib
+import sys
+import time
+import tracemalloc
+from pprint import pformat  # noqa
+import tabulate
+
+from .quorum import (
+    AvailableQuorumCommons,
+    CandidateStore,
+    RegionalQuorum,
+    ShapeMemo,
+    make_regions,
+    make_ring_distances,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+class CountingStore(CandidateStore):
+    '''
+    counts the candidates of each stage, which were put; the counts are kept
+    after the candidates are evicted.
+    '''
+    counts = None
+
+    def __init__(self, *a, **kw):
+        super(CountingStore, self).__init__(*a, **kw)
+
+        self.counts = collections.OrderedDict(map(
+            lambda x: (x, 0),
+            ('commons_min_size', 'commons_liveness', 'commons_safety'),
+        ))
+
+    def put(self, key, candidates):
+        self.counts[candidates.stage] = self.counts.get(candidates.stage, 0) + len(candidates)
+
+        return super(CountingStore, self).put(key, candidates)
+
+
+def run_case(number_of_regions, number_of_validators, failure, engine, seed=None, group_size=None, memo=False):
+    '''
+    composes the quorums of one case and returns the result.
+    '''
+    regions = make_regions([number_of_validators] * number_of_regions)
+    distances = make_ring_distances(regions)
+
+    def make(store=None):
+        return RegionalQuorum(
+            regions,
+            failure,
+            2,
+            engine=engine,
+            store=store,
+            group_size=group_size,
+            seed=seed,
+            memo=ShapeMemo() if memo else None,
+        )
+
+    store = CountingStore()
+    rq = make(store=store)
+
+    started = time.perf_counter()
+    quorums = rq.compose(distances)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        make().compose(distances)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return dict(
+        regions=number_of_regions,
+        validators=number_of_validators,
+        failure=failure,
+        engine=engine,
+        seed=seed,
+        group_size=rq.group_size,
+        composed=quorums is not None,
+        pairs=len(rq.pairs),
+        elapsed=elapsed,
+        peak_memory=peak,
+        candidates=dict(store.counts),
+        memo_hits=len(list(filter(lambda x: x.memoized, rq.stats.pairs))),
+    )
+
+
+def run(regions, validators, failures, engines, seed=None, group_size=None, repeat=None, memo=False):
+    '''
+    runs all the cases of the sweep; the case, which can not have the minimum
+    size, `3 * failure + 1` is skipped. If `repeat` is given, the fastest one
+    of the repeated runs is kept.
+    '''
+    if repeat is None or repeat < 1:
+        repeat = 1
+
+    results = list()
+    for nr, nv, f, engine in itertools.product(regions, validators, failures, engines):
+        if nv < 3 * f + 1:
+            log.debug('skipped: regions=%d validators=%d failure=%d', nr, nv, f)
+            continue
+
+        result = min(
+            map(lambda x: run_case(nr, nv, f, engine, seed=seed, group_size=group_size, memo=memo), range(repeat)),
+            key=lambda x: x['elapsed'],
+        )
+        log.debug('result: %s', result)
+
+        results.append(result)
+
+    return results
+
+
+def summarize(results):
+    headers = (
+        'engine', 'regions', 'validators', 'failure', 'composed', 'pairs',
+        'elapsed(s)', 'peak(KiB)', 'min_size', 'liveness', 'safety', 'memo_hits',
+    )
+
+    rows = list()
+    for r in results:
+        rows.append((
+            r['engine'],
+            r['regions'],
+            r['validators'],
+            r['failure'],
+            r['composed'],
+            r['pairs'],
+            '%.4f' % r['elapsed'],
+            r['peak_memory'] // 1024,
+            r['candidates'].get('commons_min_size', 0),
+            r['candidates'].get('commons_liveness', 0),
+            r['candidates'].get('commons_safety', 0),
+            r.get('memo_hits', 0),
+        ))
+
+    return tabulate.tabulate(rows, headers=headers, tablefmt='grid')
+
+
+def parse_numbers(s):
+    return tuple(map(int, s.split(',')))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.ERROR,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    )
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-verbose', action='store_true')
+    parser.add_argument('-regions', type=parse_numbers, default=(3, 4, 6), help='numbers of regions, separated by comma')
+    parser.add_argument('-validators', type=parse_numbers, default=(4, 7), help='numbers of validators in each region, separated by comma')
+    parser.add_argument('-failures', type=parse_numbers, default=(1, 2), help='numbers of failure, separated by comma')
+    parser.add_argument(
+        '-engine',
+        action='append',
+        choices=sorted(RegionalQuorum.engines.keys()),
+        help='engines to be measured; all the engines by default',
+    )
+    parser.add_argument(
+        '-group-size',
+        type=int,
+        default=AvailableQuorumCommons.group_size,
+        help='maximum number of the validator groups in each region to make the commons',
+    )
+    parser.add_argument('-seed', type=int, default=0, help='random seed to choose the near regions')
+    parser.add_argument('-repeat', type=int, default=1, help='number of runs of each case; the fastest one is kept')
+    parser.add_argument('-output', help='file to write the results as JSON')
+    parser.add_argument('-memo', action='store_true', help='reuse the chosen commons of the same shape of region pair')
+
+    options = parser.parse_args()
+
+    if options.verbose:
+        logging.root.setLevel(logging.DEBUG)
+
+    log.debug('options: %s', pformat(options.__dict__))
+
+    engines = options.engine
+    if not engines:
+        engines = sorted(RegionalQuorum.engines.keys())
+
+    results = run(
+        options.regions,
+        options.validators,
+        options.failures,
+        engines,
+        seed=options.seed,
+        group_size=options.group_size,
+        repeat=options.repeat,
+        memo=options.memo,
+    )
+
+    print(summarize(results))
+
+    if options.output:
+        pathlib.Path(options.output).write_text(json.dumps(results, indent=2))
+        print('results saved to', options.output)
+
+    sys.exit(0)
@@ -1,4 +1,6 @@
+import hashlib
 import itertools
+import json
 import logging
 from pprint import pprint  # noqa
 from graphviz import Digraph
@@ -12,13 +14,25 @@ from .design import (
     Nodes,
 )
 from .util import (
-    calculate_tags_distance,
-    get_distances_by_region,
+    TagIndex,
+)
+from .latency import (
+    LatencyMatrix,
+    get_distances as get_latency_distances,
 )
 from .quorum import (
     RegionalQuorum,
     print_quorum,
 )
+from .graph import Graph
+from .overlap import (
+    QuorumOverlap,
+    RegionGraph,
+)
+from .diagnostics import (
+    Lazy,
+    trace,
+)
 
 
 log = logging.getLogger(__name__)
@@ -28,6 +42,144 @@ def flatten_items(l):
     return list(itertools.chain(*l.values()))
 
 
+def get_previous_regions(quorums):
+    '''
+    the composed quorums and the validators by region from the quorums of
+    `Builder.make_quorums()`; the quorum of region is shared by the nodes of
+    region, and the 'extra' of quorum is the validators of region.
+    '''
+    previous_quorums = dict()
+    previous_regions = dict()
+    for node in sorted(quorums.keys()):
+        q = quorums[node]
+        if q['region'] in previous_quorums:
+            continue
+
+        previous_quorums[q['region']] = sorted(flatten_items(q['validators']))
+        previous_regions[q['region']] = sorted(q['validators'].get('extra', ()))
+
+    return previous_quorums, previous_regions
+
+
+def get_quorum_set_hash(validators):
+    '''
+    the sha256 of the quorum set; the validators by region are sorted, so the
+    same quorum set has the same hash.
+    '''
+    content = json.dumps(
+        sorted(map(lambda x: (x[0], sorted(x[1])), validators.items())),
+        separators=(',', ':'),
+    )
+
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def compact_quorums(quorums):
+    '''
+    the compact form of the quorums of `Builder.make_quorums()`; each quorum
+    set is kept once by its hash in `quorum_sets`, and the nodes refer it by
+    `quorum_set`.
+    '''
+    quorum_sets = dict()
+    nodes = dict()
+    for name, q in quorums.items():
+        quorum_set_hash = q.get('quorum_set')
+        if quorum_set_hash is None:
+            quorum_set_hash = get_quorum_set_hash(q['validators'])
+
+        quorum_sets.setdefault(quorum_set_hash, q['validators'])
+
+        node = dict(q)
+        del node['validators']
+        node['quorum_set'] = quorum_set_hash
+        nodes[name] = node
+
+    return dict(
+        quorum_sets=quorum_sets,
+        nodes=nodes,
+    )
+
+
+def expand_quorums(data):
+    '''
+    the quorums from `compact_quorums()`; the nodes share the `validators` of
+    same quorum set. The quorums, which are not compact are returned as they
+    are.
+    '''
+    if 'quorum_sets' not in data or 'nodes' not in data:
+        return data
+
+    quorums = dict()
+    for name, node in data['nodes'].items():
+        q = dict(node)
+        q['validators'] = data['quorum_sets'][node['quorum_set']]
+        quorums[name] = q
+
+    return quorums
+
+
+def load_quorums(content):
+    '''
+    loads `quorums.json`, compact or not.
+    '''
+    return expand_quorums(json.loads(content))
+
+
+class DesignIndex:
+    '''
+    the lookups between the nodes, the instances and the regions of design,
+    built in one pass;
+    * `instance_by_node`, `region_by_node`, `region_by_instance`: the names
+    * `validators_by_instance`, `nodes_by_instance`: the validators and the
+      non-validator nodes in the order of `Instance.nodes`
+    * `validators_by_region`, `nodes_by_region`: same, in the order of
+      instances
+    '''
+    instance_by_node = None
+    region_by_node = None
+    region_by_instance = None
+    validators_by_instance = None
+    nodes_by_instance = None
+    validators_by_region = None
+    nodes_by_region = None
+
+    def __init__(self, regions, instances, nodes):
+        self.instance_by_node = dict()
+        self.region_by_node = dict()
+        self.region_by_instance = dict()
+        self.validators_by_instance = dict()
+        self.nodes_by_instance = dict()
+        self.validators_by_region = dict()
+        self.nodes_by_region = dict()
+
+        for region_name, region in regions.regions.items():
+            for instance_name in region.instances:
+                # the first region wins like `Regions.get_region_by_instance()`
+                self.region_by_instance.setdefault(instance_name, region_name)
+
+        for instance_name, instance in instances.instances.items():
+            region_name = self.region_by_instance.get(instance_name)
+
+            validators = list()
+            others = list()
+            for n in instance.nodes:
+                self.instance_by_node[n] = instance_name
+                self.region_by_node[n] = region_name
+                if nodes.nodes[n].is_validator:
+                    validators.append(n)
+                else:
+                    others.append(n)
+
+            self.validators_by_instance[instance_name] = validators
+            self.nodes_by_instance[instance_name] = others
+
+            if region_name is None:
+                continue
+
+            self.validators_by_region.setdefault(region_name, list()).extend(validators)
+            self.nodes_by_region.setdefault(region_name, list()).extend(others)
+
+
 class Builder:
     design = None
     modules = None
@@ -37,7 +189,12 @@ class Builder:
     databases = None
     history = None
     nodes = None
+    index = None
     number_of_connected_regions = None
+    latency = None
+    composition = None
+    recomposition = None
+    stats = None
 
     color_gradient = ('gray70', 'gray66', 'gray61', 'gray57', 'gray52', 'gray48', 'gray43')
     distance_distributtion = None
@@ -52,12 +209,45 @@ class Builder:
         self.databases = Databases.from_design(self.design)
         self.history = History.from_design(self.design)
         self.nodes = Nodes.from_design(self.design)
+        self.index = DesignIndex(self.regions, self.instances, self.nodes)
 
         self.number_of_connected_regions = self.network.number_of_connected_regions
         if self.number_of_connected_regions > len(self.regions.regions) - 1:
             self.number_of_connected_regions = len(self.regions.regions) - 1
 
-    def make_quorums(self):
+        if self.network.latency is not None:
+            self.latency = LatencyMatrix.load(self.network.latency)
+
+    def get_quorums_inputs(self, **options):
+        '''
+        the inputs, which `make_quorums()` depends on; the regions with their
+        tags and instances, the nodes of instances, the failure, the digest
+        of the measured latency and `options`, the options of
+        `make_quorums()`.
+        '''
+        regions = dict()
+        for region_name, region in self.regions.regions.items():
+            instances = dict()
+            for instance_name in region.instances:
+                instances[instance_name] = dict(
+                    validators=self.index.validators_by_instance[instance_name],
+                    nodes=self.index.nodes_by_instance[instance_name],
+                )
+
+            regions[region_name] = dict(
+                tags=region.tags,
+                instances=instances,
+            )
+
+        return dict(
+            regions=regions,
+            failure=self.network.number_of_failure,
+            number_of_connected_regions=self.number_of_connected_regions,
+            latency=None if self.latency is None else self.latency.digest(),
+            options=options,
+        )
+
+    def make_quorums(self, engine=None, group_size=None, seed=None, workers=None, attempts=None, previous=None, memo=None):
         '''
         Scenario
         ========
@@ -74,62 +264,70 @@ class Builder:
         1. calculte the number of 'common' in each region: Cn <= Vn - Fn
         1. traverse region to check the 'safety'
             1. make region pairs by distance
-                1. each region makes quorum intersection with 2 other regions
+                1. each region makes quorum intersection with
+                   `network.number_of_connected_regions` nearest regions
             1. region pairs: Fn(safety) <= 2Cn - Vn - 1
             1. to satisfy the safety, choose the common validators
         1. traverse region to check the 'liveness'
             1. region pairs: Fn(liveness) <= Vn - Cn
             1. to satisfy the liveness, choose the common validators
+
+        If `previous`, the quorums of the previous `make_quorums()` is given,
+        only the region pairs of the changed regions are composed again, and
+        the quorums of the nodes, which are not changed are kept as they are.
+        `memo` is the `ShapeMemo` to reuse the chosen commons.
         '''
 
         # validators
-        instances_by_node = dict()
-        regions_by_node = dict()
-        nodes_by_region = dict()
-        for instance_name, instance in self.instances.instances.items():
-            region = self.regions.get_region_by_instance(instance_name)
-            nodes_by_region.setdefault(region.name, dict(validators=list(), nodes=list()))
-            nodes_by_region[region.name]['validators'].extend(instance.get_validators(self.nodes.nodes))
-            nodes_by_region[region.name]['nodes'].extend(instance.get_nodes(self.nodes.nodes))
-
-            for n in instance.nodes:
-                instances_by_node[n] = instance_name
-                regions_by_node[n] = region.name
-
-        validators_by_region = dict()
-        for region_name, v in nodes_by_region.items():
-            validators_by_region[region_name] = v['validators']
+        instances_by_node = self.index.instance_by_node
+        regions_by_node = self.index.region_by_node
+        validators_by_region = self.index.validators_by_region
 
         # distance
-        distance_tags = dict(map(
+        tag_index = TagIndex(dict(map(
             lambda x: (x[0], x[1].tags),
             self.regions.regions.items(),
-        ))
-
-        distances_by_tags = dict()
-        sorted_regions = sorted(distance_tags.keys())
-        for index, region_name in enumerate(sorted_regions):
-            for other in sorted_regions[index + 1:]:
-                ratio = calculate_tags_distance(
-                    distance_tags[region_name],
-                    distance_tags[other],
-                )
-
-                key = tuple(sorted((region_name, other)))
-                distances_by_tags[key] = ratio
+        )))
 
-        distances = dict()
-        for region in sorted_regions:
-            distances[region] = get_distances_by_region(distances_by_tags, region)
+        if self.latency is None:
+            distances = dict()
+            for region in sorted(self.regions.regions.keys()):
+                distances[region] = tag_index.levels(region)
+        else:
+            distances = get_latency_distances(self.latency, tag_index, self.regions.regions.keys())
 
-        regions = RegionalQuorum(
+        rq = RegionalQuorum(
             validators_by_region,
             self.network.number_of_failure,
-            2,
-        ).compose(distances)
+            self.number_of_connected_regions,
+            engine=engine,
+            group_size=group_size,
+            seed=seed,
+            memo=memo,
+        )
+
+        if previous is not None:
+            previous_quorums, previous_regions = get_previous_regions(previous)
+            regions = rq.recompose(previous_quorums, previous_regions, distances, workers=workers)
+        elif attempts is None or attempts < 2:
+            regions = rq.compose(distances, workers=workers)
+        else:
+            regions = None
+            best = rq.compose_best(distances, attempts, workers=workers)
+            if best is not None:
+                regions, seed, score = best
+                self.composition = dict(
+                    seed=seed,
+                    min_safety=score['min_safety'],
+                    total_size=score['total_size'],
+                    overlap_balance=score['overlap_balance'],
+                )
+
+        self.stats = rq.stats
 
         for r, v in regions.items():
-            log.debug('\n' + print_quorum(r, v, regions, validators_by_region[r], self.network.number_of_failure))
+            log.debug('\n%s', Lazy(print_quorum, r, v, regions, validators_by_region[r], self.network.number_of_failure))
+            trace.emit('quorum', region=r, validators=v)
 
         all_nodes = sorted(itertools.chain(
             *map(
@@ -138,29 +336,117 @@ class Builder:
             )
         ))
 
+        # the nodes of region share one quorum set
+        quorum_sets = dict()
+        for region_name, validators in regions.items():
+            qs = dict(
+                extra=sorted(set(validators_by_region[region_name]) & set(validators)),
+            )
+            for rn, vs in regions.items():
+                if rn == region_name:
+                    continue
+
+                qs[rn] = sorted(set(validators) & set(vs))
+
+            quorum_sets[region_name] = (get_quorum_set_hash(qs), qs)
+
         quorums = dict()
         for v in all_nodes:
             region_name = regions_by_node[v]
             validators = regions[region_name]
 
+            if previous is not None and v in previous:
+                q = previous[v]
+                if q['region'] == region_name and q['instance'] == instances_by_node[v] \
+                        and set(flatten_items(q['validators'])) == set(validators):
+                    quorums[v] = q
+                    continue
+
+            quorum_set_hash, qs = quorum_sets[region_name]
             quorums[v] = dict(
                 node=v,
-                validators=dict(
-                    extra=list(set(validators_by_region[region_name]) & set(validators)),
-                ),
+                validators=qs,
+                quorum_set=quorum_set_hash,
                 region=region_name,
                 instance=instances_by_node[v],
             )
 
-            for rn, vs in regions.items():
-                if rn == region_name:
-                    continue
-
-                quorums[v]['validators'][rn] = list(set(validators) & set(vs))
+        if previous is not None:
+            changed = sorted(filter(lambda x: quorums[x] is not previous.get(x), quorums.keys()))
+            self.recomposition = dict(
+                pairs=rq.pairs,
+                nodes=changed,
+            )
+            log.debug('%d nodes were changed: %s', len(changed), changed)
 
         return quorums
 
+    def get_quorums_graph(self, quorums):
+        '''
+        the graph of regions for `tnb.graph`; same with `make_quorums_graph()`.
+        '''
+        g = Graph('quorums')
+
+        region_graph = RegionGraph.from_quorums(quorums)
+        for region_name in region_graph.regions:
+            g.add_node(region_name)
+
+        for region_name, other, count in region_graph.edges:
+            g.add_edge(region_name, other, weight=count)
+
+        return g
+
+    def get_quorum_validators_graph(self, quorums, direct=False):
+        '''
+        the graph of nodes for `tnb.graph`; same with
+        `make_quorum_validators_graph()`, or with
+        `make_quorum_validators_direct_graph()` if `direct`.
+        '''
+        g = Graph('validators-direct' if direct else 'validators')
+
+        for instance_name, instance in self.instances.instances.items():
+            for v in instance.nodes:
+                g.add_node(v, group=instance_name)
+
+        for v0, v1, count in QuorumOverlap(quorums).connected():
+            g.add_edge(v0, v1, weight=None if direct else count)
+
+        return g
+
+    def add_instance_clusters(self, g, positions=None):
+        '''
+        adds the nodes by the cluster of instance; if `positions` of
+        `tnb.layout.layout()` is given, the nodes are pinned and laid out by
+        `neato` instead of `fdp`. The pinned `pos` is in points, so the graph
+        is rendered by `neato -n`, which keeps the positions as they are.
+        '''
+        if positions is not None:
+            g.engine = 'neato'
+            g.graph_attr.update(splines='false')
+
+        for instance_name, instance in self.instances.instances.items():
+            with g.subgraph(name='cluster_%s' % instance_name) as c:
+                c.attr(style='filled, dashed, rounded', color='gray68', fillcolor='gray96', fontcolor='gray22')
+                c.attr(label=instance_name)
+
+                for v in instance.nodes:
+                    if positions is None:
+                        c.node('%s%s' % (instance_name, v), label=v)
+                    else:
+                        c.node('%s%s' % (instance_name, v), label=v, pos='%.1f,%.1f!' % tuple(map(lambda x: x * 72, positions[v])))
+
+        return
+
     def make_quorums_graph(self, quorums, dpi=None, output_format=None, output=None):
+        g = self.get_quorums_digraph(quorums, dpi=dpi, output_format=output_format)
+        if output is not None:
+            g.render(output, cleanup=True)
+
+            return
+
+        return g.pipe(format=g.format)
+
+    def get_quorums_digraph(self, quorums, dpi=None, output_format=None):
         if dpi is None:
             dpi = 300
 
@@ -182,44 +468,37 @@ class Builder:
             penwidth='0'
         )
 
-        connected = dict()
-        quorum_names = list(quorums.keys())
-        for v0 in quorum_names:
-            region_name = quorums[v0]['region']
+        region_graph = RegionGraph.from_quorums(quorums)
+        for region_name in region_graph.regions:
             g.node(region_name)
 
-            for v1 in quorum_names:
-                other = quorums[v1]['region']
-                if region_name == other:
-                    continue
-
-                key = tuple(sorted((region_name, other)))
-                if region_name not in quorums[v1]['validators']:
-                    continue
-
-                connected.setdefault(key, list())
-                connected[key] = set(connected[key]) | set(quorums[v1]['validators'][region_name])
+        edges = region_graph.edges
+        if edges:
+            range_count = (max(map(lambda x: x[2], edges)), min(map(lambda x: x[2], edges)))
 
-        range_count = (max(map(lambda x: len(x), connected.values())), min(map(lambda x: len(x), connected.values())))
-        for key, vs in connected.items():
-            count = len(vs)
+        for region_name, other, count in edges:
             penwidth = (count - range_count[1]) / range_count[0] * 10
             g.edge(
-                *key,
+                region_name,
+                other,
                 arrowhead='dot',
                 arrowtail='dot',
                 dir='both',
                 penwidth=str(penwidth if penwidth > 0.5 else 0.5),
                 label=str(count))
 
+        return g
+
+    def make_quorum_validators_graph(self, quorums, output_format=None, dpi=None, output=None):
+        g = self.get_quorum_validators_digraph(quorums, output_format=output_format, dpi=dpi)
         if output is not None:
             g.render(output, cleanup=True)
 
             return
 
-        return g.pipe(format=output_format)
+        return g.pipe(format=g.format)
 
-    def make_quorum_validators_graph(self, quorums, output_format=None, dpi=None, output=None):
+    def get_quorum_validators_digraph(self, quorums, output_format=None, dpi=None, positions=None):
         assert type(quorums) in (dict,)
 
         if output_format is None:
@@ -243,75 +522,43 @@ class Builder:
             penwidth='0'
         )
 
-        for instance_name, instance in self.instances.instances.items():
-            with g.subgraph(name='cluster_%s' % instance_name) as c:
-                c.attr(style='filled, dashed, rounded', color='gray68', fillcolor='gray96', fontcolor='gray22')
-                c.attr(label=instance_name)
-
-                for v in instance.nodes:
-                    c.node('%s%s' % (instance_name, v), label=v)
-
-        range_connected = None
-        quorum_names = list(quorums.keys())
-        for index, v0 in enumerate(quorum_names):
-            for v1 in quorum_names[index + 1:]:
-                vs0 = flatten_items(quorums[v0]['validators'])
-                vs1 = flatten_items(quorums[v1]['validators'])
-
-                connected = len(set(vs0) & set(vs1))
-
-                if range_connected is None:
-                    range_connected = [connected, connected]
-                    continue
-
-                if connected > range_connected[0]:
-                    range_connected[0] = connected
-                elif connected < range_connected[1]:
-                    range_connected[1] = connected
-
-        connected_quorums = list()
-        for index, v0 in enumerate(quorum_names[:]):
-            for v1 in quorum_names[index + 1:]:
-                vs0 = flatten_items(quorums[v0]['validators'])
-                vs1 = flatten_items(quorums[v1]['validators'])
-                if v0 not in vs1:
-                    continue
+        self.add_instance_clusters(g, positions)
 
-                key = tuple(sorted((v0, v1)))
-                if key in connected_quorums:
-                    continue
+        overlap = QuorumOverlap(quorums)
+        range_connected = overlap.range()
 
-                connected_quorums.append(key)
+        for v0, v1, len_connected in overlap.connected():
+            if range_connected[0] - range_connected[1] < 1:
+                weight = 0
+            else:
+                weight = ((len_connected - range_connected[1]) / (range_connected[0] - range_connected[1]))
+            penwidth = ((weight * 10) ** 1.9) / 10
+            # color = self.color_gradient[round(weight * len(self.color_gradient)) - 1]
+            g.edge(
+                '%s%s' % (quorums[v0]['instance'], v0),
+                '%s%s' % (quorums[v1]['instance'], v1),
+                arrowsize='0.4',
+                arrowhead='dot',
+                arrowtail='dot',
+                dir='both',
+                penwidth=str(penwidth if penwidth > 1 else 1.5),
+                label=str(len_connected),
+                fontcolor='#aaaaaaff',
+                color='#aaaaaa44',
+            )
 
-                connected_nodes = set(vs0) & set(vs1)
-                len_connected = len(connected_nodes)
-                if range_connected[0] - range_connected[1] < 1:
-                    weight = 0
-                else:
-                    weight = ((len_connected - range_connected[1]) / (range_connected[0] - range_connected[1]))
-                penwidth = ((weight * 10) ** 1.9) / 10
-                # color = self.color_gradient[round(weight * len(self.color_gradient)) - 1]
-                g.edge(
-                    '%s%s' % (quorums[v0]['instance'], v0),
-                    '%s%s' % (quorums[v1]['instance'], v1),
-                    arrowsize='0.4',
-                    arrowhead='dot',
-                    arrowtail='dot',
-                    dir='both',
-                    penwidth=str(penwidth if penwidth > 1 else 1.5),
-                    label=str(len(connected_nodes)),
-                    fontcolor='#aaaaaaff',
-                    color='#aaaaaa44',
-                )
+        return g
 
+    def make_quorum_validators_direct_graph(self, quorums, output_format=None, dpi=None, output=None):
+        g = self.get_quorum_validators_direct_digraph(quorums, output_format=output_format, dpi=dpi)
         if output is not None:
             g.render(output, cleanup=True)
 
             return
 
-        return g.pipe(format=output_format)
+        return g.pipe(format=g.format)
 
-    def make_quorum_validators_direct_graph(self, quorums, output_format=None, dpi=None, output=None):
+    def get_quorum_validators_direct_digraph(self, quorums, output_format=None, dpi=None, positions=None):
         assert type(quorums) in (dict,)
 
         if output_format is None:
@@ -335,46 +582,19 @@ class Builder:
             penwidth='0'
         )
 
-        for instance_name, instance in self.instances.instances.items():
-            with g.subgraph(name='cluster_%s' % instance_name) as c:
-                c.attr(style='filled, dashed, rounded', color='gray68', fillcolor='gray96', fontcolor='gray22')
-                c.attr(label=instance_name)
-
-                for v in instance.nodes:
-                    c.node('%s%s' % (instance_name, v), label=v)
-
-        connected_quorums = list()
-        quorum_names = list(quorums.keys())
-        for index, v0 in enumerate(quorum_names[:]):
-            for v1 in quorum_names[index + 1:]:
-                vs1 = flatten_items(quorums[v1]['validators'])
-                if v0 not in vs1:
-                    continue
+        self.add_instance_clusters(g, positions)
 
-                key = tuple(sorted((v0, v1)))
-                if key in connected_quorums:
-                    continue
-
-                if v0 not in vs1:
-                    continue
-
-                connected_quorums.append(key)
-
-                g.edge(
-                    '%s%s' % (quorums[v0]['instance'], v0),
-                    '%s%s' % (quorums[v1]['instance'], v1),
-                    arrowsize='0.4',
-                    arrowhead='dot',
-                    arrowtail='dot',
-                    dir='both',
-                    penwidth=str(0.3),
-                    fontcolor='#aaaaaaff',
-                    color='#aaaaaaaa',
-                )
-
-        if output is not None:
-            g.render(output, cleanup=True)
-
-            return
+        for v0, v1, _ in QuorumOverlap(quorums).connected():
+            g.edge(
+                '%s%s' % (quorums[v0]['instance'], v0),
+                '%s%s' % (quorums[v1]['instance'], v1),
+                arrowsize='0.4',
+                arrowhead='dot',
+                arrowtail='dot',
+                dir='both',
+                penwidth=str(0.3),
+                fontcolor='#aaaaaaff',
+                color='#aaaaaaaa',
+            )
 
-        return g.pipe(format=output_format)
+        return g
@@ -0,0 +1,150 @@
+'''
+# cache of the composed quorums
+
+the quorums of `Builder.make_quorums()` are saved in the cache directory by
+the hash of the inputs, which the quorums depend on; the topology of regions,
+instances and nodes, the tags, the failure, the measured latency, the options
+of composition and the version of the algorithm, that is, the source of
+`tnb.quorum`, `tnb.builder`, `tnb.latency` and `tnb.util`. When the size of
+the cache directory is over `max_size`, the least recently used quorums are
+removed. The stats of the composition are kept next to the quorums, so the
+cached run can still save them.
+
+the composition without the seed is random, so only the seeded quorums are
+cached.
+'''
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+
+
+log = logging.getLogger(__name__)
+
+default_directory = pathlib.Path('~/.cache/stellar-nice-body/quorums').expanduser()
+
+
+def algorithm_version():
+    from . import quorum, builder, latency, util
+
+    h = hashlib.sha256()
+    for m in (quorum, builder, latency, util):
+        h.update(pathlib.Path(m.__file__).read_bytes())
+
+    return h.hexdigest()
+
+
+class QuorumCache:
+    suffix = '.json'
+    stats_suffix = '.stats'
+
+    directory = None
+    max_size = None
+
+    def __init__(self, directory=None, max_size=None):
+        if directory is None:
+            directory = default_directory
+
+        if max_size is None:
+            max_size = 64 * 1024 * 1024
+
+        self.directory = pathlib.Path(directory)
+        self.max_size = max_size
+
+    @staticmethod
+    def make_key(inputs):
+        h = hashlib.sha256()
+        h.update(algorithm_version().encode())
+        h.update(json.dumps(inputs, sort_keys=True).encode())
+
+        return h.hexdigest()
+
+    def get_path(self, key):
+        return self.directory.joinpath(key + self.suffix)
+
+    def get_stats_path(self, key):
+        return self.directory.joinpath(key + self.stats_suffix)
+
+    def get(self, key):
+        path = self.get_path(key)
+        try:
+            quorums = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        # the recently used one is kept longer
+        os.utime(str(path))
+        log.debug('quorums found in cache: %s', path)
+
+        return quorums
+
+    def get_stats(self, key):
+        '''
+        the stats of the composition of the cached quorums; `None` if they
+        were not saved.
+        '''
+        try:
+            return json.loads(self.get_stats_path(key).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, quorums, stats=None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if stats is not None:
+            stats_path = self.get_stats_path(key)
+            tmp = stats_path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(stats))
+            tmp.replace(stats_path)
+
+        path = self.get_path(key)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(quorums))
+        tmp.replace(path)
+        log.debug('quorums saved in cache: %s', path)
+
+        self.evict(keep=path)
+
+        return
+
+    def evict(self, keep=None):
+        files = list()
+        for p in self.directory.glob('*' + self.suffix):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+
+            # the stats are counted and removed with their quorums
+            stats_path = p.with_suffix(self.stats_suffix)
+            try:
+                stats_size = stats_path.stat().st_size
+            except OSError:
+                stats_size = 0
+
+            files.append((st.st_mtime, st.st_size + stats_size, p))
+
+        size = sum(map(lambda x: x[1], files))
+        for _, file_size, p in sorted(files, key=lambda x: x[0]):
+            if size <= self.max_size:
+                break
+
+            if p == keep:
+                continue
+
+            try:
+                p.unlink()
+            except OSError:
+                continue
+
+            try:
+                p.with_suffix(self.stats_suffix).unlink()
+            except OSError:
+                pass
+
+            size -= file_size
+            log.debug('quorums evicted from cache: %s', p)
+
+        return
@@ -0,0 +1,167 @@
+import json
+import logging
+import pathlib
+import time
+
+import tabulate
+
+from ..validator import Validator
+from ..availability import FailureAnalysis
+from ..builder import Builder, load_quorums
+from ..intersection import QuorumIntersection
+from ..quorum import (
+    AvailableQuorumCommons,
+    RegionalQuorum,
+)
+from ..util import print_error
+from ..exceptions import ValidationError
+
+
+log = logging.getLogger(__name__)
+
+
+def subparser(subparser):
+    parser = subparser.add_parser(
+        'analyze',
+        help='check the quorum intersection of the quorum sets',
+    )
+    parser.set_defaults(command='analyze')
+
+    parser.add_argument(
+        '-quorums',
+        help='set existing `quorums.json`',
+    )
+
+    parser.add_argument(
+        '-threshold',
+        type=int,
+        default=QuorumIntersection.threshold_percent,
+        help='set the `THRESHOLD_PERCENT` of the quorum sets',
+    )
+
+    parser.add_argument(
+        '-engine',
+        default='set',
+        choices=sorted(RegionalQuorum.engines.keys()),
+        help='set the engine to find the available commons of quorums',
+    )
+
+    parser.add_argument(
+        '-group-size',
+        type=int,
+        default=AvailableQuorumCommons.group_size,
+        help='set the maximum number of the validator groups in each region to make the commons',
+    )
+
+    parser.add_argument(
+        '-seed',
+        type=int,
+        help='set the random seed to choose the near regions and to sample the failures',
+    )
+
+    parser.add_argument(
+        '-samples',
+        type=int,
+        help='set the number of the random failure sets to estimate the liveness and safety',
+    )
+
+    parser.add_argument(
+        '-failure-probability',
+        type=float,
+        default=FailureAnalysis.failure_probability,
+        help='set the failure probability of each node',
+    )
+
+    parser.add_argument(
+        '-failure-probabilities',
+        help='set JSON file of the failure probabilities by node name',
+    )
+
+    parser.add_argument(
+        '-confidence',
+        type=float,
+        default=0.95,
+        help='set the confidence level of the intervals',
+    )
+
+    parser.add_argument(
+        '-workers',
+        type=int,
+        help='set the number of the processes to sample the failures',
+    )
+
+    return
+
+
+def run(parser, args):
+    try:
+        Validator(args.design).validate()
+    except ValidationError as e:
+        print_error('found problems: %s' % e)
+
+        return 1
+
+    builder = Builder(args.design)
+    if args.quorums:
+        quorums = load_quorums(pathlib.Path(args.quorums).read_text())
+    else:
+        quorums = builder.make_quorums(
+            engine=args.engine,
+            group_size=args.group_size,
+            seed=args.seed,
+        )
+
+    validators = list(map(
+        lambda x: x[0],
+        filter(lambda x: x[1].is_validator, builder.nodes.nodes.items()),
+    ))
+
+    started = time.time()
+    qi = QuorumIntersection.from_quorums(quorums, validators=validators, threshold_percent=args.threshold)
+    intersected = qi.check()
+    log.debug('checked quorum intersection: elapsed=%0.3fs visited=%d', time.time() - started, qi.visited)
+
+    if not intersected:
+        if qi.no_quorum:
+            print_error('found no quorum: the thresholds of the quorum sets can not be reached')
+        else:
+            print_error('found split: %s and %s' % qi.split)
+
+        return 1
+
+    print('OK')
+
+    if args.samples:
+        return run_failure_analysis(args, builder, quorums, validators)
+
+    return 0
+
+
+def run_failure_analysis(args, builder, quorums, validators):
+    probabilities = dict()
+    if args.failure_probabilities:
+        probabilities = json.loads(pathlib.Path(args.failure_probabilities).read_text())
+
+    probabilities = dict(map(
+        lambda x: (x, probabilities.get(x, args.failure_probability)),
+        quorums.keys(),
+    ))
+
+    started = time.time()
+    fa = FailureAnalysis(quorums, probabilities=probabilities, validators=validators, threshold_percent=args.threshold)
+    report = fa.run(args.samples, seed=args.seed, workers=args.workers, confidence=args.confidence)
+    log.debug('sampled failures: elapsed=%0.3fs samples=%d', time.time() - started, args.samples)
+
+    headers = ('', 'probability', 'interval(%g%%)' % (report['confidence'] * 100))
+    rows = list()
+    for key in ('liveness', 'safety', 'both'):
+        rows.append((
+            key,
+            '%.6f' % report[key]['probability'],
+            '%.6f - %.6f' % tuple(report[key]['interval']),
+        ))
+
+    print('failure_safety=%d samples=%d' % (builder.network.number_of_failure, args.samples))
+    print(tabulate.tabulate(rows, headers=headers, tablefmt='grid'))
+
+    return 0
@@ -7,6 +7,25 @@ import pathlib
 
 from ..validator import Validator
 from ..docker_compose import DockerCompose
+from ..builder import (
+    compact_quorums,
+    expand_quorums,
+    load_quorums,
+)
+from ..quorum import (
+    AvailableQuorumCommons,
+    RegionalQuorum,
+    ShapeMemo,
+)
+from ..cache import QuorumCache
+from ..diagnostics import trace
+from ..graph import (
+    write as write_graph,
+    writers as graph_writers,
+)
+from ..latency import LatencyMatrix
+from ..layout import layout
+from ..render import RenderStage
 from ..util import print_error
 from ..exceptions import (
     ValidationError,
@@ -27,6 +46,22 @@ def subparser(subparser):
         help='set existing `quorums.json`',
     )
 
+    parser.add_argument(
+        '-previous',
+        help='set previous `quorums.json`; only the quorums of the changed regions are composed again',
+    )
+
+    parser.add_argument(
+        '-compact',
+        action='store_true',
+        help='save `quorums.json` in compact form; each quorum set is saved once',
+    )
+
+    parser.add_argument(
+        '-latency',
+        help='set the measured latency matrix of the regions, CSV or binary; overrides `network.latency`',
+    )
+
     parser.add_argument(
         '-template',
         help='set template directory',
@@ -36,6 +71,96 @@ def subparser(subparser):
         '-not-flat',
         action='store_true',
     )
+
+    parser.add_argument(
+        '-engine',
+        default='set',
+        choices=sorted(RegionalQuorum.engines.keys()),
+        help='set the engine to find the available commons of quorums',
+    )
+
+    parser.add_argument(
+        '-group-size',
+        type=int,
+        default=AvailableQuorumCommons.group_size,
+        help='set the maximum number of the validator groups in each region to make the commons',
+    )
+
+    parser.add_argument(
+        '-seed',
+        type=int,
+        help='set the random seed to choose the near regions',
+    )
+
+    parser.add_argument(
+        '-workers',
+        type=int,
+        help='set the number of processes to compose the region pairs',
+    )
+
+    parser.add_argument(
+        '-attempts',
+        type=int,
+        help='set the number of the seeded compositions to choose the best quorums',
+    )
+    parser.add_argument(
+        '-stats',
+        action='store_true',
+        help='save the stats of the quorum composition as `stats.json`',
+    )
+    parser.add_argument(
+        '-no-cache',
+        action='store_true',
+        help='do not use the cached quorums; the quorums are cached only with `-seed`',
+    )
+
+    parser.add_argument(
+        '-cache-dir',
+        help='set the directory of the cached quorums',
+    )
+
+    parser.add_argument(
+        '-memo',
+        help='set the file to load and save the chosen commons by the shape of region pair',
+    )
+
+    parser.add_argument(
+        '-graph-format',
+        action='append',
+        choices=sorted(graph_writers.keys()),
+        help='set the format of the graph files; `json` by default',
+    )
+
+    parser.add_argument(
+        '-render-graph',
+        action='store_true',
+        help='render the graphs as png with graphviz',
+    )
+
+    parser.add_argument(
+        '-layout',
+        default='fdp',
+        choices=('fdp', 'native'),
+        help='set the layout of the rendered validators graphs; `native` computes the positions with numpy',
+    )
+
+    parser.add_argument(
+        '-render-workers',
+        type=int,
+        help='set the number of processes to render the graphs',
+    )
+
+    parser.add_argument(
+        '-render-timeout',
+        type=float,
+        default=600,
+        help='set the timeout of each render in seconds',
+    )
+
+    parser.add_argument(
+        '-trace',
+        help='set the file to write the traces of the quorum composition as JSON lines',
+    )
     # parser.add_argument(
     #     '-output',
     #     help='set output directory',
@@ -59,6 +184,9 @@ def run(parser, args):
 
         return 1
 
+    if not args.graph_format:
+        args.graph_format = ['json']
+
     if args.quorums:
         args.quorums = pathlib.Path(args.quorums).read_text()
 
@@ -67,21 +195,149 @@ def run(parser, args):
     else:
         dc = DockerCompose(args.design)
 
+    if args.latency:
+        dc.builder.latency = LatencyMatrix.load(args.latency)
+
+    previous = None
+    if args.previous:
+        previous = load_quorums(pathlib.Path(args.previous).read_text())
+
     if args.template:
         template_directory = pathlib.Path(args.template).absolute()
     else:
         template_directory = pathlib.Path('.').joinpath('template').absolute()
 
-    dc.make()
+    # the commons are memoized only with `-memo`
+    memo = None
+    if args.memo:
+        memo = ShapeMemo()
+        memo.load(args.memo)
+
+    cache = None
+    cache_key = None
+    cached_stats = None
+    # without the seed, the composition is random, so it is not cached
+    if not args.no_cache and args.seed is not None and dc.quorums is None and previous is None:
+        cache = QuorumCache(args.cache_dir)
+        cache_key = QuorumCache.make_key(dc.builder.get_quorums_inputs(
+            engine=args.engine,
+            group_size=args.group_size,
+            seed=args.seed,
+            attempts=args.attempts,
+        ))
+        dc.quorums = cache.get(cache_key)
+        if dc.quorums is not None:
+            dc.quorums = expand_quorums(dc.quorums)
+            print('quorums loaded from cache:', cache_key)
+
+            # the stats of the run, which composed the cached quorums
+            cached_stats = cache.get_stats(cache_key)
+            if cached_stats is None:
+                cached_stats = dict()
+
+            cache = None
+
+    if args.trace:
+        trace.open(args.trace)
+
+    try:
+        dc.make(
+            engine=args.engine,
+            group_size=args.group_size,
+            seed=args.seed,
+            workers=args.workers,
+            attempts=args.attempts,
+            previous=previous,
+            memo=memo,
+        )
+    finally:
+        trace.close()
+
+    if args.memo:
+        memo.save(args.memo)
+
+    stats = cached_stats
+    if dc.builder.stats is not None:
+        stats = dc.builder.stats.as_dict()
+
+    if cache is not None:
+        cache.put(cache_key, compact_quorums(dc.quorums), stats=stats)
+
+    if stats is not None and cache_key is not None:
+        stats = dict(stats, cache=dict(key=cache_key, hit=cached_stats is not None))
+
+    if dc.builder.composition is not None:
+        print(
+            'best composition: seed=%(seed)d min_safety=%(min_safety)d '
+            'total_size=%(total_size)d overlap_balance=%(overlap_balance).2f' % dc.builder.composition
+        )
+
+    if dc.builder.recomposition is not None:
+        print(
+            'recomposed: pairs=%d changed nodes=%d' % (
+                len(dc.builder.recomposition['pairs']),
+                len(dc.builder.recomposition['nodes']),
+            )
+        )
+
+    save_directory = args.save_directory.joinpath(args.now.strftime('%Y%m%d%H%M%S'))
+    save_directory.mkdir(parents=True, exist_ok=False)
+
+    # the graphs are rendered while the files are written
+    render_stage = None
+    if args.render_graph:
+        render_stage = RenderStage(workers=args.render_workers, timeout=args.render_timeout)
+
+        positions = None
+        if args.layout == 'native':
+            positions = layout(dc.builder.get_quorum_validators_graph(dc.quorums))
+
+        digraphs = (
+            ('quorums', dc.builder.get_quorums_digraph(dc.quorums, output_format='png')),
+            ('validators', dc.builder.get_quorum_validators_digraph(dc.quorums, output_format='png', positions=positions)),
+            (
+                'validators-direct',
+                dc.builder.get_quorum_validators_direct_digraph(dc.quorums, output_format='png', positions=positions),
+            ),
+        )
+        for name, g in digraphs:
+            # the pinned positions are kept by `neato -n`
+            render_stage.submit(
+                name,
+                g,
+                save_directory.joinpath(name),
+                neato_no_op=1 if positions is not None and g.engine == 'neato' else None,
+            )
+
+    try:
+        save_files(args, dc, template_directory, save_directory, stats=stats)
+    except BaseException:
+        if render_stage is not None:
+            render_stage.shutdown()
+
+        raise
+
+    if render_stage is None:
+        return 0
+
+    failed = False
+    for name, (path, elapsed, error) in render_stage.wait().items():
+        if error is not None:
+            failed = True
+            print_error('failed to render %s: %s' % (name, error))
+            continue
+
+        print('rendered %s: %s (%.2fs)' % (name, path.name, elapsed))
+
+    return 1 if failed else 0
 
+
+def save_files(args, dc, template_directory, save_directory, stats=None):
     template_directories = list(default_template_directories) + [template_directory]
     files_force_scp = dc.build(template_directories=template_directories, default_policies=dict(force_scp=True, restart='no'))
     files_new_network = dc.build(template_directories=template_directories, default_policies=dict(new_network=True, restart='no'))
     files_normal = dc.build(template_directories=template_directories, default_policies=dict(force_scp=False))
 
-    save_directory = args.save_directory.joinpath(args.now.strftime('%Y%m%d%H%M%S'))
-    save_directory.mkdir(parents=True, exist_ok=False)
-
     generate_cfg_file(args, files_force_scp['cfgs'], save_directory.joinpath('config'), flat=not args.not_flat)
 
     generate_docker_compose(args, files_force_scp['nodes'], save_directory.joinpath('docker-compose'), flat=not args.not_flat, kind='forcescp')
@@ -102,27 +358,30 @@ def run(parser, args):
     save_directory.joinpath('design.yml').write_text(mcontent)
 
     # save quorum files
-    save_directory.joinpath('quorums.json').write_text(json.dumps(dc.quorums, indent=2))
+    if args.compact:
+        save_directory.joinpath('quorums.json').write_text(json.dumps(compact_quorums(dc.quorums), indent=2))
+    else:
+        save_directory.joinpath('quorums.json').write_text(json.dumps(dc.quorums, indent=2))
+
+    if args.stats and stats is not None:
+        save_directory.joinpath('stats.json').write_text(json.dumps(stats, indent=2))
 
     print('successfully saved to ', save_directory.as_uri())
 
-    dc.builder.make_quorums_graph(
-        dc.quorums,
-        output=save_directory.joinpath('quorums'),
-        output_format='png',
-    )
-    dc.builder.make_quorum_validators_graph(
-        dc.quorums,
-        output=save_directory.joinpath('validators'),
-        output_format='png',
-    )
-    dc.builder.make_quorum_validators_direct_graph(
-        dc.quorums,
-        output=save_directory.joinpath('validators-direct'),
-        output_format='png',
+    # save graph files
+    graph_directory = save_directory.joinpath('graph')
+    graph_directory.mkdir()
+
+    graphs = (
+        ('quorums', dc.builder.get_quorums_graph(dc.quorums)),
+        ('validators', dc.builder.get_quorum_validators_graph(dc.quorums)),
+        ('validators-direct', dc.builder.get_quorum_validators_graph(dc.quorums, direct=True)),
     )
+    for graph_format in args.graph_format:
+        for name, g in graphs:
+            write_graph(g, graph_directory.joinpath(name), graph_format)
 
-    return 0
+    return
 
 
 def generate_docker_compose(args, files, dc_directory, kind, flat=False):
@@ -0,0 +1,179 @@
+import json
+import logging
+import pathlib
+import time
+
+import tabulate
+
+from ..validator import Validator
+from ..builder import Builder, load_quorums
+from ..latency import (
+    LatencyMatrix,
+    estimate_rtts,
+)
+from ..quorum import (
+    AvailableQuorumCommons,
+    RegionalQuorum,
+)
+from ..simulation import (
+    QuorumSimulation,
+    default_scale,
+)
+from ..util import (
+    TagIndex,
+    print_error,
+)
+from ..exceptions import ValidationError
+
+
+log = logging.getLogger(__name__)
+
+
+def subparser(subparser):
+    parser = subparser.add_parser(
+        'simulate',
+        help='simulate the SCP rounds of the quorum sets and report the externalize latency',
+    )
+    parser.set_defaults(command='simulate')
+
+    parser.add_argument(
+        '-quorums',
+        help='set existing `quorums.json`',
+    )
+
+    parser.add_argument(
+        '-latency',
+        help='set the RTT matrix of the regions instead of `network.latency` of design',
+    )
+
+    parser.add_argument(
+        '-trials',
+        type=int,
+        default=100,
+        help='set the number of the simulated rounds',
+    )
+
+    parser.add_argument(
+        '-threshold',
+        type=int,
+        default=QuorumSimulation.threshold_percent,
+        help='set the `THRESHOLD_PERCENT` of the quorum sets',
+    )
+
+    parser.add_argument(
+        '-intra-rtt',
+        type=float,
+        default=QuorumSimulation.intra_rtt,
+        help='set the RTT in milliseconds between the nodes of same region',
+    )
+
+    parser.add_argument(
+        '-processing',
+        type=float,
+        default=QuorumSimulation.processing,
+        help='set the mean processing time in milliseconds of each statement',
+    )
+
+    parser.add_argument(
+        '-jitter',
+        type=float,
+        default=QuorumSimulation.jitter,
+        help='set the jitter of the delays',
+    )
+
+    parser.add_argument(
+        '-output',
+        help='save the percentiles by node and region as JSON',
+    )
+
+    parser.add_argument(
+        '-engine',
+        default='set',
+        choices=sorted(RegionalQuorum.engines.keys()),
+        help='set the engine to find the available commons of quorums',
+    )
+
+    parser.add_argument(
+        '-group-size',
+        type=int,
+        default=AvailableQuorumCommons.group_size,
+        help='set the maximum number of the validator groups in each region to make the commons',
+    )
+
+    parser.add_argument(
+        '-seed',
+        type=int,
+        help='set the random seed to choose the near regions and to simulate',
+    )
+
+    return
+
+
+def run(parser, args):
+    try:
+        Validator(args.design).validate()
+    except ValidationError as e:
+        print_error('found problems: %s' % e)
+
+        return 1
+
+    builder = Builder(args.design)
+    if args.quorums:
+        quorums = load_quorums(pathlib.Path(args.quorums).read_text())
+    else:
+        quorums = builder.make_quorums(
+            engine=args.engine,
+            group_size=args.group_size,
+            seed=args.seed,
+        )
+
+    latency = builder.latency
+    if args.latency:
+        latency = LatencyMatrix.load(args.latency)
+
+    tag_index = TagIndex(dict(map(
+        lambda x: (x[0], x[1].tags),
+        builder.regions.regions.items(),
+    )))
+    rtts = estimate_rtts(latency, tag_index, builder.regions.regions.keys(), default_scale=default_scale)
+
+    validators = list(map(
+        lambda x: x[0],
+        filter(lambda x: x[1].is_validator, builder.nodes.nodes.items()),
+    ))
+
+    started = time.time()
+    simulation = QuorumSimulation(
+        quorums,
+        rtts,
+        validators=validators,
+        threshold_percent=args.threshold,
+        intra_rtt=args.intra_rtt,
+        processing=args.processing,
+        jitter=args.jitter,
+    )
+    report = simulation.report(simulation.run(trials=args.trials, seed=args.seed))
+    log.debug('simulated: elapsed=%0.3fs trials=%d', time.time() - started, args.trials)
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True))
+        log.debug('simulation saved to %s', args.output)
+
+    headers = ('region', 'nodes') + tuple(map(lambda x: 'p%d(ms)' % x, simulation.percentiles))
+    rows = list()
+    for region_name, found in report['regions'].items():
+        nodes = list(filter(lambda x: quorums[x]['region'] == region_name, quorums.keys()))
+        rows.append(
+            (region_name, len(nodes))
+            + tuple(map(lambda x: '-' if found[x] is None else '%.1f' % found[x], simulation.percentiles))
+        )
+
+    print(tabulate.tabulate(rows, headers=headers, tablefmt='grid'))
+
+    missing = list(filter(lambda x: x[1][simulation.percentiles[0]] is None, report['nodes'].items()))
+    if missing:
+        print_error('never externalized: %s' % ', '.join(sorted(map(lambda x: x[0], missing))))
+
+        return 1
+
+    return 0
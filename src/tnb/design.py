@@ -86,6 +86,7 @@ class Network(ValidateTypeField):
     )
     passphrase = None
     number_of_connected_regions = None
+    latency = None
     default_settings = None
 
     def serialize(self, *a, **kw):
@@ -101,6 +102,7 @@ class Network(ValidateTypeField):
             'number_of_connected_regions',
             cls.defaults['number_of_connected_regions'],
         )
+        m.latency = design.design_yaml['network'].get('latency')
         m.default_settings = design.design_yaml['network'].get(
             'default_settings',
             dict(),
@@ -126,6 +128,7 @@ class Network(ValidateTypeField):
 
         network = design_yaml['network']
         cls.validate_field('passphrase', network, value_types=(str,))
+        cls.validate_field('latency', network, allow_missing=True, value_types=(str,))
 
         kw['validated'].append(cls.__name__)
 
@@ -0,0 +1,89 @@
+'''
+# diagnostics of the quorum composition
+
+the tables, the colored strings and the traces of the candidates are built
+only when they are written;
+* `Lazy` renders the message, when the log record is emitted
+* `trace` writes the events as JSON lines into the trace file, if it is
+  opened
+'''
+
+import json
+import logging
+
+
+class Lazy:
+    '''
+    calls `f` when it is formatted, so the expensive message is not built if
+    the log level is not enabled.
+    '''
+    f = None
+    a = None
+    kw = None
+
+    def __init__(self, f, *a, **kw):
+        self.f = f
+        self.a = a
+        self.kw = kw
+
+    def __str__(self):
+        return str(self.f(*self.a, **self.kw))
+
+
+class Trace:
+    '''
+    the sink of the trace events; each event is written as one JSON line.
+    '''
+    output = None
+
+    @property
+    def enabled(self):
+        return self.output is not None
+
+    def open(self, path):
+        self.close()
+        self.output = open(str(path), 'w')
+
+        return
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+        return
+
+    def flush(self):
+        if self.output is not None:
+            self.output.flush()
+
+        return
+
+    def detach(self):
+        '''
+        stops writing without closing; the worker processes share the trace
+        file with the parent process, so only the parent writes.
+        '''
+        self.output = None
+
+        return
+
+    def emit(self, event, **kw):
+        if self.output is None:
+            return
+
+        kw['event'] = event
+        self.output.write(json.dumps(kw, sort_keys=True, default=list))
+        self.output.write('\n')
+
+        return
+
+
+trace = Trace()
+
+
+def is_enabled(logger):
+    '''
+    `True` if the diagnostics will be written to `logger` or to `trace`.
+    '''
+    return trace.enabled or logger.isEnabledFor(logging.DEBUG)
@@ -1,4 +1,3 @@
-import json
 import jinja2  # noqa
 import random
 from pprint import pprint  # noqa
@@ -6,6 +5,7 @@ from pprint import pprint  # noqa
 from .builder import (
     Builder,
     flatten_items,
+    load_quorums,
 )
 from .util import (
     format_db_url,
@@ -35,7 +35,7 @@ class DockerCompose:
     def from_quorum_json(cls, design, quorums_json):
         m = cls(design)
 
-        m.quorums = json.loads(quorums_json)
+        m.quorums = load_quorums(quorums_json)
 
         return m
 
@@ -44,9 +44,9 @@ class DockerCompose:
         self.builder = Builder(design)
         self.port_pool_by_instance = dict()
 
-    def make(self):
+    def make(self, **kw):
         if self.quorums is None:
-            self.quorums = self.builder.make_quorums()
+            self.quorums = self.builder.make_quorums(**kw)
 
         return self.quorums
 
@@ -93,7 +93,7 @@ class DockerCompose:
         validators = list()
         node_names = list()
         known_peers = list()
-        vs = flatten_items(quorum['validators'])
+        vs = set(flatten_items(quorum['validators']))
         for v, n in self.builder.nodes.nodes.items():
             if node.name == v:
                 continue
@@ -108,8 +108,7 @@ class DockerCompose:
             ))
 
             if v in vs:
-                if v not in validators:
-                    validators.append(v)
+                validators.append(v)
 
         if node.is_validator:
             validators.append('self')
@@ -143,7 +142,7 @@ class DockerCompose:
 
     def get_port_pair(self, name):
         node = self.builder.nodes.get(name)
-        instance = self.builder.instances.get_instance_by_node(name)
+        instance = self.builder.instances.get(self.builder.index.instance_by_node[name])
 
         if node.http_port:
             http_port = node.http_port
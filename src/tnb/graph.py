@@ -0,0 +1,218 @@
+'''
+# export of the graphs without graphviz
+
+the graphs of `Builder` are written as GraphML, GEXF or JSON adjacency list;
+no layout engine is called, so the large topologies can be opened in the
+dedicated viewers.
+
+* the nodes and edges are written one by one into the output file
+* the edges are undirected and have `weight`, the number of the shared
+  validators, if it is counted
+* the node has `group`, the instance of node in the validators graphs
+* `svg` is drawn by the positions of `tnb.layout`, not by graphviz
+'''
+
+import json
+import logging
+import pathlib
+from xml.sax.saxutils import (
+    escape,
+    quoteattr,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+class Graph:
+    name = None
+    nodes = None
+    adjacency = None
+
+    def __init__(self, name):
+        self.name = name
+        self.nodes = dict()
+        self.adjacency = dict()
+
+    def add_node(self, node_id, label=None, group=None):
+        self.nodes[node_id] = dict(
+            label=node_id if label is None else label,
+            group=group,
+        )
+
+        return
+
+    def add_edge(self, source, target, weight=None):
+        self.adjacency.setdefault(source, list()).append((target, weight))
+
+        return
+
+    @property
+    def edges(self):
+        for source, targets in self.adjacency.items():
+            for target, weight in targets:
+                yield (source, target, weight)
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def write_graphml(graph, f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    f.write('  <key id="label" for="node" attr.name="label" attr.type="string"/>\n')
+    f.write('  <key id="group" for="node" attr.name="group" attr.type="string"/>\n')
+    f.write('  <key id="weight" for="edge" attr.name="weight" attr.type="int"/>\n')
+    f.write('  <graph id=%s edgedefault="undirected">\n' % quoteattr(graph.name))
+
+    for node_id, node in graph.nodes.items():
+        f.write('    <node id=%s>' % quoteattr(node_id))
+        f.write('<data key="label">%s</data>' % escape(node['label']))
+        if node['group'] is not None:
+            f.write('<data key="group">%s</data>' % escape(node['group']))
+        f.write('</node>\n')
+
+    for source, target, weight in graph.edges:
+        f.write('    <edge source=%s target=%s' % (quoteattr(source), quoteattr(target)))
+        if weight is None:
+            f.write('/>\n')
+        else:
+            f.write('><data key="weight">%d</data></edge>\n' % weight)
+
+    f.write('  </graph>\n')
+    f.write('</graphml>\n')
+
+    return
+
+
+def write_gexf(graph, f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<gexf xmlns="http://gexf.net/1.2" version="1.2">\n')
+    f.write('  <graph mode="static" defaultedgetype="undirected">\n')
+    f.write('    <attributes class="node">\n')
+    f.write('      <attribute id="group" title="group" type="string"/>\n')
+    f.write('    </attributes>\n')
+
+    f.write('    <nodes>\n')
+    for node_id, node in graph.nodes.items():
+        f.write('      <node id=%s label=%s>' % (quoteattr(node_id), quoteattr(node['label'])))
+        if node['group'] is not None:
+            f.write('<attvalues><attvalue for="group" value=%s/></attvalues>' % quoteattr(node['group']))
+        f.write('</node>\n')
+    f.write('    </nodes>\n')
+
+    f.write('    <edges>\n')
+    for index, (source, target, weight) in enumerate(graph.edges):
+        f.write('      <edge id="%d" source=%s target=%s' % (index, quoteattr(source), quoteattr(target)))
+        if weight is not None:
+            f.write(' weight="%d"' % weight)
+        f.write('/>\n')
+    f.write('    </edges>\n')
+
+    f.write('  </graph>\n')
+    f.write('</gexf>\n')
+
+    return
+
+
+def write_json(graph, f):
+    '''
+    `{"name": .., "nodes": {id: {"label": .., "group": ..}}, "adjacency": {id: [[target, weight]]}}`
+    '''
+    f.write('{"name": %s,\n"nodes": {' % json.dumps(graph.name))
+    for index, (node_id, node) in enumerate(graph.nodes.items()):
+        f.write('%s\n%s: %s' % (',' if index > 0 else '', json.dumps(node_id), json.dumps(node, sort_keys=True)))
+
+    f.write('},\n"adjacency": {')
+    for index, (source, targets) in enumerate(graph.adjacency.items()):
+        f.write('%s\n%s: %s' % (',' if index > 0 else '', json.dumps(source), json.dumps(targets)))
+    f.write('}}\n')
+
+    return
+
+
+def write_svg(graph, f):
+    '''
+    draws the graph with the positions of `tnb.layout.layout()`; the groups
+    are drawn as the boxes behind the nodes.
+    '''
+    from .layout import layout
+
+    positions = dict(map(lambda x: (x[0], (x[1][0] * 72, - x[1][1] * 72)), layout(graph).items()))
+
+    radius = 12
+    margin = radius * 3
+    if positions:
+        xs = list(map(lambda x: x[0], positions.values()))
+        ys = list(map(lambda x: x[1], positions.values()))
+        box = (min(xs) - margin, min(ys) - margin, max(xs) - min(xs) + margin * 2, max(ys) - min(ys) + margin * 2)
+    else:
+        box = (0, 0, margin, margin)
+
+    weights = list(filter(lambda x: x is not None, map(lambda x: x[2], graph.edges)))
+    range_weight = (max(weights), min(weights)) if weights else (0, 0)
+
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write(
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="%.1f %.1f %.1f %.1f" width="%d" height="%d" '
+        'font-family="monospace" font-size="10">\n' % (box + (box[2], box[3]))
+    )
+    f.write('<title>%s</title>\n' % escape(graph.name))
+
+    groups = dict()
+    for node_id, node in graph.nodes.items():
+        if node['group'] is not None:
+            groups.setdefault(node['group'], list()).append(positions[node_id])
+
+    f.write('<g fill="#f5f5f5" stroke="#adadad" stroke-dasharray="4,2">\n')
+    for group, ps in groups.items():
+        x = min(map(lambda x: x[0], ps)) - radius * 2
+        y = min(map(lambda x: x[1], ps)) - radius * 2
+        w = max(map(lambda x: x[0], ps)) - x + radius * 2
+        h = max(map(lambda x: x[1], ps)) - y + radius * 2
+        f.write('<rect x="%.1f" y="%.1f" width="%.1f" height="%.1f" rx="6"/>' % (x, y, w, h))
+        f.write('<text x="%.1f" y="%.1f" fill="#383838" stroke="none">%s</text>\n' % (x + 4, y + 12, escape(group)))
+    f.write('</g>\n')
+
+    f.write('<g stroke="#aaaaaa" stroke-opacity="0.4">\n')
+    for source, target, weight in graph.edges:
+        if weight is None or range_weight[0] - range_weight[1] < 1:
+            width = 0.5
+        else:
+            width = 0.5 + (weight - range_weight[1]) / (range_weight[0] - range_weight[1]) * 3
+
+        (x0, y0), (x1, y1) = positions[source], positions[target]
+        f.write('<line x1="%.1f" y1="%.1f" x2="%.1f" y2="%.1f" stroke-width="%.1f"/>\n' % (x0, y0, x1, y1, width))
+    f.write('</g>\n')
+
+    f.write('<g text-anchor="middle">\n')
+    for node_id, node in graph.nodes.items():
+        x, y = positions[node_id]
+        f.write('<circle cx="%.1f" cy="%.1f" r="%d" fill="crimson"/>' % (x, y, radius))
+        f.write('<text x="%.1f" y="%.1f" fill="snow">%s</text>\n' % (x, y + 3, escape(node['label'])))
+    f.write('</g>\n')
+
+    f.write('</svg>\n')
+
+    return
+
+
+writers = dict(
+    graphml=write_graphml,
+    gexf=write_gexf,
+    json=write_json,
+    svg=write_svg,
+)
+
+
+def write(graph, output, output_format):
+    '''
+    writes the graph into `<output>.<output_format>`.
+    '''
+    path = pathlib.Path('%s.%s' % (output, output_format))
+    with path.open('w') as f:
+        writers[output_format](graph, f)
+
+    log.debug('graph saved: %s: nodes=%d', path, len(graph))
+
+    return path
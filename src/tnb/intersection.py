@@ -0,0 +1,366 @@
+'''
+# quorum intersection of the generated quorum sets
+
+the quorum sets of the nodes, `Builder.make_quorums()` or `quorums.json` are
+checked as the federated byzantine agreement system; every 2 quorums must
+share at least one node.
+
+* the quorum set of node is flat; the validators of `quorum['validators']`
+  and the node itself, if it is validator, with `THRESHOLD_PERCENT`
+* the nodes are interned by `ValidatorIndex`, so the sets of nodes are int
+  bitmasks; the nodes, which have the same quorum set are checked at once
+* the quorums can be found only in the strongly connected components of the
+  quorum set graph; if 2 components have quorums, they are disjoint
+* in the last component, the quorums are searched up to the half size of
+  component by branching on the nodes; if the complement of the quorum still
+  has quorum, the 2 quorums are split. If the complement of the committed
+  nodes has no quorum, the branch is pruned.
+* if the thresholds of 2 quorum sets are over the size of their union, the
+  quorums, which have the nodes of them always intersect; these nodes are
+  left out from the complement
+* the nodes, which have the same quorum set and are in the same quorum sets
+  are interchangeable, so if one of them is left out, the other remaining
+  ones are also left out
+'''
+
+import itertools
+import logging
+
+from .quorum import (
+    ValidatorIndex,
+    popcount,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+def get_threshold(n, percent):
+    '''
+    same with `THRESHOLD_PERCENT` of stellar-core.
+    '''
+    if n < 1:
+        return 0
+
+    return (n * percent - 1) // 100 + 1
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class QuorumIntersection:
+    threshold_percent = 67
+
+    index = None
+    thresholds = None
+    slices = None
+    groups = None
+    conflicts = None
+    nodes = None
+    split = None
+    no_quorum = None
+    visited = None
+
+    @classmethod
+    def from_quorums(cls, quorums, validators=None, threshold_percent=None):
+        '''
+        `quorums` is the output of `Builder.make_quorums()`. `validators` is
+        the names of validator nodes; if it is missing, the nodes, which are
+        in any quorum set are validators.
+        '''
+        quorum_sets = dict()
+        for name, quorum in quorums.items():
+            quorum_sets[name] = sorted(set(itertools.chain(*quorum['validators'].values())))
+
+        if validators is None:
+            validators = set(itertools.chain(*quorum_sets.values()))
+
+        for name in validators:
+            if name in quorum_sets and name not in quorum_sets[name]:
+                quorum_sets[name].append(name)
+
+        return cls(
+            dict(filter(lambda x: x[0] in validators, quorum_sets.items())),
+            threshold_percent=threshold_percent,
+        )
+
+    def __init__(self, quorum_sets, threshold_percent=None, thresholds=None):
+        '''
+        `quorum_sets` is the validators of the quorum set by node.
+        `thresholds` is the thresholds by node; the missing nodes have the
+        threshold of `threshold_percent`.
+        '''
+        if thresholds is None:
+            thresholds = dict()
+
+        if threshold_percent is not None:
+            self.threshold_percent = threshold_percent
+
+        self.index = ValidatorIndex(sorted(quorum_sets.keys()))
+        self.thresholds = dict()
+        self.slices = dict()
+        for name, vs in quorum_sets.items():
+            i = self.index.add(name)
+            self.slices[i] = self.index.mask(vs)
+            if name in thresholds:
+                self.thresholds[i] = thresholds[name]
+            else:
+                self.thresholds[i] = get_threshold(len(set(vs)), self.threshold_percent)
+
+        # the nodes, which have the same quorum set are removed together
+        by_slice = dict()
+        for i, s in self.slices.items():
+            key = (s, self.thresholds[i])
+            by_slice[key] = by_slice.get(key, 0) | 1 << i
+
+        self.groups = tuple(map(lambda x: (x[1], x[0][0], x[0][1]), sorted(by_slice.items())))
+
+        # if the thresholds of 2 quorum sets are over their union, any quorum
+        # with the node of one group meets any quorum with the node of the
+        # other group.
+        self.conflicts = list()
+        for _, s, threshold in self.groups:
+            conflicts = 0
+            for members, o, other in self.groups:
+                if threshold + other > popcount(s | o):
+                    conflicts |= members
+
+            self.conflicts.append(conflicts)
+
+        # the nodes without quorum set can not be in any quorum
+        self.nodes = self.index.mask(quorum_sets.keys())
+
+    def make_classes(self, component):
+        '''
+        the interchangeable nodes in `component` by node.
+        '''
+        referenced = dict()
+        for i in iter_bits(self.nodes):
+            for j in iter_bits(self.slices[i]):
+                referenced[j] = referenced.get(j, 0) | 1 << i
+
+        by_key = dict()
+        for i in iter_bits(component):
+            key = (self.slices[i], self.thresholds[i], referenced.get(i, 0))
+            by_key[key] = by_key.get(key, 0) | 1 << i
+
+        classes = dict()
+        for mask in by_key.values():
+            for i in iter_bits(mask):
+                classes[i] = mask
+
+        return classes
+
+    def is_quorum(self, mask):
+        if mask == 0:
+            return False
+
+        return self.contract(mask) == mask
+
+    def contract(self, mask):
+        '''
+        the maximal quorum in `mask`; the nodes, whose quorum set is not
+        satisfied in `mask` are removed until nothing is removed.
+        '''
+        mask &= self.nodes
+        while mask:
+            removed = 0
+            for members, s, threshold in self.groups:
+                if members & mask and popcount(s & mask) < threshold:
+                    removed |= members
+
+            if removed == 0:
+                break
+
+            mask &= ~removed
+
+        return mask
+
+    def wanted(self, mask):
+        '''
+        the quorum sets of the nodes, which are not satisfied in `mask`.
+        '''
+        wanted = 0
+        for members, s, threshold in self.groups:
+            if members & mask and popcount(s & mask) < threshold:
+                wanted |= s
+
+        return wanted
+
+    def conflicted(self, mask):
+        '''
+        the nodes, which can not be in any quorum disjoint with the quorums,
+        which include `mask`.
+        '''
+        conflicted = 0
+        for (members, _, _), conflicts in zip(self.groups, self.conflicts):
+            if members & mask:
+                conflicted |= conflicts
+
+        return conflicted
+
+    def forced(self, committed, remaining):
+        '''
+        the nodes of `remaining`, which must be added to make quorum; if the
+        quorum set of committed node can be satisfied only with all the
+        remaining nodes of it, they are forced.
+        '''
+        forced = 0
+        for members, s, threshold in self.groups:
+            if not members & committed:
+                continue
+
+            need = threshold - popcount(s & committed)
+            if need > 0 and popcount(s & remaining) == need:
+                forced |= s & remaining
+
+        return forced
+
+    def components(self):
+        '''
+        the strongly connected components of the quorum set graph by the
+        iterative Tarjan's algorithm.
+        '''
+        index = dict()
+        low = dict()
+        stack = list()
+        on_stack = set()
+        components = list()
+        counter = itertools.count()
+
+        for root in iter_bits(self.nodes):
+            if root in index:
+                continue
+
+            index[root] = low[root] = next(counter)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter_bits(self.slices[root] & self.nodes))]
+            while work:
+                v, edges = work[-1]
+                for w in edges:
+                    if w not in index:
+                        index[w] = low[w] = next(counter)
+                        stack.append(w)
+                        on_stack.add(w)
+                        work.append((w, iter_bits(self.slices[w] & self.nodes)))
+                        break
+                    elif w in on_stack:
+                        low[v] = min(low[v], index[w])
+                else:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[v])
+
+                    if low[v] == index[v]:
+                        component = 0
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            component |= 1 << w
+                            if w == v:
+                                break
+
+                        components.append(component)
+
+        return components
+
+    def check(self):
+        '''
+        returns `True` if all the quorums intersect. If not, the first split
+        found is kept in `split` as the names of 2 disjoint quorums; if there
+        is no quorum at all, the consensus is never reached, so `False` is
+        returned with `no_quorum`.
+        '''
+        self.split = None
+        self.no_quorum = False
+        self.visited = 0
+
+        quorums = list(filter(None, map(self.contract, self.components())))
+        log.debug('%d of components have quorum', len(quorums))
+
+        if len(quorums) < 1:
+            log.debug('no quorum found')
+            self.no_quorum = True
+            return False
+
+        if len(quorums) > 1:
+            self.set_split(quorums[0], quorums[1])
+            return False
+
+        return self.search(quorums[0])
+
+    def search(self, component):
+        '''
+        searches the quorum of `component`, whose complement has quorum by
+        branching on the nodes; `committed` is the nodes in, and `remaining`
+        is the nodes, which can be added.
+        '''
+        max_committed = popcount(component) // 2
+
+        # the most referenced nodes are branched at first
+        referenced = dict()
+        for i in iter_bits(component):
+            for j in iter_bits(self.slices[i] & component):
+                referenced[j] = referenced.get(j, 0) + 1
+
+        order = sorted(iter_bits(component), key=lambda x: (-referenced.get(x, 0), x))
+        classes = self.make_classes(component)
+
+        work = [(0, component)]
+        while work:
+            committed, remaining = work.pop()
+            self.visited += 1
+
+            if popcount(committed) > max_committed:
+                continue
+
+            # the quorum in the other side only shrinks as the committed grows
+            other = self.contract(component & ~committed & ~self.conflicted(committed))
+            if other == 0:
+                continue
+
+            if self.is_quorum(committed):
+                self.set_split(committed, other)
+                return False
+
+            # the branches, which can not make quorum are pruned
+            perimeter = self.contract(committed | remaining)
+            if perimeter == 0 or committed & ~perimeter:
+                continue
+
+            remaining = perimeter & ~committed
+            if remaining == 0:
+                continue
+
+            forced = self.forced(committed, remaining)
+            if forced:
+                work.append((committed | forced, remaining & ~forced))
+                continue
+
+            # the nodes, which the committed nodes wait for are branched at
+            # first, so the committed nodes get close to quorum
+            candidates = remaining & self.wanted(committed) or remaining
+            node = next(filter(lambda x: candidates >> x & 1, order))
+            bit = 1 << node
+
+            work.append((committed, remaining & ~classes[node]))
+            work.append((committed | bit, remaining & ~bit))
+
+        log.debug('quorums intersect: visited=%d', self.visited)
+
+        return True
+
+    def set_split(self, a, b):
+        self.split = (
+            sorted(self.index.unmask(a)),
+            sorted(self.index.unmask(b)),
+        )
+
+        log.debug('found split: %s', self.split)
+
+        return
@@ -0,0 +1,292 @@
+'''
+# measured latency between regions
+
+the round trip times between regions in milliseconds are loaded from the
+matrix file, and the regions are ordered by them instead of the distance of
+tags.
+
+* CSV: the first row is the region names; each next row starts with the
+  region name and has the RTTs to the regions of the first row. The empty
+  cell or `-` is not measured.
+* binary: `magic`, one JSON line, `{"regions": [..], "sha256": ..}`,
+  padding to 4 bytes and the float32 matrix in little endian; NaN is not
+  measured. The file is memory-mapped, so only the rows of the regions,
+  which are used are read; the digest of the matrix is kept in the header,
+  so the matrix is not read to make the cache key.
+* the RTT of the pair, which is not measured is estimated from the distance
+  of tags by the ratio of the sum of the measured RTTs to the sum of their
+  distances of tags
+'''
+
+import array
+import csv
+import hashlib
+import json
+import logging
+import math
+import mmap
+import pathlib
+import sys
+
+
+log = logging.getLogger(__name__)
+
+magic = b'TNBRTT1\n'
+
+# the RTTs in this milliseconds are at same distance
+default_resolution = 5
+
+
+class LatencyMatrix:
+    path = None
+    regions = None
+    ids = None
+    sha256 = None
+
+    def __init__(self, regions, values, path=None, sha256=None):
+        '''
+        `values` is the flat row-major matrix; `values[i * n + j]` is the RTT
+        from `regions[i]` to `regions[j]`. `sha256` is the known digest of
+        the matrix.
+        '''
+        self.regions = list(regions)
+        self.ids = dict(map(lambda x: (x[1], x[0]), enumerate(self.regions)))
+        self.values = values
+        self.path = path
+        self.sha256 = sha256
+
+    @classmethod
+    def load(cls, path):
+        path = pathlib.Path(path)
+        with path.open('rb') as f:
+            is_binary = f.read(len(magic)) == magic
+
+        if is_binary:
+            return cls.from_binary(path)
+
+        return cls.from_csv(path)
+
+    @classmethod
+    def from_csv(cls, path):
+        with pathlib.Path(path).open() as f:
+            rows = list(filter(None, csv.reader(f)))
+
+        if len(rows) < 1:
+            raise ValueError('empty latency matrix: %s' % path)
+
+        regions = list(map(lambda x: x.strip(), rows[0][1:] if rows[0][0].strip() == '' else rows[0]))
+        n = len(regions)
+        ids = dict(map(lambda x: (x[1], x[0]), enumerate(regions)))
+
+        values = array.array('f', [math.nan]) * (n * n)
+        for row in rows[1:]:
+            name = row[0].strip()
+            if name not in ids:
+                raise ValueError('unknown region in latency matrix: %s' % name)
+
+            for j, cell in enumerate(row[1:n + 1]):
+                cell = cell.strip()
+                if cell in ('', '-'):
+                    continue
+
+                values[ids[name] * n + j] = float(cell)
+
+        return cls(regions, values, path=path)
+
+    @classmethod
+    def from_binary(cls, path):
+        f = pathlib.Path(path).open('rb')
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+        end = mm.find(b'\n', len(magic))
+        header = json.loads(mm[len(magic):end].decode('utf-8'))
+        offset = (end + 1 + 3) // 4 * 4
+
+        regions = header['regions']
+        if len(mm) - offset < len(regions) ** 2 * 4:
+            raise ValueError('truncated latency matrix: %s' % path)
+
+        if sys.byteorder == 'little':
+            values = memoryview(mm)[offset:offset + len(regions) ** 2 * 4].cast('f')
+        else:
+            values = array.array('f', mm[offset:offset + len(regions) ** 2 * 4])
+            values.byteswap()
+
+        return cls(regions, values, path=path, sha256=header.get('sha256'))
+
+    def save_binary(self, path):
+        header = json.dumps(dict(regions=self.regions, sha256=self.digest())).encode('utf-8') + b'\n'
+        padding = b'\0' * ((-(len(magic) + len(header))) % 4)
+
+        values = array.array('f', self.values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+
+        with pathlib.Path(path).open('wb') as f:
+            f.write(magic)
+            f.write(header)
+            f.write(padding)
+            values.tofile(f)
+
+        return
+
+    def digest(self):
+        '''
+        the sha256 of the measurements; the RTTs of the regions are changed,
+        the composed quorums are changed. It is computed once; the binary
+        matrix has it in the header.
+        '''
+        if self.sha256 is None:
+            h = hashlib.sha256()
+            h.update(json.dumps(self.regions).encode('utf-8'))
+            h.update(memoryview(self.values).tobytes())
+            self.sha256 = h.hexdigest()
+
+        return self.sha256
+
+    def get_one_way(self, a, b):
+        i = self.ids.get(a)
+        j = self.ids.get(b)
+        if i is None or j is None:
+            return None
+
+        v = self.values[i * len(self.regions) + j]
+        if math.isnan(v):
+            return None
+
+        return v
+
+    def get(self, a, b):
+        '''
+        the RTT of 2 regions; the mean of both directions, if both are
+        measured, `None` if not measured.
+        '''
+        measured = list(filter(lambda x: x is not None, (self.get_one_way(a, b), self.get_one_way(b, a))))
+        if not measured:
+            return None
+
+        return sum(measured) / len(measured)
+
+
+def estimate_rtts(latency, tag_index, regions, default_scale=None):
+    '''
+    the RTTs of every 2 regions, `{(region, other): rtt}`; the pairs, which
+    are not measured are estimated by the distance of tags. If nothing is
+    measured, the distance of tags is scaled by `default_scale`, or `None`
+    is returned without `default_scale`.
+    '''
+    regions = sorted(regions)
+
+    tag_distances = dict()
+    for region_name in regions:
+        for d, others in tag_index.levels(region_name):
+            for other in others:
+                tag_distances[(region_name, other)] = d
+
+    measured = dict()
+    total_rtt = 0
+    total_distance = 0
+    if latency is not None:
+        n = len(latency.regions)
+        values = latency.values
+        ids = list(map(lambda x: latency.ids.get(x), regions))
+
+        for index, region_name in enumerate(regions):
+            i = ids[index]
+            if i is None:
+                continue
+
+            for other_index in range(index + 1, len(regions)):
+                j = ids[other_index]
+                if j is None:
+                    continue
+
+                a = values[i * n + j]
+                b = values[j * n + i]
+                if a != a:  # NaN
+                    if b != b:
+                        continue
+
+                    rtt = b
+                elif b != b:
+                    rtt = a
+                else:
+                    rtt = (a + b) / 2
+
+                other = regions[other_index]
+
+                measured[(region_name, other)] = measured[(other, region_name)] = rtt
+                if tag_distances[(region_name, other)] > 0:
+                    total_rtt += rtt
+                    total_distance += tag_distances[(region_name, other)]
+
+    # the scale of the distance of tags to RTT; without the pairs to scale,
+    # the pairs not measured are the farthest
+    if not measured:
+        if default_scale is None:
+            return None
+
+        scale = default_scale
+    elif total_distance > 0:
+        scale = total_rtt / total_distance
+    else:
+        scale = max(measured.values()) / max(max(tag_distances.values()), 1e-6)
+
+    log.debug('latency: measured pairs=%d scale=%.3f', len(measured) // 2, scale)
+
+    rtts = dict()
+    for key, d in tag_distances.items():
+        rtt = measured.get(key)
+        rtts[key] = d * scale if rtt is None else rtt
+
+    return rtts
+
+
+def get_distances(latency, tag_index, regions, resolution=None):
+    '''
+    the regions by RTT from each region, in the same form of
+    `TagIndex.levels()`; the RTTs are rounded by `resolution` milliseconds.
+    '''
+    if resolution is None:
+        resolution = default_resolution
+
+    regions = sorted(regions)
+
+    rtts = estimate_rtts(latency, tag_index, regions)
+    if rtts is None:
+        log.warning('no RTT of the regions was measured; the distance of tags is used')
+
+        return dict(map(lambda x: (x, tag_index.levels(x)), regions))
+
+    distances = dict()
+    for region_name in regions:
+        by_distance = dict()
+        for other in regions:
+            if other == region_name:
+                continue
+
+            key = round(rtts[(region_name, other)] / resolution) * resolution
+            by_distance.setdefault(key, list()).append(other)
+
+        distances[region_name] = sorted(by_distance.items())
+
+    return distances
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='converts the latency matrix to the binary format')
+    parser.add_argument('input', help='latency matrix, CSV or binary')
+    parser.add_argument('output', help='binary latency matrix')
+
+    options = parser.parse_args()
+
+    m = LatencyMatrix.load(options.input)
+    m.save_binary(options.output)
+    print('%d regions saved to %s' % (len(m.regions), options.output))
+
+    sys.exit(0)
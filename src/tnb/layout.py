@@ -0,0 +1,253 @@
+'''
+# force-directed layout of the graphs
+
+the positions of the nodes of `tnb.graph.Graph` are computed with numpy, so
+the large graphs are drawn without the layout engine of graphviz.
+
+* the nodes of same `group`, the instance are kept together as cluster; the
+  clusters are laid out first as the weighted graph of clusters, and then
+  the nodes in each cluster
+* the layout is Fruchterman-Reingold; the repulsion is computed by the
+  blocks of rows, so the memory is bounded. Over `block_size` nodes, the
+  nodes are binned in the grid of `2k` cells and only the nodes in the
+  neighbor cells repulse, as the grid variant of Fruchterman-Reingold, so
+  each iteration is about linear instead of `O(n²)`
+* the small cluster is placed on the circle without iterations
+* the positions are in inches; they are given to graphviz as `pos` in
+  points and rendered by `neato -n`, which does not move the nodes
+'''
+
+import collections
+import logging
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+log = logging.getLogger(__name__)
+
+# the distance of nodes in inches
+spacing = 0.8
+
+# the cluster up to this size is placed on the circle
+circle_size = 8
+
+# up to this number of nodes, the repulsion of every 2 nodes is computed at
+# once; over it, the repulsion is binned by the grid
+block_size = 512
+
+
+def get_grid_pairs(pos, cell):
+    '''
+    the pairs of the nodes, `(i, j)` in the same or the neighbor cells of
+    the grid; `i == j` is included.
+    '''
+    cells = numpy.floor((pos - pos.min(axis=0)) / cell).astype(numpy.int64)
+    width = cells[:, 1].max() + 3
+    keys = (cells[:, 0] + 1) * width + cells[:, 1] + 1
+
+    order = numpy.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    sources = list()
+    targets = list()
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbor = keys + dx * width + dy
+            lo = numpy.searchsorted(sorted_keys, neighbor, side='left')
+            hi = numpy.searchsorted(sorted_keys, neighbor, side='right')
+            counts = hi - lo
+            total = counts.sum()
+            if total < 1:
+                continue
+
+            # the ranges, `[lo, hi)` of each node are expanded at once
+            starts = numpy.repeat(lo - (numpy.cumsum(counts) - counts), counts)
+            sources.append(numpy.repeat(numpy.arange(len(pos)), counts))
+            targets.append(order[starts + numpy.arange(total)])
+
+    return numpy.concatenate(sources), numpy.concatenate(targets)
+
+
+def repulse(pos, k):
+    '''
+    the displacements by the repulsion of every 2 nodes.
+    '''
+    n = len(pos)
+    disp = numpy.zeros((n, 2))
+    if n <= block_size:
+        delta = pos[:, None, :] - pos[None, :, :]
+        distance2 = numpy.maximum((delta ** 2).sum(axis=2), 1e-6)
+
+        return (delta * (k * k / distance2)[:, :, None]).sum(axis=1)
+
+    i, j = get_grid_pairs(pos, 2 * k)
+    delta = pos[i] - pos[j]
+    distance2 = (delta ** 2).sum(axis=1)
+    near = distance2 < 4 * k * k
+    i, delta, distance2 = i[near], delta[near], numpy.maximum(distance2[near], 1e-6)
+
+    f = delta * (k * k / distance2)[:, None]
+    disp[:, 0] = numpy.bincount(i, weights=f[:, 0], minlength=n)
+    disp[:, 1] = numpy.bincount(i, weights=f[:, 1], minlength=n)
+
+    return disp
+
+
+def spring(n, edges, weights, iterations=50, seed=None):
+    '''
+    the positions of `n` nodes in the unit square; `edges` is the array of
+    `(i, j)` and `weights` is the strength of each edge.
+    '''
+    rng = numpy.random.RandomState(seed)
+    pos = rng.rand(n, 2)
+    if n < 2:
+        return pos
+
+    k = math.sqrt(1 / n)
+    t = 0.1
+    dt = t / (iterations + 1)
+
+    for _ in range(iterations):
+        disp = repulse(pos, k)
+
+        # attraction
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            distance = numpy.sqrt((delta ** 2).sum(axis=1))
+            f = delta * (distance * weights / k)[:, None]
+            numpy.subtract.at(disp, edges[:, 0], f)
+            numpy.add.at(disp, edges[:, 1], f)
+
+        length = numpy.maximum(numpy.sqrt((disp ** 2).sum(axis=1)), 1e-6)
+        pos += disp * (numpy.minimum(length, t) / length)[:, None]
+        t -= dt
+
+    return pos
+
+
+def normalize(pos):
+    '''
+    moves the positions into the unit circle at the origin.
+    '''
+    if len(pos) < 2:
+        return numpy.zeros((len(pos), 2))
+
+    pos = pos - pos.mean(axis=0)
+    radius = numpy.sqrt((pos ** 2).sum(axis=1)).max()
+    if radius > 0:
+        pos = pos / radius
+
+    return pos
+
+
+def circle(n):
+    if n < 2:
+        return numpy.zeros((n, 2))
+
+    a = numpy.arange(n) * 2 * math.pi / n
+
+    return numpy.stack((numpy.cos(a), numpy.sin(a)), axis=1)
+
+
+def separate(centers, radius):
+    '''
+    scales the centers of clusters, so the clusters do not overlap.
+    '''
+    scale = 1
+    for i in range(len(centers)):
+        d = numpy.sqrt(((centers[i + 1:] - centers[i]) ** 2).sum(axis=1))
+        need = radius[i + 1:] + radius[i] + spacing
+        if len(d):
+            scale = max(scale, (need / numpy.maximum(d, 1e-6)).max())
+
+    return centers * scale
+
+
+def get_edges(graph, ids):
+    edges = list()
+    weights = list()
+    for source, target, weight in graph.edges:
+        edges.append((ids[source], ids[target]))
+        weights.append(1 if weight is None else weight)
+
+    edges = numpy.array(edges, dtype=numpy.int64).reshape(-1, 2)
+    weights = numpy.array(weights, dtype=numpy.float64)
+    if len(weights):
+        weights = weights / weights.max()
+
+    return edges, weights
+
+
+def layout(graph, iterations=None, seed=None):
+    '''
+    the positions of the nodes of `graph` by node id, `(x, y)` in inches.
+    '''
+    if numpy is None:
+        raise ImportError('`numpy` is required for the layout')
+
+    if iterations is None:
+        iterations = 50
+
+    if seed is None:
+        seed = 0
+
+    names = list(graph.nodes.keys())
+    ids = dict(map(lambda x: (x[1], x[0]), enumerate(names)))
+    edges, weights = get_edges(graph, ids)
+
+    # the node without group is the cluster of itself
+    clusters = collections.OrderedDict()
+    for name, node in graph.nodes.items():
+        key = ('group', node['group']) if node['group'] is not None else ('node', name)
+        clusters.setdefault(key, list()).append(ids[name])
+
+    cluster_members = list(clusters.values())
+    cluster_of = numpy.zeros(len(names), dtype=numpy.int64)
+    for c, members in enumerate(cluster_members):
+        cluster_of[members] = c
+
+    # the graph of clusters; the weights of the edges between clusters are summed
+    cluster_edges = numpy.zeros((0, 2), dtype=numpy.int64)
+    cluster_weights = numpy.zeros(0)
+    if len(edges):
+        ce = cluster_of[edges]
+        crossing = ce[:, 0] != ce[:, 1]
+        if crossing.any():
+            ce = numpy.sort(ce[crossing], axis=1)
+            cluster_edges, inverse = numpy.unique(ce, axis=0, return_inverse=True)
+            cluster_weights = numpy.bincount(inverse.reshape(-1), weights=weights[crossing])
+            cluster_weights = cluster_weights / cluster_weights.max()
+
+    radius = numpy.array(list(map(lambda x: spacing * math.sqrt(len(x)) / 2, cluster_members)))
+    centers = separate(
+        normalize(spring(len(cluster_members), cluster_edges, cluster_weights, iterations=iterations, seed=seed)),
+        radius,
+    )
+
+    pos = numpy.zeros((len(names), 2))
+    inside = cluster_of[edges[:, 0]] == cluster_of[edges[:, 1]] if len(edges) else numpy.zeros(0, dtype=bool)
+    for c, members in enumerate(cluster_members):
+        if len(members) <= circle_size:
+            local = circle(len(members))
+        else:
+            position = numpy.full(len(names), -1, dtype=numpy.int64)
+            position[members] = numpy.arange(len(members))
+
+            selected = inside & (cluster_of[edges[:, 0]] == c) if len(edges) else inside
+            local = normalize(spring(
+                len(members),
+                position[edges[selected]],
+                weights[selected],
+                iterations=iterations,
+                seed=seed,
+            ))
+
+        pos[members] = centers[c] + local * radius[c]
+
+    log.debug('layout: nodes=%d clusters=%d edges=%d', len(names), len(cluster_members), len(edges))
+
+    return dict(map(lambda x: (x[1], (float(pos[x[0], 0]), float(pos[x[0], 1]))), enumerate(names)))
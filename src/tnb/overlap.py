@@ -0,0 +1,186 @@
+'''
+# pairwise overlap of the quorum sets
+
+the numbers of the shared validators of every 2 nodes are counted at once
+from the quorum sets of `Builder.make_quorums()` or `quorums.json`.
+
+* the nodes, which have the same quorum set are counted once; the quorum
+  sets are the rows of the quorum sets × validators incidence matrix, `M`
+* `M @ M.T` is the numbers of the shared validators of every 2 quorum sets
+* without numpy, the quorum sets are int bitmasks of `ValidatorIndex` and
+  counted by `popcount()`
+* `RegionGraph` counts the shared validators of every 2 regions from the
+  distinct quorum sets of each region
+'''
+
+import itertools
+import logging
+
+from .quorum import (
+    ValidatorIndex,
+    popcount,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+log = logging.getLogger(__name__)
+
+
+class QuorumOverlap:
+    names = None
+    position = None
+    index = None
+    members = None
+    set_by_node = None
+    counts = None
+
+    def __init__(self, quorums, use_numpy=None):
+        if use_numpy is None:
+            use_numpy = numpy is not None
+
+        self.names = list(quorums.keys())
+        self.position = dict(map(lambda x: (x[1], x[0]), enumerate(self.names)))
+        self.index = ValidatorIndex()
+
+        # intern the quorum sets
+        self.members = list()
+        self.set_by_node = list()
+        sets = dict()
+        for name in self.names:
+            vs = frozenset(itertools.chain(*quorums[name]['validators'].values()))
+            if vs not in sets:
+                sets[vs] = len(self.members)
+                self.members.append(vs)
+
+            self.set_by_node.append(sets[vs])
+
+        if use_numpy:
+            self.counts = self.count_matrix(self.members)
+        else:
+            self.counts = self.count_masks(self.members)
+
+        log.debug('overlap: nodes=%d quorum sets=%d', len(self.names), len(self.members))
+
+    def count_matrix(self, members):
+        for vs in members:
+            for v in vs:
+                self.index.add(v)
+
+        m = numpy.zeros((len(members), len(self.index.names)), dtype=numpy.int32)
+        for i, vs in enumerate(members):
+            m[i, list(map(lambda x: self.index.ids[x], vs))] = 1
+
+        return (m @ m.T).tolist()
+
+    def count_masks(self, members):
+        masks = list(map(self.index.mask, members))
+
+        return list(map(lambda a: list(map(lambda b: popcount(a & b), masks)), masks))
+
+    def count(self, v0, v1):
+        '''
+        the number of the validators, which are in the quorum sets of both
+        nodes.
+        '''
+        return self.counts[self.set_by_node[self.position[v0]]][self.set_by_node[self.position[v1]]]
+
+    def contains(self, node, validator):
+        return validator in self.members[self.set_by_node[self.position[node]]]
+
+    def range(self):
+        '''
+        the maximum and minimum of the counts of every 2 nodes; `None` if
+        there are less than 2 nodes.
+        '''
+        sizes = [0] * len(self.members)
+        for i in self.set_by_node:
+            sizes[i] += 1
+
+        found = list()
+        for i in range(len(self.members)):
+            if sizes[i] > 1:
+                found.append(self.counts[i][i])
+
+            for j in range(i + 1, len(self.members)):
+                found.append(self.counts[i][j])
+
+        if not found:
+            return None
+
+        return (max(found), min(found))
+
+    def connected(self):
+        '''
+        the pairs of nodes, `(v0, v1, count)`; `v0` is before `v1` and in the
+        quorum set of `v1`.
+        '''
+        pairs = list()
+        for j, v1 in enumerate(self.names):
+            for v0 in self.members[self.set_by_node[j]]:
+                i = self.position.get(v0)
+                if i is None or i >= j:
+                    continue
+
+                pairs.append((i, j))
+
+        return list(map(
+            lambda x: (self.names[x[0]], self.names[x[1]], self.counts[self.set_by_node[x[0]]][self.set_by_node[x[1]]]),
+            sorted(pairs),
+        ))
+
+
+class RegionGraph:
+    '''
+    the connectivity of regions; the edge of 2 regions has the validators,
+    which the nodes of each region trust in the other region. The nodes of
+    same region usually share the quorum set, so each distinct quorum set of
+    region is counted once.
+    '''
+    regions = None
+    common = None
+
+    def __init__(self, regions, common):
+        self.regions = regions
+        self.common = common
+
+    @classmethod
+    def from_quorums(cls, quorums):
+        regions = list()
+        quorum_sets = dict()
+        for q in quorums.values():
+            region_name = q['region']
+            if region_name not in quorum_sets:
+                regions.append(region_name)
+                quorum_sets[region_name] = dict()
+
+            key = q.get('quorum_set')
+            if key is None:
+                key = id(q['validators'])
+
+            quorum_sets[region_name].setdefault(key, q['validators'])
+
+        common = dict()
+        for region_name in regions:
+            for other in regions:
+                if region_name == other:
+                    continue
+
+                for validators in quorum_sets[other].values():
+                    if region_name not in validators:
+                        continue
+
+                    key = tuple(sorted((region_name, other)))
+                    common.setdefault(key, set()).update(validators[region_name])
+
+        return cls(regions, common)
+
+    @property
+    def edges(self):
+        '''
+        `(region, other region, count)` of the connected regions.
+        '''
+        return list(map(lambda x: x[0] + (len(x[1]),), self.common.items()))
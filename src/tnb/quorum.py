@@ -40,37 +40,439 @@
 
 
 import argparse
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import heapq
 import itertools
+import json
 import logging
 import colorlog
+import pathlib
 import sys
-import random  # noqa
+import random
+import statistics
+import time
 from pprint import pprint, pformat  # noqa
 import termcolor
 import tabulate
 
+from .diagnostics import (
+    Lazy,
+    is_enabled,
+    trace,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 IS_TERM = sys.stdout.isatty()
 
 log = logging.getLogger(__name__)
 
 
+def popcount(n):
+    return bin(n).count('1')
+
+
+class ValidatorIndex:
+    '''
+    interns the validator names to integer ids, so the set of validators can
+    be handled as int bitmask.
+    '''
+    names = None
+    ids = None
+
+    def __init__(self, names=None):
+        self.names = list()
+        self.ids = dict()
+
+        if names is not None:
+            for name in names:
+                self.add(name)
+
+    def add(self, name):
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+
+        return self.ids[name]
+
+    def mask(self, names):
+        m = 0
+        for name in names:
+            m |= 1 << self.add(name)
+
+        return m
+
+    def unmask(self, mask):
+        names = list()
+        i = 0
+        while mask:
+            if mask & 1:
+                names.append(self.names[i])
+
+            mask >>= 1
+            i += 1
+
+        return names
+
+
+class Candidates:
+    '''
+    the materialized candidates of one stage of `AvailableQuorumCommons`. The
+    commons and the margins are kept as tuples and indexed by the size of
+    common and by the safety margin, so they can be queried repeatedly without
+    enumerating again.
+    '''
+    keys = ('min_size', 'liveness', 'safety')
+
+    stage = None
+    commons = None
+    values = None
+    by_size = None
+    by_safety = None
+
+    def __init__(self, stage, candidates=None):
+        self.stage = stage
+        self.commons = list()
+        self.values = list()
+
+        if candidates is not None:
+            for c, value in candidates:
+                self.append(c, value)
+
+    def __len__(self):
+        return len(self.commons)
+
+    def __iter__(self):
+        for i in range(len(self.commons)):
+            yield self.get(i)
+
+    def append(self, c, value):
+        self.commons.append(tuple(c))
+        self.values.append((value.get('min_size'), value.get('liveness'), value.get('safety')))
+
+        self.by_size = None
+        self.by_safety = None
+
+        return
+
+    def items(self):
+        return zip(self.commons, self.values)
+
+    def get(self, i):
+        value = dict()
+        for k, v in zip(self.keys, self.values[i]):
+            if v is not None:
+                value[k] = v
+
+        return (list(self.commons[i]), value)
+
+    def make_index(self):
+        if self.by_size is not None:
+            return
+
+        self.by_size = dict()
+        self.by_safety = dict()
+        for i, c in enumerate(self.commons):
+            self.by_size.setdefault(len(c), list()).append(i)
+
+            safety = self.values[i][2]
+            if safety is not None:
+                self.by_safety.setdefault(sum(safety), list()).append(i)
+
+        return
+
+    def get_by_size(self, size):
+        self.make_index()
+
+        return list(map(self.get, self.by_size.get(size, list())))
+
+    def get_by_safety(self, margin):
+        self.make_index()
+
+        return list(map(self.get, self.by_safety.get(margin, list())))
+
+    def safety_margins(self):
+        self.make_index()
+
+        return sorted(self.by_safety.keys())
+
+
+class CandidateStore:
+    '''
+    keeps the materialized stages of `AvailableQuorumCommons` by pair. When the
+    number of the stored candidates is over `max_candidates`, the least
+    recently used pairs are evicted.
+    '''
+    max_candidates = None
+    pairs = None
+    size = None
+
+    def __init__(self, max_candidates=None):
+        if max_candidates is None:
+            max_candidates = 200000
+
+        self.max_candidates = max_candidates
+        self.pairs = collections.OrderedDict()
+        self.size = 0
+
+    def __contains__(self, key):
+        return key in self.pairs
+
+    def get(self, key):
+        self.pairs.setdefault(key, dict())
+        self.pairs.move_to_end(key)
+
+        return self.pairs[key]
+
+    def put(self, key, candidates):
+        stages = self.get(key)
+        if candidates.stage in stages:
+            self.size -= len(stages[candidates.stage])
+
+        stages[candidates.stage] = candidates
+        self.size += len(candidates)
+
+        self.evict()
+
+        return
+
+    def discard(self, key):
+        stages = self.pairs.pop(key, dict())
+        self.size -= sum(map(len, stages.values()))
+
+        return
+
+    def evict(self):
+        while self.size > self.max_candidates and len(self.pairs) > 1:
+            key, stages = self.pairs.popitem(last=False)
+            self.size -= sum(map(len, stages.values()))
+
+            log.debug('candidates of %s was evicted', key[0])
+
+        return
+
+
+class ShapeMemo:
+    '''
+    keeps the chosen commons of `RegionalQuorum.compose_pair()` by the shape
+    of the region pair. The chosen common only depends on the sizes of the
+    quorums, the positions of the shared validators and the options, so the
+    common is kept as the positions in the quorums, `('a', i)` or `('b', j)`
+    and mapped back onto the names. When the number of the shapes is over
+    `max_shapes`, the least recently used shapes are evicted.
+    '''
+    max_shapes = None
+    shapes = None
+
+    def __init__(self, max_shapes=None):
+        if max_shapes is None:
+            max_shapes = 10000
+
+        self.max_shapes = max_shapes
+        self.shapes = collections.OrderedDict()
+
+    @staticmethod
+    def make_key(ra, rb, failure, engine, group_size):
+        positions = dict(map(lambda x: (x[1], x[0]), enumerate(rb)))
+
+        return (
+            engine,
+            failure,
+            group_size,
+            len(rb),
+            tuple(map(lambda x: positions.get(x, -1), ra)),
+        )
+
+    def __contains__(self, key):
+        return key in self.shapes
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def get(self, key, ra, rb):
+        '''
+        the common and its margins of the shape on `ra` and `rb`; the common is
+        `None` if the shape has no common.
+        '''
+        self.shapes.move_to_end(key)
+        solution = self.shapes[key]
+        if solution is None:
+            return None
+
+        positions, margins = solution
+
+        return (
+            list(map(lambda x: ra[x[1]] if x[0] == 'a' else rb[x[1]], positions)),
+            margins,
+        )
+
+    def put(self, key, ra, rb, common, margins):
+        if common is None:
+            self.shapes[key] = None
+        else:
+            positions_a = dict(map(lambda x: (x[1], x[0]), enumerate(ra)))
+            positions_b = dict(map(lambda x: (x[1], x[0]), enumerate(rb)))
+            self.shapes[key] = (
+                tuple(map(lambda x: ('a', positions_a[x]) if x in positions_a else ('b', positions_b[x]), common)),
+                margins,
+            )
+
+        self.shapes.move_to_end(key)
+        while len(self.shapes) > self.max_shapes:
+            self.shapes.popitem(last=False)
+
+        return
+
+    def save(self, path):
+        pathlib.Path(path).write_text(json.dumps(list(self.shapes.items())))
+
+        return
+
+    def load(self, path):
+        '''
+        loads the shapes, which were saved by `save()`; the missing file is
+        ignored.
+        '''
+        p = pathlib.Path(path)
+        if not p.exists():
+            return
+
+        for key, solution in json.loads(p.read_text()):
+            engine, failure, group_size, size, positions = key
+            key = (engine, failure, group_size, size, tuple(positions))
+            if solution is not None:
+                positions, margins = solution
+                solution = (
+                    tuple(map(tuple, positions)),
+                    dict(map(lambda x: (x[0], tuple(x[1])), margins.items())),
+                )
+
+            self.shapes[key] = solution
+
+        while len(self.shapes) > self.max_shapes:
+            self.shapes.popitem(last=False)
+
+        return
+
+
+class CommonsStats:
+    '''
+    the counters and the timings of one `AvailableQuorumCommons`;
+    * `chains`: the number of the candidate commons, which were generated
+    * `passed`: the number of the candidates passed by stage
+    * `elapsed`: the seconds spent by stage, without the inner stages
+    * `chosen`: the margins of the chosen candidate
+    '''
+    name = None
+    chains = None
+    passed = None
+    elapsed = None
+    chosen = None
+    memoized = False
+    nested = None
+
+    def __init__(self, name):
+        self.name = name
+        self.chains = 0
+        self.passed = dict()
+        self.elapsed = dict()
+        self.nested = list()
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        self.nested.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            inner = self.nested.pop()
+            self.elapsed[stage] = self.elapsed.get(stage, 0) + elapsed - inner
+            if self.nested:
+                self.nested[-1] += elapsed
+
+    def as_dict(self):
+        return dict(
+            name=self.name,
+            chains=self.chains,
+            passed=dict(self.passed),
+            elapsed=dict(self.elapsed),
+            chosen=self.chosen,
+            memoized=self.memoized,
+        )
+
+
+class CompositionStats:
+    '''
+    the stats of `RegionalQuorum.compose()`; the `CommonsStats` of the region
+    pairs in the composed order.
+    '''
+    engine = None
+    pairs = None
+    elapsed = None
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.pairs = list()
+        self.elapsed = 0
+
+    def add(self, stats):
+        self.pairs.append(stats)
+
+        return
+
+    def as_dict(self):
+        return dict(
+            engine=self.engine,
+            elapsed=self.elapsed,
+            pairs=list(map(lambda x: x.as_dict(), self.pairs)),
+        )
+
+
 class AvailableQuorumCommons:
     ra = None
     rb = None
     failure = None
+    index = None
+    store = None
+    group_size = 6
 
     commons = None
+    stats = None
 
-    def __init__(self, name, ra, rb, failure):
+    def __init__(self, name, ra, rb, failure, index=None, store=None, group_size=None):
         self.name = name
+        self.stats = CommonsStats(name)
         self.ra = ra
         self.rb = rb
         self.failure = failure
+        self.index = index
+        self.store = store
+        if group_size is not None:
+            self.group_size = group_size
+
         self.min_size = 3 * self.failure + 1
 
         self.nn = set(self.ra) | set(self.rb)
 
+    @property
+    def key(self):
+        return (
+            self.name,
+            self.__class__.__name__,
+            tuple(self.ra),
+            tuple(self.rb),
+            self.failure,
+            self.group_size,
+        )
+
     def make(self):
         C = list(set(self.ra) & set(self.rb))
 
@@ -91,28 +493,64 @@ class AvailableQuorumCommons:
         if passed:
             passed = 2 * len(C) - len(self.nn) - 1 - self.failure >= 0
 
+        if passed and 'commons_safety' not in self.get_commons():
+            self.log_debug('current commons already satisfy the safety')
+
+            liveness = len(self.nn) - len(C) - self.failure
+            safety = 2 * len(C) - len(self.nn) - 1 - self.failure
+            self.put_commons(Candidates(
+                'commons_safety',
+                (
+                    (
+                        C,
+                        dict(
+                            min_size=(len(self.ra) - self.min_size, len(self.rb) - self.min_size),
+                            liveness=(liveness, liveness),
+                            safety=(safety, safety),
+                        ),
+                    ),
+                ),
+            ))
+
+        return self.commons_safety
+
+    def get_commons(self):
+        if self.store is not None:
+            return self.store.get(self.key)
+
         if self.commons is None:
             self.commons = dict()
 
-        if passed:
-            self.commons['commons_safety'] = C
+        return self.commons
 
-        return self.commons_safety
+    def put_commons(self, candidates):
+        if self.store is None:
+            self.get_commons()[candidates.stage] = candidates
+        else:
+            self.store.put(self.key, candidates)
+
+        return
 
     def reset(self):
+        if self.store is not None:
+            self.store.discard(self.key)
+
         self.commons = None
 
         return
 
     def cache(f):
         def w(self, *a, **kw):
-            if self.commons is None:
-                self.commons = dict()
+            commons = self.get_commons()
+            if f.__name__ not in commons:
+                with self.stats.measure(f.__name__):
+                    candidates = Candidates(f.__name__, f(self, *a, **kw))
 
-            if f.__name__ not in self.commons:
-                self.commons[f.__name__] = f(self, *a, **kw)
+                self.put_commons(candidates)
 
-            return self.commons[f.__name__]
+            self.stats.passed[f.__name__] = len(commons[f.__name__])
+
+            return commons[f.__name__]
 
         return w
 
@@ -121,6 +559,7 @@ class AvailableQuorumCommons:
     def commons_min_size(self):
         self.log_debug('trying to get commons for satisfy the minimum size with failure: `vn >= min_size`: %d %d')
 
+        is_debug = is_enabled(log)
         C = set(self.ra) & set(self.rb)
 
         n = 0
@@ -133,28 +572,10 @@ class AvailableQuorumCommons:
 
             vra = vnra - self.min_size
             vrb = vnrb - self.min_size
-            failed = dict()
-            failed['vnra'] = vra >= 0
-            failed['vnrb'] = vrb >= 0
-
-            logs = list()
-            for k, v in failed.items():
-                logs.append(
-                    '%s(%d >= %d=%s)' % (
-                        k,
-                        vnra if k == 'vnra' else vnrb,
-                        self.min_size,
-                        colored('%-5s' % v, 'green' if v else 'red'),
-                    ),
-                )
+            if is_debug:
+                self.log_min_size(c, vnra, vnrb)
 
-            self.log_debug(
-                'min size - is valid: %s check: %s common: %s',
-                colored('%-5s' % (False not in failed.values()), 'green' if False not in failed.values() else 'red'),
-                ', '.join(logs),
-                c,
-            )
-            if False in failed.values():
+            if vra < 0 or vrb < 0:
                 continue
 
             n += 1
@@ -165,46 +586,63 @@ class AvailableQuorumCommons:
         else:
             self.log_error('minimum size pairs not found')
 
+    def log_min_size(self, c, vnra, vnrb):
+        failed = dict()
+        failed['vnra'] = vnra - self.min_size >= 0
+        failed['vnrb'] = vnrb - self.min_size >= 0
+
+        trace.emit(
+            'min_size',
+            pair=self.name,
+            common=c,
+            vnra=vnra,
+            vnrb=vnrb,
+            min_size=self.min_size,
+            valid=False not in failed.values(),
+        )
+
+        if not log.isEnabledFor(logging.DEBUG):
+            return failed
+
+        logs = list()
+        for k, v in failed.items():
+            logs.append(
+                '%s(%d >= %d=%s)' % (
+                    k,
+                    vnra if k == 'vnra' else vnrb,
+                    self.min_size,
+                    colored('%-5s' % v, 'green' if v else 'red'),
+                ),
+            )
+
+        self.log_debug(
+            'min size - is valid: %s check: %s common: %s',
+            colored('%-5s' % (False not in failed.values()), 'green' if False not in failed.values() else 'red'),
+            ', '.join(logs),
+            c,
+        )
+
+        return failed
+
     @property
     @cache
     def commons_liveness(self):
         self.log_debug('trying to get the commons for keep the liveness: `vn - cn >= f`')
 
+        is_debug = is_enabled(log)
+
         n = 0
-        for q, value in sorted(self.commons_min_size, key=lambda x: len(x), reverse=True):
+        for q, value in self.commons_min_size:
             # vnra = self.combine_quorum_and_common(self.ra, q)
             # vnrb = self.combine_quorum_and_common(self.rb, q)
             cn = len(q)
 
-            failed = dict()
-
             vra = len(self.nn) - cn - self.failure
             vrb = len(self.nn) - cn - self.failure
-            failed['vnra'] = vra >= 0
-            failed['vnrb'] = vrb >= 0
-
-            logs = list()
-            for k, v in failed.items():
-                logs.append(
-                    '%s(%d - %d = %d >= %d)' % (
-                        k,
-                        # vnra if k == 'vnra' else vnrb,
-                        len(self.nn),
-                        cn,
-                        # vra if k == 'vnra' else vrb,
-                        len(self.nn),
-                        self.failure,
-                    ),
-                )
+            if is_debug:
+                self.log_liveness(q, cn, vra, vrb)
 
-            self.log_debug(
-                'liveness - is valid: %s check: %s common: %s',
-                colored('%-5s' % (False not in failed.values()), 'green' if False not in failed.values() else 'red'),
-                ', '.join(logs),
-                q,
-            )
-
-            if False in failed.values():
+            if vra < 0 or vrb < 0:
                 continue
 
             value['liveness'] = (vra, vrb)
@@ -221,39 +659,20 @@ class AvailableQuorumCommons:
     def commons_safety(self):
         self.log_debug('trying to get the commons for filling the safety numbers: `2*cn - vn - 1 >= f`')
 
+        is_debug = is_enabled(log)
+
         n = 0
-        for q, value in sorted(self.commons_liveness, key=lambda x: len(x), reverse=True):
+        for q, value in self.commons_liveness:
             # vnra = self.combine_quorum_and_common(self.ra, q)
             # vnrb = self.combine_quorum_and_common(self.rb, q)
             cn = len(q)
 
-            failed = dict()
             vra = 2 * cn - len(self.nn) - 1 - self.failure
             vrb = 2 * cn - len(self.nn) - 1 - self.failure
-            failed['vnra'] = vra >= 0
-            failed['vnrb'] = vrb >= 0
-
-            logs = list()
-            for k, v in failed.items():
-                logs.append(
-                    '%s(2 * %d - %d - 1 = %d >= %d)' % (
-                        k,
-                        cn,
-                        # vnra if k == 'vnra' else vnrb,
-                        len(self.nn),
-                        # 2 * cn - (vnra if k == 'vnra' else vnrb) - 1,
-                        2 * cn - len(self.nn) - 1,
-                        self.failure,
-                    )
-                )
-            self.log_debug(
-                'safety - is valid: %s check: %s common: %s',
-                colored('%-5s' % (False not in failed.values()), 'green' if False not in failed.values() else 'red'),
-                ', '.join(logs),
-                q,
-            )
+            if is_debug:
+                self.log_safety(q, cn, vra, vrb)
 
-            if False in failed.values():
+            if vra < 0 or vrb < 0:
                 continue
 
             value['safety'] = (vra, vrb)
@@ -265,17 +684,102 @@ class AvailableQuorumCommons:
         else:
             self.log_error('safety pairs not found')
 
+    def log_liveness(self, q, cn, vra, vrb):
+        failed = dict()
+        failed['vnra'] = vra >= 0
+        failed['vnrb'] = vrb >= 0
+
+        trace.emit(
+            'liveness',
+            pair=self.name,
+            common=q,
+            cn=cn,
+            vn=len(self.nn),
+            failure=self.failure,
+            valid=False not in failed.values(),
+        )
+
+        if not log.isEnabledFor(logging.DEBUG):
+            return failed
+
+        logs = list()
+        for k, v in failed.items():
+            logs.append(
+                '%s(%d - %d = %d >= %d)' % (
+                    k,
+                    # vnra if k == 'vnra' else vnrb,
+                    len(self.nn),
+                    cn,
+                    # vra if k == 'vnra' else vrb,
+                    len(self.nn),
+                    self.failure,
+                ),
+            )
+
+        self.log_debug(
+            'liveness - is valid: %s check: %s common: %s',
+            colored('%-5s' % (False not in failed.values()), 'green' if False not in failed.values() else 'red'),
+            ', '.join(logs),
+            q,
+        )
+
+        return failed
+
+    def log_safety(self, q, cn, vra, vrb):
+        failed = dict()
+        failed['vnra'] = vra >= 0
+        failed['vnrb'] = vrb >= 0
+
+        trace.emit(
+            'safety',
+            pair=self.name,
+            common=q,
+            cn=cn,
+            vn=len(self.nn),
+            failure=self.failure,
+            valid=False not in failed.values(),
+        )
+
+        if not log.isEnabledFor(logging.DEBUG):
+            return failed
+
+        logs = list()
+        for k, v in failed.items():
+            logs.append(
+                '%s(2 * %d - %d - 1 = %d >= %d)' % (
+                    k,
+                    cn,
+                    # vnra if k == 'vnra' else vnrb,
+                    len(self.nn),
+                    # 2 * cn - (vnra if k == 'vnra' else vnrb) - 1,
+                    2 * cn - len(self.nn) - 1,
+                    self.failure,
+                )
+            )
+        self.log_debug(
+            'safety - is valid: %s check: %s common: %s',
+            colored('%-5s' % (False not in failed.values()), 'green' if False not in failed.values() else 'red'),
+            ', '.join(logs),
+            q,
+        )
+
+        return failed
+
     def combine_quorum_and_common(self, q, c):
         return len(set(q) | set(c))
 
     def print_set(self, name, q, c):
-        m = 100
-
         co = sorted(c)
         e = sorted(set(q) - set(c))
         n = sorted(set(c) - set(q))
         v = sorted(set(q) | set(c))
 
+        return self.format_set(name, co, e, n, v)
+
+    def format_set(self, name, co, e, n, v):
+        m = 100
+
+        c = set(co)
         vs = ', '.join(map(lambda x: colored(x, 'green') if x in c else colored(x, 'yellow'), v))
         rows = (
             ('quroum', name + ('' if len(name) > m else ' ' * (m - len(name))) + '.'),
@@ -327,13 +831,16 @@ class AvailableQuorumCommons:
     def chain(self, a, b):
         self.log_debug('trying to create chains: %d <-> %d', len(a), len(b))
 
-        size = 6
-        la = self.make_restricted_pair(a, size)
-        lb = self.make_restricted_pair(b, size)
+        la = self.make_restricted_pair(a, self.group_size)
+        lb = self.make_restricted_pair(b, self.group_size)
         for i in range(len(la) + len(lb)):
             for j in itertools.combinations(la + lb, i):
+                self.stats.chains += 1
                 yield list(itertools.chain(*j))
 
+    def make_groups(self, a, b):
+        return self.make_restricted_pair(a, self.group_size) + self.make_restricted_pair(b, self.group_size)
+
     def make_restricted_pair(self, a, size):
         if len(a) < size:
             return list(map(lambda x: [x], a))
@@ -359,12 +866,592 @@ class AvailableQuorumCommons:
         return l
 
 
+class BitsetQuorumCommons(AvailableQuorumCommons):
+    '''
+    produces the same commons with `AvailableQuorumCommons`, but the quorums
+    and the candidate commons are int bitmasks of `ValidatorIndex`, so union,
+    intersection and size become the bit operations.
+    '''
+    ma = None
+    mb = None
+
+    def __init__(self, *a, **kw):
+        super(BitsetQuorumCommons, self).__init__(*a, **kw)
+
+        if self.index is None:
+            self.index = ValidatorIndex()
+
+        self.ma = self.index.mask(self.ra)
+        self.mb = self.index.mask(self.rb)
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_min_size(self):
+        self.log_debug('trying to get commons for satisfy the minimum size with failure: `vn >= min_size`: %d %d')
+
+        is_debug = is_enabled(log)
+        C = self.ma & self.mb
+
+        n = 0
+        for groups, mc in self.chain_masks(self.ra, self.rb):
+            if C and mc & C != C:
+                continue
+
+            vnra = popcount(self.ma | mc)
+            vnrb = popcount(self.mb | mc)
+
+            vra = vnra - self.min_size
+            vrb = vnrb - self.min_size
+            if is_debug:
+                self.log_min_size(list(itertools.chain(*groups)), vnra, vnrb)
+
+            if vra < 0 or vrb < 0:
+                continue
+
+            n += 1
+            yield (list(itertools.chain(*groups)), dict(min_size=(vra, vrb)))
+
+        if n > 0:
+            self.log_debug('%d commons for satisfy the minimum size with failure', n)
+        else:
+            self.log_error('minimum size pairs not found')
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_liveness(self):
+        self.log_debug('trying to get the commons for keep the liveness: `vn - cn >= f`')
+
+        is_debug = is_enabled(log)
+        vn = len(self.nn)
+
+        n = 0
+        for q, values in self.commons_min_size.items():
+            cn = len(q)
+            v = vn - cn - self.failure
+            if is_debug:
+                self.log_liveness(list(q), cn, v, v)
+
+            if v < 0:
+                continue
+
+            n += 1
+            yield (q, dict(min_size=values[0], liveness=(v, v)))
+
+        if n > 0:
+            self.log_debug('%d commons for keep the liveness', n)
+        else:
+            self.log_error('liveness pairs not found')
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_safety(self):
+        self.log_debug('trying to get the commons for filling the safety numbers: `2*cn - vn - 1 >= f`')
+
+        is_debug = is_enabled(log)
+        vn = len(self.nn)
+
+        n = 0
+        for q, values in self.commons_liveness.items():
+            cn = len(q)
+            v = 2 * cn - vn - 1 - self.failure
+            if is_debug:
+                self.log_safety(list(q), cn, v, v)
+
+            if v < 0:
+                continue
+
+            n += 1
+            yield (q, dict(min_size=values[0], liveness=values[1], safety=(v, v)))
+
+        if n > 0:
+            self.log_debug('%d commons for filling the safety numbers', n)
+        else:
+            self.log_error('safety pairs not found')
+
+    def as_mask(self, q):
+        if type(q) in (int,):
+            return q
+
+        return self.index.mask(q)
+
+    def combine_quorum_and_common(self, q, c):
+        return popcount(self.as_mask(q) | self.as_mask(c))
+
+    def print_set(self, name, q, c):
+        mq = self.as_mask(q)
+        mc = self.as_mask(c)
+
+        return self.format_set(
+            name,
+            sorted(self.index.unmask(mc)),
+            sorted(self.index.unmask(mq & ~mc)),
+            sorted(self.index.unmask(mc & ~mq)),
+            sorted(self.index.unmask(mq | mc)),
+        )
+
+    def chain_masks(self, a, b):
+        self.log_debug('trying to create chains: %d <-> %d', len(a), len(b))
+
+        groups = self.make_groups(a, b)
+        masks = list(map(self.index.mask, groups))
+        for i in range(len(groups)):
+            for j in itertools.combinations(range(len(groups)), i):
+                mc = 0
+                for k in j:
+                    mc |= masks[k]
+
+                self.stats.chains += 1
+                yield (list(map(lambda x: groups[x], j)), mc)
+
+
+class SolverQuorumCommons(BitsetQuorumCommons):
+    '''
+    the liveness, `vn - cn >= f` and the safety, `2*cn - vn - 1 >= f` only
+    depend on the size of common, so the feasible range of the common size is
+    calculated at first, and only the combinations, which have the exact size
+    in that range are built. The smallest common size wins and the ties are
+    broken like `RegionalQuorum.compose_pair()`; the least shared with `ra`,
+    and then the order of `chain()`.
+    '''
+
+    def common_size_range(self):
+        vn = len(self.nn)
+
+        # safety: 2 * cn - vn - 1 >= f
+        lo = max(0, -(-(vn + 1 + self.failure) // 2))
+
+        # liveness: vn - cn >= f
+        hi = vn - self.failure
+
+        return (lo, hi)
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_safety(self):
+        lo, hi = self.common_size_range()
+        self.log_debug('trying to solve the commons: %d <= cn <= %d', lo, hi)
+
+        if lo > hi:
+            self.log_error('safety pairs not found')
+            return
+
+        groups = self.make_groups(self.ra, self.rb)
+        masks = list(map(self.index.mask, groups))
+        sizes = list(map(len, groups))
+        hi = min(hi, sum(sizes))
+
+        C = self.ma & self.mb
+        vn = len(self.nn)
+
+        for cn in range(lo, hi + 1):
+            found = None
+            for i in range(len(groups)):
+                for j in self.combinations_by_size(sizes, i, cn):
+                    self.stats.chains += 1
+                    mc = 0
+                    for k in j:
+                        mc |= masks[k]
+
+                    if C and mc & C != C:
+                        continue
+
+                    vra = popcount(self.ma | mc) - self.min_size
+                    vrb = popcount(self.mb | mc) - self.min_size
+                    if vra < 0 or vrb < 0:
+                        continue
+
+                    shared = popcount(self.ma & mc)
+                    if found is None or shared < found[0]:
+                        found = (shared, j, vra, vrb)
+
+            if found is None:
+                continue
+
+            shared, j, vra, vrb = found
+            liveness = vn - cn - self.failure
+            safety = 2 * cn - vn - 1 - self.failure
+
+            self.log_debug('common was solved: cn=%d shared=%d', cn, shared)
+
+            yield (
+                list(itertools.chain(*map(lambda x: groups[x], j))),
+                dict(
+                    min_size=(vra, vrb),
+                    liveness=(liveness, liveness),
+                    safety=(safety, safety),
+                ),
+            )
+
+            return
+
+        self.log_error('safety pairs not found')
+
+    def combinations_by_size(self, sizes, k, total):
+        '''
+        same order with `itertools.combinations(range(len(sizes)), k)`, but
+        only yields the combinations, whose sum of sizes is `total`.
+        '''
+        n = len(sizes)
+
+        # the sums of the `j` smallest and largest sizes in `sizes[i:]`
+        bounds = list()
+        for i in range(n + 1):
+            s = sorted(sizes[i:])
+            bounds.append((
+                list(itertools.accumulate([0] + s)),
+                list(itertools.accumulate([0] + s[::-1])),
+            ))
+
+        def walk(start, k, total, prefix):
+            if k == 0:
+                if total == 0:
+                    yield tuple(prefix)
+
+                return
+
+            for i in range(start, n - k + 1):
+                rest = total - sizes[i]
+                smallest, largest = bounds[i + 1]
+                if rest < smallest[k - 1] or rest > largest[k - 1]:
+                    continue
+
+                prefix.append(i)
+                yield from walk(i + 1, k - 1, rest, prefix)
+                prefix.pop()
+
+        return walk(0, k, total, list())
+
+
+class BranchAndBoundQuorumCommons(SolverQuorumCommons):
+    '''
+    walks the subset lattice of the groups of `make_restricted_pair()`
+    best-first. Each branch is bounded by the optimistic key of
+    `RegionalQuorum.compose_pair()`, `(cn, shared with ra, chain order)`, and
+    the branches, which can not satisfy the common size range, the intersection
+    and the minimum size are pruned, so the first candidate taken from the
+    heap is the winner of the exhaustive path.
+    '''
+    visited = None
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_safety(self):
+        lo, hi = self.common_size_range()
+        self.log_debug('trying to search the commons: %d <= cn <= %d', lo, hi)
+
+        self.visited = 0
+        if lo > hi:
+            self.log_error('safety pairs not found')
+            return
+
+        groups = self.make_groups(self.ra, self.rb)
+        masks = list(map(self.index.mask, groups))
+        sizes = list(map(len, groups))
+        n = len(groups)
+
+        # the union, the reachable sums of sizes as bits and the sums of the
+        # largest sizes of `groups[i:]`
+        unions = [0] * (n + 1)
+        sums = [1] * (n + 1)
+        largest = list()
+        for i in range(n - 1, -1, -1):
+            unions[i] = unions[i + 1] | masks[i]
+            sums[i] = sums[i + 1] | (sums[i + 1] << sizes[i])
+
+        for i in range(n + 1):
+            largest.append(list(itertools.accumulate([0] + sorted(sizes[i:], reverse=True))))
+
+        C = self.ma & self.mb
+        vn = len(self.nn)
+
+        def least_groups(start, need):
+            for k, total in enumerate(largest[start]):
+                if total >= need:
+                    return k
+
+            return None
+
+        def push(heap, j, mc, total):
+            # `j` itself as candidate
+            if len(j) < n and lo <= total <= hi and mc & C == C:
+                vra = popcount(self.ma | mc) - self.min_size
+                vrb = popcount(self.mb | mc) - self.min_size
+                if vra >= 0 and vrb >= 0:
+                    key = (total, popcount(self.ma & mc), len(j), j)
+                    heapq.heappush(heap, (key, 0, j, mc, total, vra, vrb))
+
+            # the branches under `j`
+            start = j[-1] + 1 if j else 0
+            if start >= n or len(j) + 1 >= n:
+                return
+
+            # the least reachable size of the common under `j`
+            need = max(lo - total, 1)
+            reachable = sums[start] >> need
+            if reachable == 0:
+                return
+
+            cn = total + need + (reachable & -reachable).bit_length() - 1
+            if cn > hi:
+                return
+
+            optimistic = mc | unions[start]
+            if optimistic & C != C:
+                return
+
+            if popcount(self.ma | optimistic) < self.min_size or popcount(self.mb | optimistic) < self.min_size:
+                return
+
+            k = least_groups(start, lo - total)
+            if k is None:
+                return
+
+            key = (
+                cn,
+                popcount(self.ma & mc),
+                len(j) + max(k, 1),
+                j + (start,),
+            )
+            heapq.heappush(heap, (key, 1, j, mc, total, None, None))
+
+            return
+
+        heap = list()
+        push(heap, tuple(), 0, 0)
+
+        while heap:
+            key, is_branch, j, mc, total, vra, vrb = heapq.heappop(heap)
+            self.visited += 1
+            self.stats.chains += 1
+
+            if not is_branch:
+                liveness = vn - total - self.failure
+                safety = 2 * total - vn - 1 - self.failure
+
+                self.log_debug('common was found: cn=%d shared=%d visited=%d', total, key[1], self.visited)
+
+                yield (
+                    list(itertools.chain(*map(lambda x: groups[x], j))),
+                    dict(
+                        min_size=(vra, vrb),
+                        liveness=(liveness, liveness),
+                        safety=(safety, safety),
+                    ),
+                )
+
+                return
+
+            for i in range(j[-1] + 1 if j else 0, n):
+                push(heap, j + (i,), mc | masks[i], total + sizes[i])
+
+        self.log_error('safety pairs not found')
+
+
+@functools.lru_cache(maxsize=32)
+def combination_matrix(n):
+    '''
+    the combinations of `n` groups in the order of `chain()` and the
+    candidates × groups incidence matrix of them.
+    '''
+    rows = list(itertools.chain(*map(lambda x: itertools.combinations(range(n), x), range(n))))
+
+    m = numpy.zeros((len(rows), n), dtype=numpy.int32)
+    for i, row in enumerate(rows):
+        m[i, list(row)] = 1
+
+    return (rows, m)
+
+
+class VectorQuorumCommons(BitsetQuorumCommons):
+    '''
+    evaluates all the candidates of `chain()` at once with numpy. The
+    candidates are encoded as the candidates × validators incidence matrix,
+    and the margins of minimum size, liveness and safety and the sort keys of
+    `RegionalQuorum.compose_pair()` are calculated as array operations.
+    '''
+    groups = None
+    validators = None
+    incidence = None
+    evaluation = None
+
+    def __init__(self, *a, **kw):
+        if numpy is None:
+            raise ImportError('`numpy` is required for the vector engine')
+
+        super(VectorQuorumCommons, self).__init__(*a, **kw)
+
+        self.groups = self.make_groups(self.ra, self.rb)
+        self.validators = sorted(self.nn)
+
+        columns = dict(map(lambda x: (x[1], x[0]), enumerate(self.validators)))
+        self.incidence = numpy.zeros((len(self.groups), len(self.validators)), dtype=numpy.int32)
+        for i, group in enumerate(self.groups):
+            self.incidence[i, list(map(lambda x: columns[x], group))] = 1
+
+    def evaluate(self, incidence=None):
+        '''
+        `incidence` is the candidates × validators incidence matrix; if it is
+        missing, it is calculated from the groups.
+        '''
+        if self.evaluation is not None and incidence is None:
+            return self.evaluation
+
+        rows, m = combination_matrix(len(self.groups))
+        if incidence is None:
+            incidence = (m @ self.incidence) > 0
+
+        self.stats.chains = len(rows)
+
+        a = numpy.array(list(map(lambda x: x in self.ra, self.validators)), dtype=bool)
+        b = numpy.array(list(map(lambda x: x in self.rb, self.validators)), dtype=bool)
+        C = a & b
+        vn = len(self.validators)
+
+        cn = m @ numpy.array(list(map(len, self.groups)), dtype=numpy.int64)
+        covered = incidence[:, C].sum(axis=1) == C.sum()
+        vra = a.sum() + (incidence & ~a).sum(axis=1) - self.min_size
+        vrb = b.sum() + (incidence & ~b).sum(axis=1) - self.min_size
+        liveness = vn - cn - self.failure
+        safety = 2 * cn - vn - 1 - self.failure
+        shared = (incidence & a).sum(axis=1)
+
+        passed_min_size = covered & (vra >= 0) & (vrb >= 0)
+        passed_liveness = passed_min_size & (liveness >= 0)
+        passed_safety = passed_liveness & (safety >= 0)
+
+        # sort keys of `compose_pair()`; the order of `chain()` breaks the ties
+        order = numpy.flatnonzero(passed_safety)
+        order = order[numpy.lexsort((order, liveness[order], shared[order], safety[order]))]
+
+        self.evaluation = dict(
+            rows=rows,
+            cn=cn,
+            min_size=(vra, vrb),
+            liveness=liveness,
+            safety=safety,
+            shared=shared,
+            passed_min_size=passed_min_size,
+            passed_liveness=passed_liveness,
+            passed_safety=passed_safety,
+            order=order,
+        )
+
+        return self.evaluation
+
+    def get_common(self, i):
+        return list(itertools.chain(*map(lambda x: self.groups[x], self.evaluate()['rows'][i])))
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_min_size(self):
+        e = self.evaluate()
+        vra, vrb = e['min_size']
+        is_debug = is_enabled(log)
+
+        passed = numpy.flatnonzero(e['passed_min_size'])
+        for i in passed:
+            c = self.get_common(i)
+            if is_debug:
+                self.log_min_size(c, int(vra[i]) + self.min_size, int(vrb[i]) + self.min_size)
+
+            yield (c, dict(min_size=(int(vra[i]), int(vrb[i]))))
+
+        if len(passed) > 0:
+            self.log_debug('%d commons for satisfy the minimum size with failure', len(passed))
+        else:
+            self.log_error('minimum size pairs not found')
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_liveness(self):
+        e = self.evaluate()
+        vra, vrb = e['min_size']
+
+        passed = numpy.flatnonzero(e['passed_liveness'])
+        for i in passed:
+            v = int(e['liveness'][i])
+            yield (self.get_common(i), dict(min_size=(int(vra[i]), int(vrb[i])), liveness=(v, v)))
+
+        if len(passed) > 0:
+            self.log_debug('%d commons for keep the liveness', len(passed))
+        else:
+            self.log_error('liveness pairs not found')
+
+    @property
+    @AvailableQuorumCommons.cache
+    def commons_safety(self):
+        e = self.evaluate()
+        vra, vrb = e['min_size']
+
+        passed = numpy.flatnonzero(e['passed_safety'])
+        for i in passed:
+            v = int(e['liveness'][i])
+            w = int(e['safety'][i])
+            yield (
+                self.get_common(i),
+                dict(min_size=(int(vra[i]), int(vrb[i])), liveness=(v, v), safety=(w, w)),
+            )
+
+        if len(passed) > 0:
+            self.log_debug('%d commons for filling the safety numbers', len(passed))
+        else:
+            self.log_error('safety pairs not found')
+
+
+def evaluate_commons(qcs):
+    '''
+    evaluates the candidates of many `VectorQuorumCommons` in one call; the
+    pairs, which have the same number of groups share one matrix product.
+    '''
+    by_groups = dict()
+    for qc in qcs:
+        by_groups.setdefault(len(qc.groups), list()).append(qc)
+
+    for n, l in by_groups.items():
+        rows, m = combination_matrix(n)
+        incidence = (m @ numpy.hstack(list(map(lambda x: x.incidence, l)))) > 0
+
+        offset = 0
+        for qc in l:
+            width = qc.incidence.shape[1]
+            qc.evaluate(incidence[:, offset:offset + width])
+            offset += width
+
+    return list(map(lambda x: x.evaluation, qcs))
+
+
 class RegionalQuorum:
     regions = None
     failure = None
     number_of_near_regions = None
+    engine = None
+    index = None
+    store = None
+    group_size = None
+    random = None
+    pairs = None
+    stats = None
+    memo = None
+
+    engines = dict(
+        set=AvailableQuorumCommons,
+        bitset=BitsetQuorumCommons,
+        solver=SolverQuorumCommons,
+        branch_and_bound=BranchAndBoundQuorumCommons,
+        vector=VectorQuorumCommons,
+    )
 
-    def __init__(self, regions, failure, number_of_near_regions=None):
+    def __init__(
+            self,
+            regions,
+            failure,
+            number_of_near_regions=None,
+            engine=None,
+            store=None,
+            group_size=None,
+            seed=None,
+            memo=None,
+    ):
         assert type(regions) in (dict,)
 
         self.regions = regions
@@ -374,65 +1461,419 @@ class RegionalQuorum:
 
         self.number_of_near_regions = number_of_near_regions
 
-    def compose(self, distances):
+        if engine is None:
+            engine = 'set'
+
+        assert engine in self.engines
+
+        self.engine = engine
+        self.index = ValidatorIndex(sorted(itertools.chain(*self.regions.values())))
+
+        if store is None:
+            store = CandidateStore()
+
+        self.store = store
+        self.group_size = group_size
+
+        # the shapes are memoized only with `memo`
+        self.memo = memo
+
+        if seed is None:
+            self.random = random
+        else:
+            self.random = random.Random(seed)
+
+        self.stats = CompositionStats(self.engine)
+
+    def get_near_regions(self, distances, region_name):
+        '''
+        chooses one region of each distance level from the nearest up to
+        `number_of_near_regions`, so the near and the far regions are
+        connected; the region of level is chosen randomly. If the levels run
+        out, the rest regions are chosen from the nearest level.
+        '''
+        levels = distances[region_name]
+
+        near = list()
+        for _, regions in levels[:self.number_of_near_regions]:
+            near.append(self.random.sample(regions, 1)[0])
+
+        for _, regions in levels:
+            if len(near) >= self.number_of_near_regions:
+                break
+
+            rest = list(filter(lambda x: x not in near, regions))
+            near.extend(self.random.sample(rest, min(len(rest), self.number_of_near_regions - len(near))))
+
+        return near
+
+    def plan(self, distances):
+        '''
+        chooses the near regions of each region and returns the region pairs
+        in the order to be composed.
+        '''
         connected = dict()
-        quorums = dict()
+        pairs = list()
         rs = sorted(self.regions.keys())
 
         for i in range(len(rs)):
-            for level in range(self.number_of_near_regions)[:len(distances[rs[i]])]:
-                near = random.sample(distances[rs[i]][level][1], 1)[0]
+            for near in self.get_near_regions(distances, rs[i]):
                 key = tuple(sorted((rs[i], near)))
                 if key in connected:
                     continue
 
-                if rs[i] in quorums:
-                    ra = quorums[rs[i]]
-                else:
-                    ra = self.regions[rs[i]]
+                connected[key] = True
+                pairs.append((rs[i], near))
+
+        return pairs
+
+    def schedule(self, pairs):
+        '''
+        splits the region pairs into the rounds; the pairs in one round do not
+        share any region, and the pairs of each region keep their order, so
+        each round can be composed at the same time.
+        '''
+        rounds = list()
+        last = dict()
+        for pair in pairs:
+            index = max(map(lambda x: last.get(x, -1), pair)) + 1
+            if index == len(rounds):
+                rounds.append(list())
+
+            rounds[index].append(pair)
+            for r in pair:
+                last[r] = index
+
+        return rounds
+
+    def compose(self, distances, workers=None):
+        pairs = self.plan(distances)
+        self.pairs = pairs
+
+        return self.compose_pairs(pairs, dict(), workers=workers)
+
+    def recompose(self, previous, previous_regions, distances, workers=None):
+        '''
+        composes again only the region pairs, which have the changed regions.
+        `previous` is the composed quorums by region and `previous_regions`
+        is the validators by region, which `previous` was composed from.
+
+        * the region is changed, if the validators of region were changed or
+          the region is new; the quorum of changed region starts again from
+          its validators
+        * the partners of changed region are the regions, which were
+          composed with it; the new region chooses the near regions like
+          `plan()`
+        * the validators, which were removed are left out from the quorums of
+          the other regions
+        '''
+        current = set(itertools.chain(*self.regions.values()))
+        removed = set(itertools.chain(*previous_regions.values())) - current
+
+        changed = list()
+        quorums = dict()
+        for r in sorted(self.regions.keys()):
+            if r not in previous or set(self.regions[r]) != set(previous_regions.get(r, ())):
+                changed.append(r)
+                quorums[r] = self.regions[r]
+            elif removed & set(previous[r]):
+                quorums[r] = sorted(set(previous[r]) - removed)
+            else:
+                quorums[r] = previous[r]
 
-                if near in quorums:
-                    rb = quorums[near]
-                else:
-                    rb = self.regions[near]
+        connected = dict()
+        pairs = list()
+        for r in changed:
+            validators = set(previous_regions.get(r, ()))
+            partners = list()
+            for other in sorted(set(previous.keys()) & set(self.regions.keys())):
+                if other == r:
+                    continue
+
+                if validators & set(previous[other]) or set(previous_regions[other]) & set(previous.get(r, ())):
+                    partners.append(other)
 
-                cs = self.compose_pair(key, ra, rb)
-                if cs is None:
-                    log.error('failed to compose quorums for %s', key)
-                    return None
+            if len(partners) < 1:
+                partners = self.get_near_regions(distances, r)
+
+            for near in partners:
+                key = tuple(sorted((r, near)))
+                if key in connected:
+                    continue
 
                 connected[key] = True
-                quorums[rs[i]] = cs[0]
-                quorums[near] = cs[1]
+                pairs.append((r, near))
+
+        log.debug('%d regions were changed; %d pairs will be composed', len(changed), len(pairs))
+
+        self.pairs = pairs
+
+        return self.compose_pairs(pairs, quorums, workers=workers)
+
+    def compose_pairs(self, pairs, quorums, workers=None):
+        '''
+        composes `pairs` in order; `quorums` is the quorums by region, which
+        were already composed.
+        '''
+        if workers is None or workers < 2:
+            rounds = list(map(lambda x: [x], pairs))
+        else:
+            rounds = self.schedule(pairs)
+            log.debug('%d pairs were scheduled into %d rounds', len(pairs), len(rounds))
+
+        executor = None
+        if workers is not None and workers > 1 and len(rounds) < len(pairs):
+            trace.flush()
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+        self.stats = CompositionStats(self.engine)
+        started = time.perf_counter()
+
+        quorums = dict(quorums)
+        try:
+            for pairs_round in rounds:
+                args = list()
+                for a, b in pairs_round:
+                    args.append((
+                        tuple(sorted((a, b))),
+                        quorums.get(a, self.regions[a]),
+                        quorums.get(b, self.regions[b]),
+                    ))
+
+                if executor is None or len(args) < 2:
+                    results = map(lambda x: self.compose_pair(*x), args)
+                else:
+                    results = list()
+                    for cs, stats in executor.map(compose_pair, itertools.repeat(self.get_options()), *zip(*args)):
+                        self.stats.add(stats)
+                        results.append(cs)
+
+                for (a, b), (key, _, _), cs in zip(pairs_round, args, list(results)):
+                    if cs is None:
+                        log.error('failed to compose quorums for %s', key)
+                        return None
+
+                    quorums[a] = cs[0]
+                    quorums[b] = cs[1]
+        finally:
+            self.stats.elapsed = time.perf_counter() - started
+            if executor is not None:
+                executor.shutdown()
 
         return quorums
 
+    def compose_best(self, distances, attempts, workers=None):
+        '''
+        runs the seeded compositions `attempts` times and returns the best
+        one by `score_quorums()`, with its seed and score. The seeds are drawn
+        from the random of this `RegionalQuorum`, so the same seed gives the
+        same attempts.
+        '''
+        seeds = list(map(lambda x: self.random.randrange(2 ** 32), range(attempts)))
+
+        options = self.get_options()
+        options.update(
+            regions=self.regions,
+            number_of_near_regions=self.number_of_near_regions,
+        )
+
+        if workers is None or workers < 2:
+            results = map(lambda x: compose_attempt(options, distances, x), seeds)
+            results = list(results)
+        else:
+            trace.flush()
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(compose_attempt, itertools.repeat(options), itertools.repeat(distances), seeds))
+
+        best = None
+        stats_by_seed = dict()
+        for seed, (quorums, pairs, stats) in zip(seeds, results):
+            stats_by_seed[seed] = stats
+            if quorums is None:
+                log.debug('attempt with seed, %d was failed', seed)
+                continue
+
+            score = score_quorums(quorums, pairs, self.failure)
+            log.debug('attempt with seed, %d: %s', seed, score)
+
+            if best is None or score_key(score) < score_key(best[2]):
+                best = (quorums, seed, score)
+
+        if best is None:
+            log.error('all the %d attempts were failed', attempts)
+            return None
+
+        self.pairs = best[2]['pairs']
+        self.stats = stats_by_seed[best[1]]
+
+        return best
+
+    def get_options(self):
+        return dict(
+            failure=self.failure,
+            engine=self.engine,
+            group_size=self.group_size,
+        )
+
     def compose_pair(self, name, ra, rb):
-        qc = AvailableQuorumCommons(name, ra, rb, self.failure)
-        commons = qc.make()
+        key = ShapeMemo.make_key(ra, rb, self.failure, self.engine, self.group_size)
+        if self.memo is not None and key in self.memo:
+            stats = CommonsStats(name)
+            stats.memoized = True
+            self.stats.add(stats)
+
+            solution = self.memo.get(key, ra, rb)
+            if solution is None:
+                log.error('commons not found: %s', name)
+                return
+
+            t, stats.chosen = solution
+            log.debug('1 common was memoized: %s', t)
+        else:
+            t = self.choose_common(name, ra, rb)
+            if self.memo is not None:
+                self.memo.put(key, ra, rb, t, self.stats.pairs[-1].chosen)
 
-        # choose best one
-        l = sorted(
-            commons,
-            key=lambda x: (
-                sum(x[1]['safety']),
-                len(set(ra) & set(x[0])),
-                sum(x[1]['liveness']),
-            ),
+            if t is None:
+                return
+
+        return (
+            sorted(set(ra) | set(t)),
+            sorted(set(rb) | set(t)),
         )
 
+    def choose_common(self, name, ra, rb):
+        qc = self.engines[self.engine](
+            name,
+            ra,
+            rb,
+            self.failure,
+            index=self.index,
+            store=self.store,
+            group_size=self.group_size,
+        )
+        self.stats.add(qc.stats)
+        commons = qc.make()
+
+        # choose best one; the least safety margin at first
+        margins = commons.safety_margins()
+        l = list()
+        if len(margins) > 0:
+            l = sorted(
+                commons.get_by_safety(margins[0]),
+                key=lambda x: (
+                    len(set(ra) & set(x[0])),
+                    sum(x[1]['liveness']),
+                ),
+            )
+
         if len(l) < 1:
             log.error('commons not found: %s', name)
             return
 
         log.debug('1 common was selected: %s', l[0])
+        qc.stats.chosen = dict(l[0][1])
 
-        t = l[0][0]  # choose minimum
+        return list(l[0][0])  # choose minimum
+
+
+def compose_pair(options, name, ra, rb):
+    '''
+    composes one region pair in the worker process of
+    `RegionalQuorum.compose()`; returns the composed quorums and the stats of
+    the pair.
+    '''
+    trace.detach()
+
+    failure = options['failure']
+    engine = options['engine']
+    group_size = options['group_size']
+
+    rq = RegionalQuorum(dict(), failure, engine=engine, group_size=group_size)
+
+    return (rq.compose_pair(name, ra, rb), rq.stats.pairs[-1])
+
+
+def compose_attempt(options, distances, seed):
+    '''
+    composes the quorums with `seed` in the worker process of
+    `RegionalQuorum.compose_best()`.
+    '''
+    trace.detach()
+
+    rq = RegionalQuorum(
+        options['regions'],
+        options['failure'],
+        options['number_of_near_regions'],
+        engine=options['engine'],
+        group_size=options['group_size'],
+        seed=seed,
+    )
+
+    return (rq.compose(distances), rq.pairs, rq.stats)
+
+
+def score_quorums(quorums, pairs, failure):
+    '''
+    scores the composed quorums by the composed region pairs;
+    * `min_safety`: the minimum safety margin, `2*cn - vn - 1 - f`
+    * `total_size`: the sum of the size of quorums
+    * `overlap_balance`: the standard deviation of the size of commons
+    '''
+    margins = list()
+    commons = list()
+    for a, b in pairs:
+        c = len(set(quorums[a]) & set(quorums[b]))
+        commons.append(c)
+        margins.append(min(
+            2 * c - len(quorums[a]) - 1 - failure,
+            2 * c - len(quorums[b]) - 1 - failure,
+        ))
+
+    return dict(
+        min_safety=min(margins) if margins else 0,
+        total_size=sum(map(len, quorums.values())),
+        overlap_balance=statistics.pstdev(commons) if commons else 0,
+        pairs=pairs,
+    )
 
-        return (
-            sorted(set(ra) | set(t)),
-            sorted(set(rb) | set(t)),
-        )
+
+def score_key(score):
+    '''
+    the sort key of `score_quorums()`; the lower is the better.
+    '''
+    return (-score['min_safety'], score['total_size'], score['overlap_balance'])
+
+
+def make_ring_distances(regions):
+    '''
+    the distances of the regions in the ring by the sorted names; the next
+    region is the nearest one.
+    '''
+    s = sorted(regions.keys())
+
+    distances = dict()
+    for i in range(len(s)):
+        distances[s[i]] = list(map(
+            lambda x: (x[0] / 10, (x[1],)),
+            enumerate(s[i + 1:] + s[:len(s) - len(s[i:])]),
+        ))
+
+    return distances
+
+
+def make_regions(sizes):
+    '''
+    the validators of the regions; `sizes` is the number of validators in each
+    region.
+    '''
+    name_format = 'r%%s-%%0%dd' % (max(map(lambda x: len(str(x)), sizes)) + 1)
+
+    regions = dict()
+    for r, i in enumerate(sizes):
+        regions['r%d' % r] = list(map(lambda x: name_format % (r, x), range(i)))
+
+    return regions
 
 
 def colored(s, *a, **kw):
@@ -539,6 +1980,24 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-verbose', action='store_true')
     parser.add_argument('-near', type=int, default=2, help='number of near regions to be connected to each region')
+    parser.add_argument(
+        '-engine',
+        default='set',
+        choices=sorted(RegionalQuorum.engines.keys()),
+        help='engine to find the available commons',
+    )
+    parser.add_argument(
+        '-group-size',
+        type=int,
+        default=AvailableQuorumCommons.group_size,
+        help='maximum number of the validator groups in each region to make the commons',
+    )
+    parser.add_argument('-seed', type=int, help='random seed to choose the near regions')
+    parser.add_argument('-workers', type=int, help='number of processes to compose the region pairs')
+    parser.add_argument('-attempts', type=int, help='number of the seeded compositions to choose the best one')
+    parser.add_argument('-stats', action='store_true', help='print the stats of the composition as JSON')
+    parser.add_argument('-trace', help='file to write the traces of the candidates as JSON lines')
+    parser.add_argument('-memo', help='file to load and save the chosen commons by the shape of region pair')
     parser.add_argument('F', type=int, default=0, help='number of failure')
     parser.add_argument('NR', nargs='+', type=int, help='number of validators in each region')
 
@@ -559,26 +2018,48 @@ if __name__ == '__main__':
     min_size = 3 * options.F + 1
     log.debug('constraints: failure=%d min_size=%d', options.F, min_size)
 
-    node_name_format = 'r%%s-%%0%dd' % (max(map(lambda x: len(str(x)), options.NR)) + 1)
+    if options.trace:
+        trace.open(options.trace)
 
-    nr = dict()
-    for r, i in enumerate(options.NR):
-        nr['r%d' % r] = list(map(lambda x: node_name_format % (r, x), range(i)))
+    nr = make_regions(options.NR)
 
     log.debug('''created the primitive quorums:
 %s''', '\n'.join(map(lambda x: '* %s: %s' % (x[0], ', '.join(x[1])), nr.items())))
 
-    # make distances
-    s = sorted(nr.keys())
+    distances = make_ring_distances(nr)
+
+    # the commons are memoized only with `-memo`
+    memo = None
+    if options.memo:
+        memo = ShapeMemo()
+        memo.load(options.memo)
+
+    rq = RegionalQuorum(
+        nr,
+        options.F,
+        options.near,
+        engine=options.engine,
+        group_size=options.group_size,
+        seed=options.seed,
+        memo=memo,
+    )
 
-    distances = dict()
-    for i in range(len(s)):
-        distances[s[i]] = list(map(
-            lambda x: (x[0] / 10, (x[1],)),
-            enumerate(s[i + 1:] + s[:len(s) - len(s[i:])]),
-        ))
+    if options.attempts is None or options.attempts < 2:
+        quorums = rq.compose(distances, workers=options.workers)
+    else:
+        quorums = rq.compose_best(distances, options.attempts, workers=options.workers)
+        if quorums is not None:
+            quorums, seed, score = quorums
+            print('best composition: seed=%d min_safety=%d total_size=%d overlap_balance=%.2f' % (
+                seed,
+                score['min_safety'],
+                score['total_size'],
+                score['overlap_balance'],
+            ))
+
+    if options.memo:
+        memo.save(options.memo)
 
-    quorums = RegionalQuorum(nr, options.F, options.near).compose(distances)
     if quorums is None:
         print('failed to compose quourms')
         sys.exit(1)
@@ -586,4 +2067,9 @@ if __name__ == '__main__':
     for r, v in quorums.items():
         print(print_quorum(r, v, quorums, nr[r], options.F))
 
+    if options.stats:
+        print(json.dumps(rq.stats.as_dict(), indent=2))
+
+    trace.close()
+
     sys.exit(0)
@@ -0,0 +1,115 @@
+'''
+# rendering stage of the graphviz graphs
+
+the graphs are rendered by the layout engine of graphviz, which runs as the
+external process, so the renders are submitted to the process pool and run
+while the other files are written.
+
+* each render has `timeout` in seconds; the engine process is killed, if it
+  is not finished in time
+* the failed or timed out render does not stop the other renders
+* the graph of the pinned positions is rendered with `neato_no_op`, `-n`
+  of `neato`, so the engine does not lay out the nodes again
+'''
+
+import concurrent.futures
+import logging
+import pathlib
+import subprocess
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+def render(executable, source, engine, output_format, path, timeout=None, neato_no_op=None):
+    '''
+    runs the layout engine of graphviz with `source` and writes `path`.
+    '''
+    arguments = (executable, '-K%s' % engine, '-T%s' % output_format, '-o', str(path))
+    if neato_no_op:
+        arguments += ('-n%d' % neato_no_op,)
+
+    started = time.perf_counter()
+    subprocess.run(
+        arguments,
+        input=source.encode('utf-8'),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        timeout=timeout,
+        check=True,
+    )
+
+    return time.perf_counter() - started
+
+
+class RenderStage:
+    '''
+    renders the `graphviz.Digraph`s in the process pool; `submit()` returns
+    at once and `wait()` returns the results by name, `(path, elapsed, error)`.
+    '''
+    executable = 'dot'
+    workers = None
+    timeout = None
+    executor = None
+    futures = None
+
+    def __init__(self, workers=None, timeout=None, executable=None):
+        self.workers = workers
+        self.timeout = timeout
+
+        if executable is not None:
+            self.executable = executable
+
+        self.executor = None
+        self.futures = dict()
+
+    def submit(self, name, g, output, neato_no_op=None):
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+        path = pathlib.Path('%s.%s' % (output, g.format))
+        future = self.executor.submit(
+            render,
+            self.executable,
+            g.source,
+            g.engine,
+            g.format,
+            path,
+            self.timeout,
+            neato_no_op,
+        )
+        self.futures[name] = (path, future)
+        log.debug('render submitted: %s: %s', name, path)
+
+        return
+
+    def wait(self):
+        results = dict()
+        try:
+            for name, (path, future) in self.futures.items():
+                try:
+                    elapsed = future.result()
+                except subprocess.TimeoutExpired:
+                    results[name] = (path, None, 'timed out after %ss' % self.timeout)
+                except subprocess.CalledProcessError as e:
+                    results[name] = (path, None, e.stderr.decode('utf-8', 'replace').strip() or str(e))
+                except OSError as e:
+                    results[name] = (path, None, str(e))
+                else:
+                    results[name] = (path, elapsed, None)
+
+                log.debug('render finished: %s: %s', name, results[name])
+        finally:
+            self.shutdown()
+
+        return results
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+        self.futures = dict()
+
+        return
@@ -0,0 +1,309 @@
+'''
+# offline simulation of the SCP rounds
+
+the latency of the quorum sets of `Builder.make_quorums()` or
+`quorums.json` is estimated before they are deployed; no network is used.
+
+* the quorum set of node is flat like `tnb.intersection`; the validators of
+  `quorum['validators']` and the node itself, if it is validator, with
+  `THRESHOLD_PERCENT`
+* the round starts from the leader of nomination, which is chosen randomly
+  in each trial; the leader sends the nomination to every validator
+* each next stage, the node moves, when the statements of the previous
+  stage from the threshold of its quorum set arrive; the arrival of each
+  statement is the sending time, the processing time of the sender and the
+  one-way delay between the regions. The v-blocking sets are not counted.
+* the one-way delay is the half of the RTT between regions, from the RTT
+  matrix or the distance of tags, `tnb.latency.estimate_rtts()`; the delay
+  is jittered in each stage
+* the nodes, which have the same quorum set in the same region receive the
+  same statements, so they are computed at once as the row of the groups ×
+  members matrix; the own statement of node is delivered without the delay
+* the node, which can not receive the statements from the threshold never
+  externalizes
+'''
+
+import logging
+import math
+
+from .intersection import get_threshold
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+log = logging.getLogger(__name__)
+
+# the stages, which wait for the statements of the previous stage
+stages = (
+    'nominate accept',
+    'nominate confirm',
+    'prepare accept',
+    'prepare confirm',
+    'commit accept',
+    'externalize',
+)
+
+# the RTT in milliseconds of the distance of tags, 1; the regions of the
+# opposite side of the ring, 0.5 are about 300ms
+default_scale = 600
+
+# the rows of groups, which are computed at once
+block_size = 512
+
+
+class QuorumSimulation:
+    threshold_percent = 67
+    percentiles = (50, 90, 99)
+
+    # milliseconds
+    intra_rtt = 1.0
+    processing = 1.0
+
+    # the standard deviation of the log-normal factor of the delays
+    jitter = 0.1
+
+    names = None
+    regions = None
+    validators = None
+
+    def __init__(
+            self,
+            quorums,
+            rtts,
+            validators=None,
+            threshold_percent=None,
+            intra_rtt=None,
+            processing=None,
+            jitter=None,
+            ):
+        '''
+        `rtts` is the RTTs of every 2 regions, `{(region, other): rtt}`.
+        `validators` is the names of validator nodes; if it is missing, the
+        nodes, which are in any quorum set are validators.
+        '''
+        if numpy is None:
+            raise ImportError('`numpy` is required for the simulation')
+
+        if threshold_percent is not None:
+            self.threshold_percent = threshold_percent
+
+        if intra_rtt is not None:
+            self.intra_rtt = intra_rtt
+
+        if processing is not None:
+            self.processing = processing
+
+        if jitter is not None:
+            self.jitter = jitter
+
+        self.names = list(quorums.keys())
+        self.regions = sorted(set(map(lambda x: x['region'], quorums.values())))
+
+        quorum_sets = dict()
+        for name, quorum in quorums.items():
+            members = set()
+            for vs in quorum['validators'].values():
+                members.update(vs)
+
+            quorum_sets[name] = members
+
+        if validators is None:
+            validators = set()
+            for members in quorum_sets.values():
+                validators.update(members)
+
+        # the validators, which are not in `quorums` never send
+        unknown = set(validators) - set(self.names)
+        if unknown:
+            log.warning('simulation: unknown validators, which never send: %s', sorted(unknown))
+
+        self.validators = list(filter(lambda x: x in validators, self.names))
+        validator_ids = dict(map(lambda x: (x[1], x[0]), enumerate(self.validators)))
+        region_ids = dict(map(lambda x: (x[1], x[0]), enumerate(self.regions)))
+
+        self.node_region = numpy.array(
+            list(map(lambda x: region_ids[quorums[x]['region']], self.names)),
+            dtype=numpy.int64,
+        )
+        node_ids = dict(map(lambda x: (x[1], x[0]), enumerate(self.names)))
+        self.validator_node = numpy.array(
+            list(map(lambda x: node_ids[x], self.validators)),
+            dtype=numpy.int64,
+        ).reshape(-1)
+        self.validator_region = self.node_region[self.validator_node]
+
+        # the groups of the nodes, which have the same quorum set in the same region
+        groups = dict()
+        group_of = list()
+        self_of = list()
+        for name in self.names:
+            members = set(quorum_sets[name])
+            if name in validator_ids:
+                members.add(name)
+
+            threshold = get_threshold(len(members), self.threshold_percent)
+            members = tuple(sorted(filter(lambda x: x in validator_ids, members)))
+            key = (members, threshold, quorums[name]['region'])
+            if key not in groups:
+                groups[key] = len(groups)
+
+            group_of.append(groups[key])
+            self_of.append(validator_ids[name] if name in members else -1)
+
+        width = max(map(lambda x: len(x[0]), groups.keys())) if groups else 0
+        self.group_members = numpy.full((len(groups), max(width, 1)), -1, dtype=numpy.int64)
+        self.group_threshold = numpy.zeros(len(groups), dtype=numpy.int64)
+        self.group_region = numpy.zeros(len(groups), dtype=numpy.int64)
+        for (members, threshold, region_name), g in groups.items():
+            self.group_members[g, :len(members)] = list(map(lambda x: validator_ids[x], members))
+            self.group_threshold[g] = threshold
+            self.group_region[g] = region_ids[region_name]
+
+        self.group_of = numpy.array(group_of, dtype=numpy.int64)
+        self.self_of = numpy.array(self_of, dtype=numpy.int64)
+
+        self.one_way = numpy.zeros((len(self.regions), len(self.regions)))
+        for i, region_name in enumerate(self.regions):
+            for j, other in enumerate(self.regions):
+                self.one_way[i, j] = (self.intra_rtt if i == j else rtts[(region_name, other)]) / 2
+
+        log.debug(
+            'simulation: nodes=%d validators=%d groups=%d regions=%d',
+            len(self.names),
+            len(self.validators),
+            len(groups),
+            len(self.regions),
+        )
+
+    def get_delays(self, rng):
+        if self.jitter > 0:
+            return self.one_way * rng.lognormal(0, self.jitter, self.one_way.shape)
+
+        return self.one_way
+
+    def get_processing(self, rng):
+        if self.processing > 0:
+            return rng.exponential(self.processing, len(self.validators))
+
+        return numpy.zeros(len(self.validators))
+
+    def receive(self, sent, delays):
+        '''
+        the times of the nodes, when the statements from the threshold of
+        the quorum set arrive; `sent` is the sending times of validators.
+        '''
+        t = self.group_threshold
+        kth = numpy.full(len(t), numpy.inf)
+        previous = numpy.full(len(t), -numpy.inf)
+
+        for start in range(0, len(t), block_size):
+            members = self.group_members[start:start + block_size]
+            padded = members < 0
+            members = numpy.where(padded, 0, members)
+
+            # `delays[sender, receiver]`
+            receivers = self.group_region[start:start + block_size, None]
+            arrivals = sent[members] + delays[self.validator_region[members], receivers]
+            arrivals[padded] = numpy.inf
+            arrivals.sort(axis=1)
+
+            rows = numpy.arange(len(members))
+            block_t = t[start:start + block_size]
+            found = block_t > 0
+            kth[start:start + block_size][found] = arrivals[rows[found], block_t[found] - 1]
+
+            second = block_t > 1
+            previous[start:start + block_size][second] = arrivals[rows[second], block_t[second] - 2]
+
+        times = kth[self.group_of]
+
+        # the group row has the own statement of node at `x`, the sending
+        # time with the delay in the region; it is replaced by `y`, the
+        # sending time itself, and the threshold-th arrival is recomputed.
+        # If `x` was before the threshold-th arrival, `kth`, or `y` is not
+        # before `kth`, `kth` is kept; otherwise `x` is `kth` or later and
+        # `y` moves before `kth`, so the threshold-th is the later of the
+        # arrival before `kth`, `previous` and `y`.
+        has_self = self.self_of >= 0
+        if has_self.any():
+            s = self.self_of[has_self]
+            g = self.group_of[has_self]
+            y = sent[s]
+            x = y + delays[self.group_region[g], self.group_region[g]]
+
+            kept = (x < kth[g]) | (y >= kth[g])
+            times[has_self] = numpy.where(kept, kth[g], numpy.maximum(previous[g], y))
+
+        return times
+
+    def run_trial(self, rng):
+        '''
+        the times of the nodes at each stage, `len(stages) × nodes`.
+        '''
+        results = numpy.zeros((len(stages), len(self.names)))
+        if len(self.validators) < 1:
+            results[:] = numpy.inf
+
+            return results
+
+        # the nomination of the leader
+        leader = rng.randint(len(self.validators))
+        delays = self.get_delays(rng)
+        sent = delays[self.validator_region[leader], self.validator_region]
+        sent[leader] = 0
+
+        for k in range(len(stages)):
+            sent = sent + self.get_processing(rng)
+            results[k] = self.receive(sent, self.get_delays(rng))
+            sent = results[k][self.validator_node]
+
+        return results
+
+    def run(self, trials=None, seed=None):
+        '''
+        the externalize times of the nodes in milliseconds, `trials × nodes`;
+        `inf` is never externalized.
+        '''
+        if trials is None:
+            trials = 100
+
+        rng = numpy.random.RandomState(seed)
+
+        times = numpy.zeros((trials, len(self.names)))
+        for trial in range(trials):
+            times[trial] = self.run_trial(rng)[-1]
+
+        return times
+
+    def get_percentiles(self, values):
+        values = numpy.asarray(values).reshape(-1)
+        if len(values) < 1:
+            return dict()
+
+        # the percentiles over `inf` are `nan`
+        with numpy.errstate(invalid='ignore'):
+            found = numpy.percentile(values, self.percentiles)
+
+        return dict(map(
+            lambda x: (x[0], None if math.isinf(x[1]) or math.isnan(x[1]) else round(float(x[1]), 3)),
+            zip(self.percentiles, found),
+        ))
+
+    def report(self, times):
+        '''
+        the percentiles of the externalize times by node and by region,
+        `{"nodes": {name: {percentile: ms}}, "regions": {..}}`; `None` is
+        not externalized.
+        '''
+        nodes = dict()
+        for i, name in enumerate(self.names):
+            nodes[name] = self.get_percentiles(times[:, i])
+
+        regions = dict()
+        for i, region_name in enumerate(self.regions):
+            regions[region_name] = self.get_percentiles(times[:, self.node_region == i])
+
+        return dict(nodes=nodes, regions=regions)
@@ -1,3 +1,4 @@
+import heapq
 import itertools
 import re
 import sys
@@ -6,29 +7,47 @@ import colorful
 
 
 def calculate_tags_distance(a, b):
+    '''
+    the distance of the tags of 2 regions; the first tag is the position in
+    the ring of 10, and the rest tags are compared by the common prefix. The
+    regions without tags are the farthest.
+    '''
+    if len(a) < 1 or len(b) < 1:
+        return 1
+
     r0 = a[0]
     r1 = b[0]
     if r0 == r1:
         return _calculate_tags_distance(a[1:], b[1:]) / 10
 
-    d = abs((r0 - r1))
+    return get_ring_distance(r0, r1) / 10
+
+
+def get_ring_distance(r0, r1):
+    d = abs(r0 - r1)
     if d > 5:
-        d = 10 - r1 + r0
+        d = 10 - d
 
-    return d / 10
+    return d
 
 
 def _calculate_tags_distance(a, b):
-    l = list(itertools.zip_longest(a, b))
+    n = max(len(a), len(b))
+    if n < 1:
+        return 0
+
+    return 1 - get_common_prefix(a, b) / n
+
+
+def get_common_prefix(a, b):
     index = 0
-    for index, b in enumerate(map(lambda x: x[0] == x[1], l)):
-        if b is False:
+    for x, y in zip(a, b):
+        if x != y:
             break
 
-    if len(l) < 1:
-        return 0
+        index += 1
 
-    return 1 - index / len(l)
+    return index
 
 
 def get_distances_by_region(distances, region_name):
@@ -41,10 +60,139 @@ def get_distances_by_region(distances, region_name):
         ds.append((other, ratio))
 
     d = list()
-    for key, groups in itertools.groupby(ds, key=lambda x: x[1]):
+    for key, groups in itertools.groupby(sorted(ds, key=lambda x: (x[1], x[0])), key=lambda x: x[1]):
         d.append((key, list(map(lambda x: x[0], groups))))
 
-    return sorted(d)
+    return d
+
+
+class TagNode:
+    children = None
+    regions = None
+    by_length = None
+
+    def __init__(self):
+        self.children = dict()
+        self.regions = set()
+        self.by_length = dict()
+
+
+class TagIndex:
+    '''
+    the trie of the tags of regions; the regions, which share the longer
+    prefix of tags are nearer, so the regions at each distance are found by
+    walking the path of the tags of region.
+    * the first tag is the position in the ring; the regions of the other
+      first tags are at the ring distance
+    * the regions under the node of depth `c` and not under the next node of
+      the path share `c - 1` rest tags; their distance also depends on the
+      number of their tags, so each node keeps its regions by the number of
+      tags
+    * the levels are merged by distance from the `(depth, number of tags)`
+      buckets of the path, so only `O(depth)` buckets are visited and the
+      regions of a bucket are collected when its level is reached
+    '''
+    tags = None
+    root = None
+
+    def __init__(self, tags_by_region):
+        self.tags = dict()
+        self.root = TagNode()
+
+        for region_name, tags in tags_by_region.items():
+            self.tags[region_name] = list(tags)
+
+            node = self.root
+            node.regions.add(region_name)
+            node.by_length.setdefault(len(tags), set()).add(region_name)
+            for tag in tags:
+                node = node.children.setdefault(tag, TagNode())
+                node.regions.add(region_name)
+                node.by_length.setdefault(len(tags), set()).add(region_name)
+
+    def get_path(self, region_name):
+        path = [self.root]
+        for tag in self.tags[region_name]:
+            path.append(path[-1].children[tag])
+
+        return path
+
+    def get_buckets(self, region_name):
+        '''
+        the buckets of the regions around the path of `region_name`,
+        `[(distance, regions())]`; `regions()` collects the regions of the
+        bucket.
+        '''
+        tags = self.tags[region_name]
+        if len(tags) < 1:
+            return [(1, lambda: self.root.regions)]
+
+        buckets = list()
+        for tag, node in self.root.children.items():
+            if tag != tags[0]:
+                buckets.append((get_ring_distance(tags[0], tag) / 10, lambda node=node: node.regions))
+
+        if 0 in self.root.by_length:
+            buckets.append((1, lambda: self.root.by_length[0]))
+
+        path = self.get_path(region_name)
+        for depth in range(1, len(path)):
+            below = path[depth + 1].by_length if depth + 1 < len(path) else dict()
+            for length, regions in path[depth].by_length.items():
+                n = max(len(tags), length) - 1
+                d = 0 if n < 1 else (1 - (depth - 1) / n) / 10
+                buckets.append((d, lambda regions=regions, length=length, below=below: regions - below.get(length, set())))
+
+        return buckets
+
+    def iter_levels(self, region_name):
+        '''
+        yields the regions by distance from `region_name`, `(distance,
+        [regions])` in the order of distance.
+        '''
+        heap = list(map(lambda x: (x[1][0], x[0], x[1][1]), enumerate(self.get_buckets(region_name))))
+        heapq.heapify(heap)
+
+        while heap:
+            d, _, regions = heapq.heappop(heap)
+            found = set(regions())
+            while heap and heap[0][0] == d:
+                found.update(heapq.heappop(heap)[2]())
+
+            found.discard(region_name)
+            if found:
+                yield (d, sorted(found))
+
+    def levels(self, region_name):
+        '''
+        the regions by distance from `region_name`, `[(distance, [regions])]`
+        in the order of distance; same with `get_distances_by_region()`.
+        '''
+        return list(self.iter_levels(region_name))
+
+    def nearest(self, region_name, k):
+        '''
+        the `k` nearest regions; the regions at same distance are sorted by
+        name.
+        '''
+        found = list()
+        for _, regions in self.iter_levels(region_name):
+            if len(found) >= k:
+                break
+
+            found.extend(regions)
+
+        return found[:k]
+
+    def at_distance(self, region_name, distance):
+        for d, regions in self.iter_levels(region_name):
+            if abs(d - distance) < 1e-9:
+                return regions
+
+            if d > distance:
+                break
+
+        return list()
 
 
 RE_BLANK = re.compile('[\s]+')